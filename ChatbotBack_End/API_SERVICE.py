@@ -1,55 +1,75 @@
 from fastapi import FastAPI, WebSocket, HTTPException, Request, Path
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import jsonschema
-from jsonschema import validate, ValidationError
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
+from starlette.websockets import WebSocketState
 from .decoder import JsonPuml
-from .main import classify_and_generate_diagram, regenerate_diagram_from_data, diagram_classifier, LLM_FALLBACK_CONFIDENCE, get_schema
+from .main import (
+    classify_and_generate_diagram, regenerate_diagram_from_data, diagram_classifier,
+    LLM_FALLBACK_CONFIDENCE, BASE_CONFIG, ask_llm_for_diagram_type, generate_svg,
+)
 from .OperationCRUD import DiagramCRUD
-
-# safe import for optional app.services.llm_client (fall back to a minimal async stub)
-try:
-    from app.services.llm_client import ask_llm_for_diagram_type
-except Exception:
-    try:
-        from .app.services.llm_client import ask_llm_for_diagram_type
-    except Exception:
-        async def ask_llm_for_diagram_type(text: str):
-            # Minimal fallback used for local testing when the 'app' package isn't available
-            return {
-                "resolved": False,
-                "question": "¿Quieres un diagrama de clases o un diagrama de casos de uso?",
-                "diagram_type": None,
-                "raw": None
-            }
+from .plantuml_pipe import PlantUmlPool, PlantUmlSyntaxError
+from .uml_models import parse_uml_payload, validation_message
+from pydantic import ValidationError as PayloadValidationError
 import os
+import re
+import hashlib
+import logging
 import uuid
-import json
-
-# Cargar esquemas individuales desde la carpeta "Validation Schemas"
-SCHEMAS = {}
-SCHEMA_DIR = os.path.join(os.path.dirname(__file__), "Validation Schemas")
-try:
-    class_schema_path = os.path.join(SCHEMA_DIR, "classDiagram_schema.json")
-    usecase_schema_path = os.path.join(SCHEMA_DIR, "useCaseDiagram_schema.json")
-    if os.path.exists(class_schema_path):
-        with open(class_schema_path, encoding="utf-8") as f:
-            SCHEMAS['classDiagram'] = json.load(f)
-    if os.path.exists(usecase_schema_path):
-        with open(usecase_schema_path, encoding="utf-8") as f:
-            SCHEMAS['useCaseDiagram'] = json.load(f)
-except Exception:
-    # No detener el arranque si los esquemas faltan o están mal formados; SCHEMAS se queda vacío
-    SCHEMAS = {}
-
-def _get_schema_for_data(data: dict):
-    """Devuelve el esquema JSON apropiado según data['diagramType'] si está disponible."""
-    if not isinstance(data, dict):
-        return None
-    diagram_type = data.get('diagramType')
-    return SCHEMAS.get(diagram_type)
+import asyncio
+import threading
+import orjson
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger("chatbot_api")
+
+# Procesos PlantUML residentes (modo -pipe); si no hay java/JAR se lanza PlantUML por petición
+PLANTUML_JAR = "plantuml-1.2025.2.jar"
+PLANTUML_WORKERS = 2
+_PLANTUML_POOL = None
+
+# Configuración de JsonPuml invariante durante la vida del proceso: se calcula una vez.
+# Comparte las rutas de main.BASE_CONFIG (junto al módulo, independientes del CWD).
+PLANTUML_CONFIG = {**BASE_CONFIG, "plant_uml_version": PLANTUML_JAR, "diagram_name": "output"}
+
+# Un JsonPuml por hilo (event loop o hilo del threadpool): la conversión sólo depende de _data,
+# así que se reutiliza la instancia en vez de crearla por petición, sin compartirla entre hilos
+_PUML_LOCAL = threading.local()
+
+
+def _plantuml_code(data: dict) -> str:
+    """Código PlantUML de `data`; lanza la excepción del decoder si no se puede convertir."""
+    jp = getattr(_PUML_LOCAL, "json_puml", None)
+    if jp is None:
+        jp = _PUML_LOCAL.json_puml = JsonPuml(config=PLANTUML_CONFIG)
+    jp._data = data
+    return jp._json_to_plantuml()
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    global _PLANTUML_POOL
+    jar_path = os.path.join(PLANTUML_CONFIG["plant_uml_path"], PLANTUML_JAR)
+    if PlantUmlPool.available(jar_path):
+        pool = PlantUmlPool(jar_path, size=PLANTUML_WORKERS)
+        await pool.start()
+        _PLANTUML_POOL = pool
+    flusher = asyncio.create_task(_diagram_flusher())
+    pruner = asyncio.create_task(_svg_disk_cache_pruner())
+    try:
+        yield
+    finally:
+        flusher.cancel()
+        pruner.cancel()
+        # escribir lo pendiente antes de apagar
+        _flush_dirty_diagrams()
+        if _PLANTUML_POOL is not None:
+            await _PLANTUML_POOL.close()
+            _PLANTUML_POOL = None
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=_lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -58,216 +78,689 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Los SVG comprimen muy bien; respuestas pequeñas (errores, acks) se envían sin comprimir
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 # Ejemplo: almacenamiento simple de diagramas por id en carpeta "diagrams"
 DIAGRAMS_DIR = os.path.join(os.path.dirname(__file__), "diagrams")
 os.makedirs(DIAGRAMS_DIR, exist_ok=True)
 
+DIAGRAMS_PREFIX = DIAGRAMS_DIR + os.sep
+# ids válidos: evita path traversal ("../x") y nombres de archivo raros
+_DIAGRAM_ID_RE = re.compile(r"[A-Za-z0-9_-]+")
+
 def _diagram_path(diagram_id: str) -> str:
-    return os.path.join(DIAGRAMS_DIR, f"{diagram_id}.json")
+    """Ruta del JSON del diagrama; lanza ValueError si el id no es válido."""
+    if _DIAGRAM_ID_RE.fullmatch(diagram_id) is None:
+        raise ValueError(f"Id de diagrama inválido: {diagram_id!r}")
+    return f"{DIAGRAMS_PREFIX}{diagram_id}.json"
+
+
+class _KeyedSemaphores:
+    """
+    Un asyncio.Semaphore por clave, creado al primer uso y descartado cuando nadie lo retiene
+    ni lo espera: las claves vienen del cliente (user_id, diagram_id) y no deben acumularse.
+    """
+
+    def __init__(self, value: int = 1):
+        self._value = value
+        # clave -> [semáforo, corrutinas que lo retienen o esperan]
+        self._entries = {}
+
+    @asynccontextmanager
+    async def hold(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [asyncio.Semaphore(self._value), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Caché LRU en memoria de diagramas cargados: diagram_id -> (mtime_ns del archivo, DiagramCRUD)
+DIAGRAM_CACHE_MAX = 256
+_DIAGRAM_CACHE = OrderedDict()
+# Un lock por diagrama para serializar escrituras concurrentes sobre el mismo CRUD
+_DIAGRAM_LOCKS = _KeyedSemaphores()
+
+
+def _diagram_lock(diagram_id: str):
+    return _DIAGRAM_LOCKS.hold(diagram_id)
+
+
+def _cache_crud(diagram_id: str, crud: DiagramCRUD, mtime: int = None) -> None:
+    """Guarda (o refresca tras persistir) el CRUD en la caché con el mtime actual del archivo."""
+    if mtime is None:
+        mtime = os.stat(crud.storage_path).st_mtime_ns
+    _DIAGRAM_CACHE[diagram_id] = (mtime, crud)
+    _DIAGRAM_CACHE.move_to_end(diagram_id)
+    while len(_DIAGRAM_CACHE) > DIAGRAM_CACHE_MAX:
+        _DIAGRAM_CACHE.popitem(last=False)
+
+
+def _get_crud(diagram_id: str) -> DiagramCRUD:
+    """
+    Devuelve el DiagramCRUD del diagrama desde la caché; sólo relee el JSON del disco
+    si el archivo cambió (mtime distinto). Lanza FileNotFoundError si no existe.
+    """
+    dirty = _DIRTY_DIAGRAMS.get(diagram_id)
+    if dirty is not None:
+        # cambios pendientes de escribir: la copia en memoria es la versión vigente
+        return dirty
+    path = _diagram_path(diagram_id)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _DIAGRAM_CACHE.get(diagram_id)
+    if cached is not None and cached[0] == mtime:
+        _DIAGRAM_CACHE.move_to_end(diagram_id)
+        return cached[1]
+    crud = DiagramCRUD.load_from_file(path, autosave=False)
+    # reutiliza el stat anterior: un único stat por petición (EAFP, sin os.path.exists previo)
+    _cache_crud(diagram_id, crud, mtime)
+    return crud
+
+
+# Escritura diferida: las mutaciones marcan el diagrama como sucio y una tarea de fondo
+# los escribe en bloque cada DIAGRAM_FLUSH_INTERVAL segundos (en vez de reescribir el JSON por cada edición)
+DIAGRAM_FLUSH_INTERVAL = 0.25
+_DIRTY_DIAGRAMS = {}
+
+# ventana (segundos) para agrupar ediciones del editor en una sola regeneración del SVG
+EDITOR_REGEN_DEBOUNCE = 0.15
+
+
+def _mark_dirty(diagram_id: str, crud: DiagramCRUD) -> None:
+    if crud.dirty:
+        _DIRTY_DIAGRAMS[diagram_id] = crud
+
+
+def _flush_diagram(diagram_id: str) -> None:
+    crud = _DIRTY_DIAGRAMS.get(diagram_id)
+    if crud is None:
+        return
+    crud.flush()
+    # write_snapshot no propaga errores: si la escritura falló, el diagrama sigue sucio y se reintenta
+    if not crud.dirty and _DIRTY_DIAGRAMS.get(diagram_id) is crud:
+        del _DIRTY_DIAGRAMS[diagram_id]
+        _cache_crud(diagram_id, crud)
+
+
+def _flush_dirty_diagrams() -> None:
+    for diagram_id in list(_DIRTY_DIAGRAMS):
+        _flush_diagram(diagram_id)
+
+
+async def _flush_diagram_in_thread(diagram_id: str) -> None:
+    """
+    Como _flush_diagram, pero sólo la serialización corre en el event loop (no compite con
+    las mutaciones); la escritura del archivo va a un hilo. Mientras tanto el diagrama sigue
+    en _DIRTY_DIAGRAMS, y si se modificó durante la escritura queda para la siguiente ronda.
+    """
+    crud = _DIRTY_DIAGRAMS.get(diagram_id)
+    if crud is None:
+        return
+    version, data = crud.snapshot()
+    await asyncio.to_thread(crud.write_snapshot, version, data)
+    if not crud.dirty and _DIRTY_DIAGRAMS.get(diagram_id) is crud:
+        del _DIRTY_DIAGRAMS[diagram_id]
+        _cache_crud(diagram_id, crud)
+
+
+async def _diagram_flusher():
+    while True:
+        await asyncio.sleep(DIAGRAM_FLUSH_INTERVAL)
+        for diagram_id in list(_DIRTY_DIAGRAMS):
+            await _flush_diagram_in_thread(diagram_id)
+
+
+# Caché de SVG por contenido: entradas repetidas no vuelven a lanzar PlantUML
+SVG_CACHE_MAX = 512
+_SVG_CACHE = OrderedDict()
+# un lock por clave mientras haya peticiones de esa clave (también si el render falla)
+_SVG_LOCKS = _KeyedSemaphores()
+# Límite global de procesos PlantUML lanzados a la vez (fuera del pool residente)
+PLANTUML_SEM = asyncio.Semaphore(os.cpu_count() or 1)
+
+# Límite de peticiones de chat (LLM + generación) simultáneas por usuario
+USER_CHAT_CONCURRENCY = 2
+_USER_SEM = _KeyedSemaphores(USER_CHAT_CONCURRENCY)
+
+
+def _svg_cache_key(data: dict) -> bytes:
+    return hashlib.blake2b(orjson.dumps(data, option=orjson.OPT_SORT_KEYS), digest_size=16).digest()
+
+
+class _CanonicalDiagram:
+    """
+    Diagrama serializado una sola vez (claves ordenadas) junto a su hash. Los bytes sirven de
+    instantánea inmutable y de clave para las cachés de SVG y PUML, en vez de deepcopy + un hash por caché.
+    """
+    __slots__ = ("canon_bytes", "key")
 
+    def __init__(self, data: dict):
+        self.canon_bytes = orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+        self.key = hashlib.blake2b(self.canon_bytes, digest_size=16).digest()
 
-def _puml_from_data(data: dict, diagram_name: str = "output") -> str:
+    def data(self) -> dict:
+        """Copia independiente del diagrama (quien la reciba puede modificarla)."""
+        return orjson.loads(self.canon_bytes)
+
+
+# Segundo nivel en disco (sobrevive a reinicios): output/cache/<espacio>-<hash>.svg.
+# Una tarea de fondo borra los más antiguos por encima de SVG_DISK_CACHE_MAX_FILES.
+SVG_DISK_CACHE_DIR = os.path.join(os.path.dirname(__file__), "output", "cache")
+SVG_DISK_CACHE_MAX_FILES = 2048
+SVG_DISK_CACHE_PRUNE_INTERVAL = 300.0
+
+
+def _disk_cache_path(namespace: str, key: bytes) -> str:
+    return os.path.join(SVG_DISK_CACHE_DIR, f"{namespace}-{key.hex()}.svg")
+
+
+def _disk_cache_read(namespace: str, key: bytes):
+    try:
+        with open(_disk_cache_path(namespace, key), "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _disk_cache_write(namespace: str, key: bytes, svg: str) -> None:
+    path = _disk_cache_path(namespace, key)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(SVG_DISK_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(svg)
+        # escritura atómica: un lector concurrente nunca ve un SVG a medias
+        os.replace(tmp_path, path)
+    except OSError:
+        # la caché en disco es opcional; no romper la petición si no se puede escribir
+        pass
+
+
+def _prune_svg_disk_cache() -> None:
+    try:
+        entries = [e for e in os.scandir(SVG_DISK_CACHE_DIR) if e.name.endswith(".svg")]
+    except FileNotFoundError:
+        return
+    excess = len(entries) - SVG_DISK_CACHE_MAX_FILES
+    if excess <= 0:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for entry in entries[:excess]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+async def _svg_disk_cache_pruner():
+    while True:
+        await asyncio.sleep(SVG_DISK_CACHE_PRUNE_INTERVAL)
+        await asyncio.to_thread(_prune_svg_disk_cache)
+
+
+async def _render_svg(data: dict):
+    """Genera el SVG de `data`: usa los procesos PlantUML residentes si están activos."""
+    # el código se calcula aquí, antes de ceder el loop: ningún render comparte estado con otro
+    code = _plantuml_code(data)
+    if _PLANTUML_POOL is not None:
+        try:
+            return await _PLANTUML_POOL.render(code)
+        except PlantUmlSyntaxError:
+            raise
+        except (OSError, RuntimeError, UnicodeDecodeError):
+            # incluye TimeoutError: el worker ya se descartó; este diagrama va por una JVM propia
+            pass
+    # fuera del event loop; generate_svg serializa los renders que escriben output/output.svg
+    async with PLANTUML_SEM:
+        return await asyncio.to_thread(generate_svg, PLANTUML_CONFIG, code)
+
+
+async def _cached_svg(data: dict):
+    """
+    Devuelve el SVG de `data` desde la caché o lo genera. Peticiones idénticas
+    simultáneas comparten un lock por clave y producen un único render.
+    """
+    key = _svg_cache_key(data)
+    svg = _SVG_CACHE.get(key)
+    if svg is not None:
+        _SVG_CACHE.move_to_end(key)
+        return svg
+    async with _SVG_LOCKS.hold(key):
+        svg = _SVG_CACHE.get(key)
+        if svg is None:
+            svg = await asyncio.to_thread(_disk_cache_read, "uml", key)
+            if svg is None:
+                svg = await _render_svg(data)
+                if svg is not None:
+                    await asyncio.to_thread(_disk_cache_write, "uml", key, svg)
+            if svg is not None:
+                _SVG_CACHE[key] = svg
+                if len(_SVG_CACHE) > SVG_CACHE_MAX:
+                    _SVG_CACHE.popitem(last=False)
+    return svg
+
+
+def _get_crud_or_404(diagram_id: str) -> DiagramCRUD:
+    try:
+        return _get_crud(diagram_id)
+    except (FileNotFoundError, ValueError):
+        raise HTTPException(status_code=404, detail="Diagrama no encontrado")
+
+
+# Tamaño máximo de un cuerpo HTTP o mensaje WebSocket: un diagrama real ocupa unos pocos KB y
+# parsear cargas enormes bloquea el event loop para todas las conexiones
+MAX_MESSAGE_BYTES = 1024 * 1024
+WS_CLOSE_TOO_BIG = 1009
+
+
+async def _read_body(request: Request) -> bytes:
+    """Lee el cuerpo crudo; responde 413 si supera MAX_MESSAGE_BYTES (sin esperar a recibirlo entero)."""
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > MAX_MESSAGE_BYTES:
+        raise HTTPException(status_code=413, detail="Cuerpo de la petición demasiado grande")
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > MAX_MESSAGE_BYTES:
+            raise HTTPException(status_code=413, detail="Cuerpo de la petición demasiado grande")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def _read_json(request: Request):
+    """Parsea el cuerpo crudo con orjson (evita el decoder stdlib de request.json())."""
+    return orjson.loads(await _read_body(request))
+
+
+# Errores frecuentes serializados una sola vez (frames de texto listos para enviar)
+ERR_NO_TEXT_BYTES = orjson.dumps({"error": "No text provided"})
+ERR_NO_TEXT = ERR_NO_TEXT_BYTES.decode("utf-8")
+ERR_INVALID_JSON = orjson.dumps({"error": "Invalid JSON"}).decode("utf-8")
+ERR_DIAGRAM_NOT_FOUND = orjson.dumps({"error": "Diagrama no encontrado"}).decode("utf-8")
+ERR_UNSUPPORTED_CMD = orjson.dumps({"error": "Comando no soportado"}).decode("utf-8")
+ERR_SVG_NOT_GENERATED = orjson.dumps({"error": "No se pudo generar el archivo SVG."}).decode("utf-8")
+ERR_AUDIO_UNSUPPORTED = orjson.dumps(
+    {"error": "Audio input not supported on this endpoint yet. Send text via /chat or implement STT."}
+).decode("utf-8")
+
+
+async def _iter_frames(websocket: WebSocket):
+    """
+    Itera los mensajes entrantes tal como llegan: bytes para frames binarios (orjson los
+    parsea sin pasar por str) o str para frames de texto. iter_text/iter_bytes sólo aceptan uno.
+    """
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        data = message.get("bytes")
+        size = None if data is None else len(data)
+        if data is None:
+            data = message.get("text")
+            if data is not None:
+                # el límite es en bytes: sólo hace falta codificar si los caracteres podrían superarlo
+                size = len(data) if len(data) * 4 <= MAX_MESSAGE_BYTES else len(data.encode("utf-8"))
+        if size is not None and size > MAX_MESSAGE_BYTES:
+            await websocket.close(code=WS_CLOSE_TOO_BIG)
+            return
+        yield data
+
+
+async def _close_ws(websocket: WebSocket) -> None:
+    """Cierra el socket salvo que ya se haya cerrado (p. ej. por un mensaje demasiado grande)."""
+    if websocket.application_state == WebSocketState.CONNECTED:
+        await websocket.close()
+
+
+async def _send_json(websocket: WebSocket, payload) -> None:
+    """Envía `payload` como frame de texto serializado con orjson (evita el encoder stdlib de send_json)."""
+    await websocket.send_text(orjson.dumps(payload).decode("utf-8"))
+
+
+# Memo de la regeneración tras ediciones (CRUD/editor): mismo contenido -> mismo SVG/PUML.
+# Se usa desde el event loop y desde hilos (editor), de ahí el lock.
+REGEN_CACHE_MAX = 256
+_REGEN_SVG_CACHE = OrderedDict()
+_PUML_CACHE = OrderedDict()
+_REGEN_CACHE_LOCK = threading.Lock()
+
+
+def _memo_get(cache: OrderedDict, key: bytes):
+    with _REGEN_CACHE_LOCK:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _memo_put(cache: OrderedDict, key: bytes, value) -> None:
+    with _REGEN_CACHE_LOCK:
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > REGEN_CACHE_MAX:
+            cache.popitem(last=False)
+
+
+def _regenerate_svg(diagram: _CanonicalDiagram, diagram_id: str = "default") -> str:
+    """
+    regenerate_diagram_from_data memoizado por hash del contenido del diagrama.
+    Los archivos intermedios se nombran por diagrama; dos renders del mismo diagrama se
+    serializan en main.generate_svg, así cada uno lee su propio SVG antes de memoizarlo.
+    """
+    key = diagram.key
+    svg = _memo_get(_REGEN_SVG_CACHE, key)
+    if svg is None:
+        svg = _disk_cache_read("crud", key)
+        if svg is None:
+            svg = regenerate_diagram_from_data(diagram.data(), user_id=diagram_id)
+            _disk_cache_write("crud", key, svg)
+        _memo_put(_REGEN_SVG_CACHE, key, svg)
+    return svg
+
+
+def _puml_from_data(diagram: _CanonicalDiagram) -> str:
     """Return PlantUML source for given diagram data without attempting to run Java/PlantUML."""
+    key = diagram.key
+    puml = _memo_get(_PUML_CACHE, key)
+    if puml is None:
+        puml = _build_puml(diagram.data())
+        _memo_put(_PUML_CACHE, key, puml)
+    return puml
+
+
+def _build_puml(data: dict) -> str:
     try:
-        # Prefer module-relative paths so the service works regardless of current working directory
-        module_dir = os.path.dirname(__file__)
-        config = {
-            "plant_uml_path": os.path.join(module_dir, "plant_uml_exc"),
-            "plant_uml_version": "plantuml-1.2025.2.jar",
-            "json_path": None,
-            "output_path": os.path.join(module_dir, "output"),
-            "diagram_name": diagram_name,
-        }
-        jp = JsonPuml(config=config)
-        jp._data = data
-        return jp._json_to_plantuml()
+        return _plantuml_code(data)
     except Exception as e:
         return f"ERROR_GENERATING_PUML: {e}"
 
+def _write_diagram_file(path: str, body: dict) -> None:
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(body, option=orjson.OPT_INDENT_2))
+    os.replace(tmp_path, path)
+
+
+async def _svg_or_puml(diagram: dict, diagram_id: str) -> dict:
+    """
+    Regenera el SVG del diagrama en un hilo (sobre una copia, el original puede seguir
+    editándose). Devuelve {"svg": ...} o, si falla, {"error": ..., "puml": ...}.
+    """
+    snapshot = _CanonicalDiagram(diagram)
+    try:
+        async with PLANTUML_SEM:
+            return {"svg": await asyncio.to_thread(_regenerate_svg, snapshot, diagram_id)}
+    except Exception as e:
+        # return PlantUML source so front-end can still render or inspect
+        puml = await asyncio.to_thread(_puml_from_data, snapshot)
+        return {"error": str(e), "puml": puml}
+
+
 @app.post("/diagrams")
 async def create_diagram(request: Request):
-    body = await request.json()
+    body = await _read_json(request)
     # body must contain initial diagram structure (diagramType,...)
-    diagram_id = body.get("id") or str(uuid.uuid4())
-    path = _diagram_path(diagram_id)
+    # ids numéricos ({"id": 123}) se aceptan como texto, igual que antes de validar el formato
+    diagram_id = str(body.get("id") or uuid.uuid4().hex)
+    try:
+        path = _diagram_path(diagram_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     body["id"] = diagram_id
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(body, f, ensure_ascii=False, indent=2)
+    async with _diagram_lock(diagram_id):
+        # un CRUD anterior con el mismo id (pendiente de escribir o en caché) ya no es válido:
+        # el flusher sobrescribiría el archivo nuevo y las lecturas servirían el diagrama viejo
+        _DIRTY_DIAGRAMS.pop(diagram_id, None)
+        _DIAGRAM_CACHE.pop(diagram_id, None)
+        await asyncio.to_thread(_write_diagram_file, path, body)
     return {"id": diagram_id, "diagram": body}
 
 @app.get("/diagrams/{diagram_id}/classes")
 async def list_classes(diagram_id: str = Path(...)):
-    path = _diagram_path(diagram_id)
-    if not os.path.exists(path):
-        raise HTTPException(status_code=404, detail="Diagrama no encontrado")
-    crud = DiagramCRUD.load_from_file(path)
+    crud = _get_crud_or_404(diagram_id)
     return {"classes": crud.list_classes()}
 
 @app.post("/diagrams/{diagram_id}/classes")
 async def create_class(diagram_id: str, request: Request):
-    path = _diagram_path(diagram_id)
-    if not os.path.exists(path):
-        raise HTTPException(status_code=404, detail="Diagrama no encontrado")
-    body = await request.json()
+    body = await _read_json(request)
     class_name = body.get("name")
     attributes = body.get("attributes", [])
-    crud = DiagramCRUD.load_from_file(path)
-    new_cls = crud.create_class(class_name, attributes)
+    async with _diagram_lock(diagram_id):
+        crud = _get_crud_or_404(diagram_id)
+        new_cls = crud.create_class(class_name, attributes)
+        _mark_dirty(diagram_id, crud)
     # regenerar diagrama y devolver svg (fallback to PUML if generation fails)
-    try:
-        svg = regenerate_diagram_from_data(crud.diagram)
-        return {"class": new_cls, "svg": svg}
-    except Exception as e:
-        # return PlantUML source so front-end can still render or inspect
-        puml = _puml_from_data(crud.diagram, diagram_name=diagram_id)
-        return {"class": new_cls, "error": str(e), "puml": puml}
+    return {"class": new_cls, **await _svg_or_puml(crud.diagram, diagram_id)}
 
 @app.put("/diagrams/{diagram_id}/classes/{class_id}")
 async def update_class(diagram_id: str, class_id: str, request: Request):
-    path = _diagram_path(diagram_id)
-    if not os.path.exists(path):
-        raise HTTPException(status_code=404, detail="Diagrama no encontrado")
-    body = await request.json()
-    crud = DiagramCRUD.load_from_file(path)
-    updated = crud.update_class(class_id, body)
+    body = await _read_json(request)
+    async with _diagram_lock(diagram_id):
+        crud = _get_crud_or_404(diagram_id)
+        updated = crud.update_class(class_id, body)
+        _mark_dirty(diagram_id, crud)
     if not updated:
         raise HTTPException(status_code=404, detail="Clase no encontrada")
-    try:
-        svg = regenerate_diagram_from_data(crud.diagram)
-        return {"class": updated, "svg": svg}
-    except Exception as e:
-        puml = _puml_from_data(crud.diagram, diagram_name=diagram_id)
-        return {"class": updated, "error": str(e), "puml": puml}
+    return {"class": updated, **await _svg_or_puml(crud.diagram, diagram_id)}
 
 @app.delete("/diagrams/{diagram_id}/classes/{class_id}")
 async def delete_class(diagram_id: str, class_id: str):
-    path = _diagram_path(diagram_id)
-    if not os.path.exists(path):
-        raise HTTPException(status_code=404, detail="Diagrama no encontrado")
-    crud = DiagramCRUD.load_from_file(path)
-    ok = crud.delete_class(class_id)
+    async with _diagram_lock(diagram_id):
+        crud = _get_crud_or_404(diagram_id)
+        ok = crud.delete_class(class_id)
+        _mark_dirty(diagram_id, crud)
     if not ok:
         raise HTTPException(status_code=404, detail="Clase no encontrada")
-    try:
-        svg = regenerate_diagram_from_data(crud.diagram)
-        return {"deleted": ok, "svg": svg}
-    except Exception as e:
-        puml = _puml_from_data(crud.diagram, diagram_name=diagram_id)
-        return {"deleted": ok, "error": str(e), "puml": puml}
+    return {"deleted": ok, **await _svg_or_puml(crud.diagram, diagram_id)}
+
+def _log_regen_failure(task: asyncio.Task) -> None:
+    """Done-callback de la regeneración diferida del editor: registra el error en lugar de perderlo."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Fallo al regenerar el diagrama del editor", exc_info=task.exception())
+
 
 # WebSocket simple para ediciones en tiempo real (envía y recibe JSON con comandos CRUD)
 @app.websocket("/ws/editor/{diagram_id}")
 async def ws_editor(websocket: WebSocket, diagram_id: str):
     await websocket.accept()
-    path = _diagram_path(diagram_id)
-    if not os.path.exists(path):
-        await websocket.send_json({"error": "Diagrama no encontrado"})
+    try:
+        crud = _get_crud(diagram_id)
+    except (FileNotFoundError, ValueError):
+        await websocket.send_text(ERR_DIAGRAM_NOT_FOUND)
         await websocket.close()
         return
-    crud = DiagramCRUD.load_from_file(path)
+    pending_regen = None
+
+    async def _regen_later():
+        # espera a que termine la ráfaga de ediciones y regenera una sola vez
+        await asyncio.sleep(EDITOR_REGEN_DEBOUNCE)
+        await _send_json(websocket, await _svg_or_puml(crud.diagram, diagram_id))
+
+    def _schedule_regen():
+        nonlocal pending_regen
+        if pending_regen is not None:
+            pending_regen.cancel()
+        pending_regen = asyncio.create_task(_regen_later())
+        pending_regen.add_done_callback(_log_regen_failure)
+
     try:
-        async for msg in websocket.iter_text():
+        async for msg in _iter_frames(websocket):
             try:
-                payload = json.loads(msg)
+                payload = orjson.loads(msg)
                 cmd = payload.get("cmd")
                 if cmd == "add_class":
-                    new_cls = crud.create_class(payload.get("name"), payload.get("attributes", []))
-                    try:
-                        svg = regenerate_diagram_from_data(crud.diagram)
-                        await websocket.send_json({"ok": True, "class": new_cls, "svg": svg})
-                    except Exception as e:
-                        puml = _puml_from_data(crud.diagram, diagram_name=diagram_id)
-                        await websocket.send_json({"ok": True, "class": new_cls, "error": str(e), "puml": puml})
+                    async with _diagram_lock(diagram_id):
+                        new_cls = crud.create_class(payload.get("name"), payload.get("attributes", []))
+                        _mark_dirty(diagram_id, crud)
+                    await _send_json(websocket, {"ok": True, "class": new_cls})
+                    _schedule_regen()
                 elif cmd == "delete_class":
-                    ok = crud.delete_class(payload.get("class_id"))
-                    try:
-                        svg = regenerate_diagram_from_data(crud.diagram)
-                        await websocket.send_json({"ok": ok, "svg": svg})
-                    except Exception as e:
-                        puml = _puml_from_data(crud.diagram, diagram_name=diagram_id)
-                        await websocket.send_json({"ok": ok, "error": str(e), "puml": puml})
+                    async with _diagram_lock(diagram_id):
+                        ok = crud.delete_class(payload.get("class_id"))
+                        _mark_dirty(diagram_id, crud)
+                    await _send_json(websocket, {"ok": ok})
+                    _schedule_regen()
                 else:
-                    await websocket.send_json({"error": "Comando no soportado"})
+                    await websocket.send_text(ERR_UNSUPPORTED_CMD)
             except Exception as e:
-                await websocket.send_json({"error": str(e)})
+                await _send_json(websocket, {"error": str(e)})
     finally:
-        await websocket.close()
-
-@app.post("/uml")
-async def process_uml(request: Request):
+        if pending_regen is not None:
+            pending_regen.cancel()
+        # persistir la sesión de edición al cerrar el socket (la escritura, fuera del event loop)
+        await _flush_diagram_in_thread(diagram_id)
+        await _close_ws(websocket)
+
+async def _svg_from_request(request: Request) -> str:
+    """Valida el cuerpo de la petición y devuelve su SVG; traduce los fallos a HTTPException."""
+    raw = await _read_body(request)
     try:
-        data = await request.json()
-        # Determinar esquema apropiado según el contenido; si no hay esquema, omitir validación
-        schema = _get_schema_for_data(data)
-        if schema is not None:
-            validate(instance=data, schema=schema)
-        config = {
-            # prefer a path relative to this module so the service works regardless of CWD
-            "plant_uml_path": os.path.join(os.path.dirname(__file__), "plant_uml_exc"),
-            "plant_uml_version": "plantuml-1.2025.2.jar",
-            "json_path": None,
-            "output_path": os.path.join(os.getcwd(), "output"),
-            "diagram_name": "output",
-        }
-        json_puml = JsonPuml(config=config)
-        json_puml._data = data
-        json_puml._code = json_puml._json_to_plantuml()
-        json_puml.generate_diagram()
-        svg_path = os.path.join(config["output_path"], config["diagram_name"] + ".svg")
-        if not os.path.exists(svg_path):
-            raise HTTPException(status_code=500, detail="No se pudo generar el archivo SVG.")
-        with open(svg_path, "r", encoding="utf-8") as f:
-            svg_content = f.read()
-        return {"svg": svg_content}
-    except ValidationError as e:
-        raise HTTPException(status_code=400, detail=str(e.message))
+        # parseo + validación en una pasada; si no hay esquema para diagramType, se omite la validación
+        data = parse_uml_payload(raw)
+        svg_content = await _cached_svg(data)
+    except PayloadValidationError as e:
+        raise HTTPException(status_code=400, detail=validation_message(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {e}")
+    if svg_content is None:
+        raise HTTPException(status_code=500, detail="No se pudo generar el archivo SVG.")
+    return svg_content
+
+@app.post("/uml")
+async def process_uml(request: Request):
+    return {"svg": await _svg_from_request(request)}
+
+@app.post("/uml/svg")
+async def process_uml_svg(request: Request):
+    """Igual que /uml pero devuelve el SVG crudo (image/svg+xml), sin escaparlo dentro de un JSON."""
+    return Response(content=await _svg_from_request(request), media_type="image/svg+xml")
 
 @app.websocket("/ws/audio")
 async def websocket_audio(websocket: WebSocket):
     await websocket.accept()
     try:
         # Por ahora no procesamos audio raw en este endpoint (requiere STT). Devolver mensaje claro.
-        await websocket.send_json({"error": "Audio input not supported on this endpoint yet. Send text via /chat or implement STT."})
+        await websocket.send_text(ERR_AUDIO_UNSUPPORTED)
     except Exception as e:
-        await websocket.send_json({"error": str(e)})
+        await _send_json(websocket, {"error": str(e)})
     finally:
-        await websocket.close()
+        await _close_ws(websocket)
 
 @app.websocket("/ws/generate-diagram")
 async def websocket_generate_diagram(websocket: WebSocket):
+    """
+    Recibe el JSON del diagrama y responde {"svg": ...}. Con ?format=binary el SVG
+    se envía como frame binario (UTF-8) en lugar de un string dentro de un JSON.
+    """
     await websocket.accept()
+    binary = websocket.query_params.get("format") == "binary"
     try:
-        data = await websocket.receive_json()
-        schema = _get_schema_for_data(data)
-        if schema is not None:
-            jsonschema.validate(instance=data, schema=schema)
-        config = {
-            "plant_uml_path": os.path.join(os.getcwd(), "plant_uml_exc"),
-            "plant_uml_version": "plantuml-1.2025.2.jar",
-            "json_path": None,
-            "output_path": os.path.join(os.getcwd(), "output"),
-            "diagram_name": "output",
-        }
-        json_puml = JsonPuml(config=config)
-        json_puml._data = data
-        json_puml._code = json_puml._json_to_plantuml()
-        json_puml.generate_diagram()
-        svg_path = os.path.join(config["output_path"], config["diagram_name"] + ".svg")
-        if not os.path.exists(svg_path):
-            await websocket.send_json({"error": "No se pudo generar el archivo SVG."})
+        raw = await websocket.receive_text()
+        if len(raw) > MAX_MESSAGE_BYTES:
+            await websocket.close(code=WS_CLOSE_TOO_BIG)
+            return
+        data = parse_uml_payload(raw)
+        svg_content = await _cached_svg(data)
+        if svg_content is None:
+            await websocket.send_text(ERR_SVG_NOT_GENERATED)
+        elif binary:
+            await websocket.send_bytes(svg_content.encode("utf-8"))
         else:
-            with open(svg_path, "r", encoding="utf-8") as f:
-                svg_content = f.read()
-            await websocket.send_json({"svg": svg_content})
-    except jsonschema.ValidationError as e:
-        await websocket.send_json({"error": f" Entrada no válida: {e.message}"})
+            await _send_json(websocket, {"svg": svg_content})
+    except PayloadValidationError as e:
+        await _send_json(websocket, {"error": f" Entrada no válida: {validation_message(e)}"})
     except Exception as e:
-        await websocket.send_json({"error": f"Error al generar el diagrama: {e}"})
+        await _send_json(websocket, {"error": f"Error al generar el diagrama: {e}"})
     finally:
-        await websocket.close()
+        await _close_ws(websocket)
+
+
+async def _classify_and_generate(text: str, user_id: str) -> dict:
+    """classify_and_generate_diagram en un hilo; comparte output/output.svg con _render_svg."""
+    async with PLANTUML_SEM:
+        return await asyncio.to_thread(classify_and_generate_diagram, text, None, user_id=user_id)
+
+
+def _needs_llm(intent_result: dict) -> bool:
+    intent = intent_result.get("intent")
+    confidence = intent_result.get("confidence", 0.0)
+    return intent in ("ambiguous", "unknown", None) or confidence < LLM_FALLBACK_CONFIDENCE
+
+
+async def _analyze_with_llm(user_id: str, text: str, is_follow_up: bool):
+    """
+    Ejecuta el clasificador en un hilo mientras la consulta al LLM arranca de forma
+    especulativa. Devuelve (intent_result, llm_task); si el clasificador está seguro
+    la tarea del LLM se cancela y se devuelve None en su lugar.
+    """
+    llm_task = asyncio.create_task(ask_llm_for_diagram_type(text))
+    # evitar avisos de "exception was never retrieved" si la tarea se descarta
+    llm_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    try:
+        intent_result = await asyncio.to_thread(
+            diagram_classifier.analyze_conversation, user_id, text, is_follow_up
+        )
+    except BaseException:
+        llm_task.cancel()
+        raise
+    if not _needs_llm(intent_result):
+        llm_task.cancel()
+        return intent_result, None
+    return intent_result, llm_task
+
+
+async def _process_chat_text(text: str, user_id: str, is_follow_up: bool):
+    """
+    Flujo común de /chat y /ws/chat: clasificador -> (LLM si hace falta) -> generación.
+    Devuelve (payload, status_code); el status sólo lo usa el endpoint HTTP.
+    """
+    # como mucho USER_CHAT_CONCURRENCY peticiones por usuario; el resto espera en cola
+    async with _USER_SEM.hold(user_id):
+        return await _process_chat_text_locked(text, user_id, is_follow_up)
+
+
+async def _process_chat_text_locked(text: str, user_id: str, is_follow_up: bool):
+    # Analizar con el clasificador en memoria; el LLM arranca en paralelo
+    try:
+        # pasar is_follow_up para que el clasificador use refuerzo contextual
+        intent_result, llm_task = await _analyze_with_llm(user_id, text, is_follow_up)
+    except Exception as e:
+        return {"error": f"Classifier error: {e}"}, 500
+
+    # Si es ambiguous/unknown o baja confianza -> preguntar al LLM
+    if llm_task is not None:
+        try:
+            llm_decision = await llm_task
+        except Exception as e:
+            return {"analysis": intent_result, "error": f"LLM error: {e}"}, 500
+
+        if llm_decision.get("resolved") and llm_decision.get("diagram_type"):
+            # LLM resolvió: generar diagrama usando el flujo existente
+            result = await _classify_and_generate(text, user_id)
+            # incluir la decisión del LLM en el análisis
+            result.setdefault("analysis", intent_result)["llm_decision"] = llm_decision
+            return result, 200
+        # Devolver la pregunta sugerida para que el frontend la muestre al usuario
+        return {
+            "text": text,
+            "analysis": intent_result,
+            "clarify": llm_decision.get("question") or "¿Quieres un diagrama de clases o un diagrama de casos de uso?",
+            "llm_raw": llm_decision.get("raw")
+        }, 200
+
+    # Si hay intención clara y confianza suficiente, intentar generar diagrama
+    return await _classify_and_generate(text, user_id), 200
 
 
 @app.websocket("/ws/chat/{user_id}")
@@ -285,53 +778,25 @@ async def ws_chat(websocket: WebSocket, user_id: str):
     """
     await websocket.accept()
     try:
-        async for raw in websocket.iter_text():
+        async for raw in _iter_frames(websocket):
             try:
-                payload = json.loads(raw)
+                payload = orjson.loads(raw)
                 text = payload.get("text", "")
                 follow_up = bool(payload.get("follow_up", False))
 
                 if not text or not text.strip():
-                    await websocket.send_json({"error": "No text provided"})
+                    await websocket.send_text(ERR_NO_TEXT)
                     continue
 
-                # Analizar con el clasificador (pasar follow_up)
-                intent_result = diagram_classifier.analyze_conversation(user_id, text, is_follow_up=follow_up)
-                intent = intent_result.get("intent")
-                confidence = intent_result.get("confidence", 0.0)
-
-                # Si ambiguous/unknown o baja confianza -> consultar LLM
-                if intent in ("ambiguous", "unknown", None) or confidence < LLM_FALLBACK_CONFIDENCE:
-                    try:
-                        llm_decision = await ask_llm_for_diagram_type(text)
-                    except Exception as e:
-                        await websocket.send_json({"analysis": intent_result, "error": f"LLM error: {e}"})
-                        continue
-
-                    if llm_decision.get("resolved") and llm_decision.get("diagram_type"):
-                        # LLM resolvió: generar diagrama
-                        result = classify_and_generate_diagram(text, None, user_id=user_id)
-                        result.setdefault("analysis", intent_result)["llm_decision"] = llm_decision
-                        await websocket.send_json(result)
-                    else:
-                        # Enviar pregunta de clarificación al cliente
-                        await websocket.send_json({
-                            "text": text,
-                            "analysis": intent_result,
-                            "clarify": llm_decision.get("question") or "¿Quieres un diagrama de clases o un diagrama de casos de uso?",
-                            "llm_raw": llm_decision.get("raw")
-                        })
-                else:
-                    # Intención clara: intentar generar diagrama
-                    result = classify_and_generate_diagram(text, None, user_id=user_id)
-                    await websocket.send_json(result)
+                result, _status = await _process_chat_text(text, user_id, follow_up)
+                await _send_json(websocket, result)
 
-            except json.JSONDecodeError:
-                await websocket.send_json({"error": "Invalid JSON"})
+            except orjson.JSONDecodeError:
+                await websocket.send_text(ERR_INVALID_JSON)
             except Exception as e:
-                await websocket.send_json({"error": str(e)})
+                await _send_json(websocket, {"error": str(e)})
     finally:
-        await websocket.close()
+        await _close_ws(websocket)
 
 
 @app.post("/chat")
@@ -341,128 +806,44 @@ async def chat_text(request: Request):
     - Si el clasificador está seguro, intenta generar el diagrama.
     - Si es ambiguous/unknown o la confianza es baja, consulta al LLM y devuelve una pregunta de clarificación o genera si el LLM resuelve.
     """
-    # leer body: soporta text/plain o application/json
-    content_type = request.headers.get("content-type", "")
-    if "application/json" in content_type:
-        body = await request.json()
-        # soportar respuesta de aclaración: {"clarify_answer": "..."} o {"follow_up": true, "text": "..."}
-        clarify_answer = body.get("clarify_answer")
-        follow_up_flag = bool(body.get("follow_up"))
-        text = clarify_answer or body.get("text")
-        user_id = body.get("user_id", request.headers.get("X-User-Id", "web_user"))
+    # leer body una sola vez: soporta text/plain o application/json
+    raw = await _read_body(request)
+    if "application/json" in request.headers.get("content-type", ""):
+        body = orjson.loads(raw) if raw else {}
     else:
-        raw = await request.body()
-        text = raw.decode("utf-8") if raw else ""
-        user_id = request.headers.get("X-User-Id", "web_user")
+        body = {"text": raw.decode("utf-8") if raw else ""}
 
-    is_follow_up = False
-    # Si el cliente indica que esto es una respuesta a la aclaración, marcar follow-up
-    if "application/json" in content_type:
-        if clarify_answer or follow_up_flag:
-            is_follow_up = True
+    # soportar respuesta de aclaración: {"clarify_answer": "..."} o {"follow_up": true, "text": "..."}
+    clarify_answer = body.get("clarify_answer")
+    is_follow_up = bool(clarify_answer or body.get("follow_up"))
+    text = clarify_answer or body.get("text")
+    user_id = body.get("user_id", request.headers.get("X-User-Id", "web_user"))
 
     if not text or not text.strip():
-        return JSONResponse({"error": "No text provided"}, status_code=400)
-
-    # Analizar con el clasificador en memoria
-    try:
-        # pasar is_follow_up para que el clasificador use refuerzo contextual
-        intent_result = diagram_classifier.analyze_conversation(user_id, text, is_follow_up)
-    except Exception as e:
-        return JSONResponse({"error": f"Classifier error: {e}"}, status_code=500)
-
-    intent = intent_result.get("intent")
-    confidence = intent_result.get("confidence", 0.0)
-
-    # Si es ambiguous/unknown o baja confianza -> preguntar al LLM
-    if intent in ("ambiguous", "unknown", None) or confidence < LLM_FALLBACK_CONFIDENCE:
-        try:
-            llm_decision = await ask_llm_for_diagram_type(text)
-        except Exception as e:
-            return JSONResponse({"analysis": intent_result, "error": f"LLM error: {e}"}, status_code=500)
-
-        if llm_decision.get("resolved") and llm_decision.get("diagram_type"):
-            # LLM resolvió: generar diagrama usando el flujo existente
-            result = classify_and_generate_diagram(text, None, user_id=user_id)
-            # incluir la decisión del LLM en el análisis
-            result.setdefault("analysis", intent_result)["llm_decision"] = llm_decision
-            return JSONResponse(result)
-        else:
-            # Devolver la pregunta sugerida para que el frontend la muestre al usuario
-            return JSONResponse({
-                "text": text,
-                "analysis": intent_result,
-                "clarify": llm_decision.get("question") or "¿Quieres un diagrama de clases o un diagrama de casos de uso?",
-                "llm_raw": llm_decision.get("raw")
-            })
-
-    # Si hay intención clara y confianza suficiente, intentar generar diagrama
-    result = classify_and_generate_diagram(text, None, user_id=user_id)
-    return JSONResponse(result)
-
-def regenerate_diagram_from_data(diagram_data: dict, user_id="default") -> str:
-    """
-    Recibe un JSON completo del diagrama, lo valida con el esquema apropiado,
-    genera el diagrama via JsonPuml y devuelve el contenido SVG (string) o
-    lanza excepción en caso de error.
-    """
-    # Normalizar formatos antiguos -> nuevo esquema esperado por el decoder
-    data = dict(diagram_data)  # shallow copy to avoid mutating caller
-
-    # If repo stored classes under "classes" (OperationCRUD) convert to "declaringElements"
-    if data.get("diagramType") == "classDiagram" and "declaringElements" not in data and "classes" in data:
-        declaring = []
-        for cls in data.get("classes", []):
-            attrs = []
-            for a in cls.get("attributes", []):
-                attrs.append({
-                    "name": a.get("name"),
-                    "type": a.get("type", "String"),
-                    "visibility": a.get("visibility", "public"),
-                    "isStatic": a.get("isStatic", False),
-                    "isFinal": a.get("isFinal", False)
-                })
-            methods = []
-            for m in cls.get("methods", []):
-                methods.append({
-                    "name": m.get("name"),
-                    "returnType": m.get("returnType", "void"),
-                    "visibility": m.get("visibility", "public"),
-                    "isAbstract": m.get("isAbstract", False),
-                    "params": m.get("params", [])
-                })
-            declaring.append({
-                "type": "class",
-                "name": cls.get("name"),
-                "attributes": attrs,
-                "methods": methods
-            })
-        data["declaringElements"] = declaring
-        # map relationships key if present
-        if "relationships" in data and "relationShips" not in data:
-            data["relationShips"] = data.pop("relationships")
-        data.setdefault("relationShips", [])
-
-    # Validate using local loaded SCHEMAS if available
-    schema = _get_schema_for_data(data)
-    if schema is not None:
-        validate(instance=data, schema=schema)
-        module_dir = os.path.dirname(__file__)
-        config = {
-            "plant_uml_path": os.path.join(module_dir, "plant_uml_exc"),
-            "plant_uml_version": "plantuml-1.2025.2.jar",
-            "json_path": None,
-            "output_path": os.path.join(module_dir, "output"),
-            "diagram_name": f"diagram_{user_id}"
-        }
-    config["data"] = data
-    json_puml = JsonPuml(config=config)
-    json_puml._data = data
-    json_puml._code = json_puml._json_to_plantuml()
-    json_puml.generate_diagram()
-    svg_path = os.path.join(config["output_path"], config["diagram_name"] + ".svg")
-    if not os.path.exists(svg_path):
-        raise HTTPException(status_code=500, detail="No se pudo generar el archivo SVG.")
-    with open(svg_path, "r", encoding="utf-8") as f:
-        svg_content = f.read()
-    return svg_content
\ No newline at end of file
+        return Response(content=ERR_NO_TEXT_BYTES, media_type="application/json", status_code=400)
+
+    result, status = await _process_chat_text(text, user_id, is_follow_up)
+    return ORJSONResponse(result, status_code=status)
+
+
+def main():
+    """Arranca la API con uvicorn (uvloop/httptools si están instalados)."""
+    import uvicorn
+    from importlib.util import find_spec
+    loop = "uvloop" if find_spec("uvloop") else "auto"
+    http = "httptools" if find_spec("httptools") else "auto"
+    # Un solo worker por defecto: las cachés de diagramas y los cambios pendientes de guardar son por proceso
+    uvicorn.run(
+        "ChatbotBack_End.API_SERVICE:app",
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", "8000")),
+        loop=loop,
+        http=http,
+        workers=int(os.environ.get("WEB_CONCURRENCY", "1")),
+        ws_max_size=MAX_MESSAGE_BYTES,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
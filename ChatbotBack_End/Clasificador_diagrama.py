@@ -1,5 +1,64 @@
+import copy
+import itertools
 import re
+import threading
+from collections import OrderedDict, deque
+from functools import lru_cache
 from typing import Dict, List, Optional
+try:
+    # autómata Aho-Corasick: encuentra todas las keywords en una sola pasada sobre el texto
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Límites del contexto conversacional: mensajes recordados por usuario (main.py los relee
+# para recuperar clases/actores mencionados antes), confianzas recientes y usuarios en memoria
+MAX_CONTEXT_MESSAGES = 20
+MAX_CONFIDENCE_HISTORY = 10
+MAX_CONVERSATIONS = 10000
+# Confianza del análisis básico a partir de la cual no se ejecutan los demás análisis
+SHORT_CIRCUIT_CONFIDENCE = 0.9
+
+# Patrones de _semantic_analysis compilados una sola vez. Cada uno va con los literales que
+# exige (al menos uno debe estar en el texto): si no aparece ninguno, se evita lanzar el regex.
+# Todos empiezan en \b para no reintentar desde cada carácter de una palabra larga, y el de
+# métodos no recorre `[^)]*` con el regex: basta con que haya un ')' tras el '(' encontrado
+# (el tercer elemento), lo que evita el coste cuadrático con muchos '(' sin cerrar.
+_CLASS_PATTERNS = (
+    (('{',), re.compile(r'\b(clase|class)\s+\w+\s*\{'), None),  # "clase Usuario {"
+    (('public', 'private', 'protected'), re.compile(r'\b(public|private|protected)\s+\w+'), None),  # modificadores de acceso
+    (('(',), re.compile(r'\b\w+\s+\w+\s*\('), ')'),  # declaraciones de métodos: "tipo nombre(...)"
+    (('extends', 'implements'), re.compile(r'\b(extends|implements)\b'), None),  # herencia/implementación
+)
+_USECASE_PATTERNS = (
+    (('actor', 'usuario'), re.compile(r'\b(actor|usuario)\s+\w+'), None),  # "actor Cliente"
+    (('caso de uso', 'use case'), re.compile(r'\b(caso de uso|use case)\s+\w+'), None),  # "caso de uso Login"
+    (('puede',), re.compile(r'\b(puede|pueden)\s+\w+'), None),  # "los usuarios pueden realizar X"
+    (('sistem',), re.compile(r'\b(sistema|sistem)\s+\w+'), None),  # "el sistema debe hacer X"
+)
+
+
+# Intenciones que pueden devolver los análisis individuales y su índice en _combine_analyses
+# ('ambiguous' llega vía el análisis contextual, que repite la última intención del usuario)
+_INTENTS = ('diagrama_clases', 'diagrama_casos_uso', 'unknown', 'ambiguous')
+_INTENT_INDEX = {intent: i for i, intent in enumerate(_INTENTS)}
+
+# Posición de cada contador fijo en la lista que devuelve _score_terms
+# (a continuación van los pares industria / términos fuertes de la industria)
+_CLASS_SCORE, _USECASE_SCORE, _DECISIVE_CLASS, _DECISIVE_USECASE = range(4)
+
+
+def _pattern_found(literals, pattern, closing, text_lower: str) -> bool:
+    if not any(lit in text_lower for lit in literals):
+        return False
+    match = pattern.search(text_lower)
+    if match is None:
+        return False
+    # el primer '(' encontrado es el más temprano: si no hay ')' después, no lo hay para ninguno
+    return closing is None or text_lower.find(closing, match.end()) != -1
+
+def _count_patterns(patterns, text_lower: str) -> int:
+    return sum(1 for literals, pattern, closing in patterns if _pattern_found(literals, pattern, closing, text_lower))
 
 class AdvancedDiagramClassifier:
     """
@@ -12,9 +71,23 @@ class AdvancedDiagramClassifier:
     - Baja latencia y alta precisión para textos técnicos
     - Sin dependencias externas pesadas
     """
+
+    # sin __dict__ por instancia; todo atributo nuevo de __init__ debe añadirse aquí
+    __slots__ = (
+        'conversation_context', 'domain_keywords', 'industry_context', 'decisive_terms',
+        'industry_preference', 'strong_industry_terms', 'confidence_thresholds',
+        '_industry_buckets', '_term_buckets', '_bucket_count', '_industry_bits',
+        '_all_terms', '_automaton', '_active_count', '_lock',
+    )
     
     def __init__(self):
-        self.conversation_context = {}
+        # user_id -> contexto, en orden de uso; se descartan los menos recientes (MAX_CONVERSATIONS)
+        self.conversation_context = OrderedDict()
+        # usuarios con más de una interacción; se mantiene al crear, descartar o limpiar contextos
+        self._active_count = 0
+        # el servicio clasifica desde varios hilos (asyncio.to_thread) a la vez: el lock protege
+        # conversation_context y _active_count, que cada análisis lee y modifica
+        self._lock = threading.Lock()
         
         # Modelo de lenguaje mejorado con contexto
         self.domain_keywords = {
@@ -58,12 +131,80 @@ class AdvancedDiagramClassifier:
             ]
         }
         
+        # Términos decisivos (alta especificidad) por tipo de diagrama
+        self.decisive_terms = {
+            'diagrama_clases': [
+                'clase', 'atributo', 'método', 'herencia', 'polimorfismo',
+                'encapsulamiento', 'interface', 'implementación'
+            ],
+            'diagrama_casos_uso': [
+                'actor', 'caso de uso', 'interactúa', 'funcionalidad', 'escenario',
+                'requisito funcional'
+            ]
+        }
+        
+        # Mapeo industria -> preferencia de diagrama
+        self.industry_preference = {
+            'software': 'diagrama_clases',
+            'business': 'diagrama_casos_uso', 
+            'education': 'diagrama_clases',
+            'database': 'diagrama_clases'
+        }
+        
+        # Términos fuertes de cada industria (dan un boost de confianza)
+        self.strong_industry_terms = {
+            'software': ['código', 'programa', 'desarrollo'],
+            'business': ['negocio', 'cliente', 'venta'],
+            'education': ['curso', 'estudiante', 'profesor'],
+            'database': ['tabla', 'registro', 'consulta']
+        }
+        
+        # Índice inverso término -> contadores a los que suma. Las keywords se buscan una sola vez
+        # por texto (_matched_terms) y todos los contadores se llenan en una pasada (_score_terms)
+        buckets = [
+            self.domain_keywords['class_domain'], self.domain_keywords['usecase_domain'],
+            self.decisive_terms['diagrama_clases'], self.decisive_terms['diagrama_casos_uso'],
+        ]
+        # industria -> (contador de keywords, contador de términos fuertes)
+        self._industry_buckets = {}
+        for industry, keywords in self.industry_context.items():
+            self._industry_buckets[industry] = (len(buckets), len(buckets) + 1)
+            buckets += [keywords, self.strong_industry_terms[industry]]
+        self._term_buckets = {}
+        for bucket_id, terms in enumerate(buckets):
+            for term in set(terms):
+                self._term_buckets.setdefault(term, []).append(bucket_id)
+        self._bucket_count = len(buckets)
+        # industria -> bit de conversation_context[...]['industry_hints'] (un int, no un set)
+        self._industry_bits = {industry: 1 << i for i, industry in enumerate(self.industry_context)}
+        self._all_terms = frozenset(self._term_buckets)
+        self._automaton = None
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for term in self._all_terms:
+                self._automaton.add_word(term, term)
+            self._automaton.make_automaton()
+
         self.confidence_thresholds = {
             'initial': 0.6,
             'with_context': 0.75,
             'high_confidence': 0.85
         }
 
+    def _matched_terms(self, text_lower: str) -> frozenset:
+        """Keywords (de cualquier dominio o industria) que aparecen en el texto."""
+        if self._automaton is not None:
+            return frozenset(term for _end, term in self._automaton.iter(text_lower))
+        return frozenset(term for term in self._all_terms if term in text_lower)
+
+    def _score_terms(self, found: frozenset) -> List[int]:
+        """Cuántas keywords de cada lista (dominio, decisivos, industria...) hay en `found`."""
+        scores = [0] * self._bucket_count
+        for term in found:
+            for bucket_id in self._term_buckets[term]:
+                scores[bucket_id] += 1
+        return scores
+
     def analyze_conversation(self, user_id: str, text: str, is_follow_up: bool = False) -> Dict:
         """
         Analiza el texto considerando el contexto de la conversación y determina
@@ -81,26 +222,42 @@ class AdvancedDiagramClassifier:
             - method: Método utilizado para la clasificación
             - supporting_analyses: Número de análisis que apoyan la decisión
         """
-        # Inicializar contexto si es nuevo usuario
-        if user_id not in self.conversation_context:
-            self.conversation_context[user_id] = {
-                'messages': [],
-                'detected_domain': None,
-                'confidence_history': [],
-                'last_intent': None,
-                'industry_hints': set(),
-                'interaction_count': 0
-            }
+        with self._lock:
+            return self._analyze_locked(user_id, text, is_follow_up)
+
+    def _analyze_locked(self, user_id: str, text: str, is_follow_up: bool) -> Dict:
+        # Inicializar contexto si es nuevo usuario (una sola búsqueda en el dict)
+        context = self.conversation_context.get(user_id)
+        if context is None:
+            context = self.conversation_context[user_id] = self._new_context()
+            if len(self.conversation_context) > MAX_CONVERSATIONS:
+                _, evicted = self.conversation_context.popitem(last=False)
+                if evicted['interaction_count'] > 1:
+                    self._active_count -= 1
+        else:
+            self.conversation_context.move_to_end(user_id)
         
-        context = self.conversation_context[user_id]
         context['messages'].append(text)
         context['interaction_count'] += 1
+        if context['interaction_count'] == 2:
+            self._active_count += 1
+        
+        # Análisis multi-nivel: el texto se pasa a minúsculas y se buscan las keywords una sola vez
+        text_lower = text.lower()
+        scores = self._score_terms(self._matched_terms(text_lower))
+        basic_analysis = self._basic_intent_detection(scores)
         
-        # Análisis multi-nivel
-        basic_analysis = self._basic_intent_detection(text)
-        contextual_analysis = self._contextual_analysis(text, context)
-        industry_analysis = self._industry_analysis(text)
-        semantic_analysis = self._semantic_analysis(text)
+        # Términos decisivos (o densidad muy clara) fuera de un seguimiento y sin contradecir la
+        # intención previa del usuario: basta con el análisis básico y se omiten los demás
+        if (basic_analysis['confidence'] >= SHORT_CIRCUIT_CONFIDENCE and not is_follow_up
+                and context['last_intent'] in (None, basic_analysis['intent'])):
+            final_result = {**basic_analysis, 'method': 'basic_short_circuit', 'supporting_analyses': 1}
+            self._update_conversation_context(context, final_result, {'method': 'skipped'})
+            return final_result
+        
+        contextual_analysis = self._contextual_analysis(scores, context)
+        industry_analysis = self._industry_analysis(scores)
+        semantic_analysis = self._semantic_analysis(text_lower)
         
         # Combinar análisis
         final_result = self._combine_analyses(
@@ -108,32 +265,32 @@ class AdvancedDiagramClassifier:
         )
         
         # Actualizar contexto
-        self._update_conversation_context(user_id, final_result, industry_analysis)
+        self._update_conversation_context(context, final_result, industry_analysis)
         
         return final_result
 
-    def _basic_intent_detection(self, text: str) -> Dict:
+    @staticmethod
+    def _new_context() -> Dict:
+        """Contexto vacío de un usuario nuevo"""
+        return {
+            'messages': deque(maxlen=MAX_CONTEXT_MESSAGES),
+            'detected_domain': None,
+            'confidence_history': deque(maxlen=MAX_CONFIDENCE_HISTORY),
+            'last_intent': None,
+            'industry_hints': 0,
+            'interaction_count': 0
+        }
+
+    def _basic_intent_detection(self, scores: List[int]) -> Dict:
         """Detección básica de intención basada en palabras clave"""
-        text_lower = text.lower()
-        
+
         # Contar ocurrencias por dominio
-        class_score = sum(1 for word in self.domain_keywords['class_domain'] if word in text_lower)
-        usecase_score = sum(1 for word in self.domain_keywords['usecase_domain'] if word in text_lower)
+        class_score = scores[_CLASS_SCORE]
+        usecase_score = scores[_USECASE_SCORE]
         
         # Detectar términos decisivos (alta especificidad)
-        decisive_terms = {
-            'diagrama_clases': [
-                'clase', 'atributo', 'método', 'herencia', 'polimorfismo',
-                'encapsulamiento', 'interface', 'implementación'
-            ],
-            'diagrama_casos_uso': [
-                'actor', 'caso de uso', 'interactúa', 'funcionalidad', 'escenario',
-                'requisito funcional'
-            ]
-        }
-        
-        decisive_class = any(term in text_lower for term in decisive_terms['diagrama_clases'])
-        decisive_usecase = any(term in text_lower for term in decisive_terms['diagrama_casos_uso'])
+        decisive_class = scores[_DECISIVE_CLASS] > 0
+        decisive_usecase = scores[_DECISIVE_USECASE] > 0
         
         # Si hay términos decisivos de un tipo sin términos del otro tipo
         if decisive_class and not decisive_usecase:
@@ -160,7 +317,7 @@ class AdvancedDiagramClassifier:
         
         return {'intent': 'unknown', 'confidence': 0.4, 'method': 'basic_analysis'}
 
-    def _contextual_analysis(self, text: str, context: Dict) -> Dict:
+    def _contextual_analysis(self, scores: List[int], context: Dict) -> Dict:
         """Análisis considerando el contexto de la conversación previa"""
         # Si no hay contexto previo, no podemos hacer análisis contextual
         if not context['detected_domain'] and context['interaction_count'] <= 1:
@@ -169,20 +326,17 @@ class AdvancedDiagramClassifier:
         previous_intent = context['last_intent']
         if previous_intent and previous_intent != 'unknown':
             # Verificar consistencia con contexto
-            text_lower = text.lower()
-            relevant_terms = self.domain_keywords[
-                'class_domain' if previous_intent == 'diagrama_clases' else 'usecase_domain'
+            term_matches = scores[
+                _CLASS_SCORE if previous_intent == 'diagrama_clases' else _USECASE_SCORE
             ]
             
-            term_matches = sum(1 for term in relevant_terms if term in text_lower)
-            
             if term_matches > 0:
                 # Boost basado en número de términos coincidentes e historial
                 confidence_boost = min(0.4, term_matches * 0.1)
                 
                 # Boost adicional por historial consistente
                 if len(context['confidence_history']) > 1:
-                    recent_confidences = context['confidence_history'][-3:]  # Últimas 3 interacciones
+                    recent_confidences = list(context['confidence_history'])[-3:]  # Últimas 3 interacciones
                     avg_recent_confidence = sum(recent_confidences) / len(recent_confidences)
                     if avg_recent_confidence > 0.7:
                         confidence_boost += 0.1
@@ -196,75 +350,40 @@ class AdvancedDiagramClassifier:
         
         return {'intent': 'unknown', 'confidence': 0.0, 'method': 'context_analysis'}
 
-    def _industry_analysis(self, text: str) -> Dict:
+    def _industry_analysis(self, scores: List[int]) -> Dict:
         """Análisis de contexto de industria para inferir tipo de diagrama"""
-        text_lower = text.lower()
-        industry_scores = {}
+        # Industria predominante en una sola pasada (ante empate gana la primera)
+        primary_industry, max_score = None, 0
+        for industry, (score_id, _strong_id) in self._industry_buckets.items():
+            score = scores[score_id]
+            if score > max_score:
+                primary_industry, max_score = industry, score
         
-        for industry, keywords in self.industry_context.items():
-            industry_scores[industry] = sum(1 for keyword in keywords if keyword in text_lower)
-        
-        # Encontrar industria predominante
-        primary_industry = max(industry_scores, key=industry_scores.get)
-        max_score = industry_scores[primary_industry]
-        
-        if max_score > 0:
-            # Mapeo industria -> preferencia de diagrama
-            industry_preference = {
-                'software': 'diagrama_clases',
-                'business': 'diagrama_casos_uso', 
-                'education': 'diagrama_clases',
-                'database': 'diagrama_clases'
-            }
-            
-            preferred_intent = industry_preference.get(primary_industry, 'unknown')
-            
-            # Calcular confianza basada en score y presencia de términos clave
-            base_confidence = min(0.7, max_score * 0.15)
-            
-            # Boost si hay términos fuertes de la industria
-            strong_industry_terms = {
-                'software': ['código', 'programa', 'desarrollo'],
-                'business': ['negocio', 'cliente', 'venta'],
-                'education': ['curso', 'estudiante', 'profesor'],
-                'database': ['tabla', 'registro', 'consulta']
-            }
-            
-            strong_terms_count = sum(1 for term in strong_industry_terms.get(primary_industry, []) 
-                                   if term in text_lower)
-            if strong_terms_count > 0:
-                base_confidence += 0.1
-            
-            return {
-                'intent': preferred_intent,
-                'confidence': base_confidence,
-                'method': f'industry_{primary_industry}'
-            }
+        if max_score == 0:
+            return {'intent': 'unknown', 'confidence': 0.0, 'method': 'industry_analysis'}
         
-        return {'intent': 'unknown', 'confidence': 0.0, 'method': 'industry_analysis'}
-
-    def _semantic_analysis(self, text: str) -> Dict:
-        """Análisis semántico basado en patrones y estructura del texto"""
-        text_lower = text.lower()
+        preferred_intent = self.industry_preference.get(primary_industry, 'unknown')
         
-        # Patrones que indican diagrama de clases
-        class_patterns = [
-            r'\b(clase|class)\s+\w+\s*\{',  # "clase Usuario {"
-            r'\b(public|private|protected)\s+\w+',  # modificadores de acceso
-            r'\w+\s+\w+\s*\([^)]*\)',  # declaraciones de métodos
-            r'\b(extends|implements)\b',  # herencia/implementación
-        ]
+        # Calcular confianza basada en score y presencia de términos clave
+        base_confidence = min(0.7, max_score * 0.15)
         
-        # Patrones que indican diagrama de casos de uso
-        usecase_patterns = [
-            r'\b(actor|usuario)\s+\w+',  # "actor Cliente"
-            r'\b(caso de uso|use case)\s+\w+',  # "caso de uso Login"
-            r'\b(puede|pueden)\s+\w+',  # "los usuarios pueden realizar X"
-            r'\b(sistema|sistem)\s+\w+',  # "el sistema debe hacer X"
-        ]
+        # Boost si hay términos fuertes de la industria
+        if scores[self._industry_buckets[primary_industry][1]] > 0:
+            base_confidence += 0.1
         
-        class_pattern_matches = sum(1 for pattern in class_patterns if re.search(pattern, text_lower))
-        usecase_pattern_matches = sum(1 for pattern in usecase_patterns if re.search(pattern, text_lower))
+        return {
+            'intent': preferred_intent,
+            'confidence': base_confidence,
+            'method': f'industry_{primary_industry}',
+            'industry': primary_industry
+        }
+
+    def _semantic_analysis(self, text_lower: str) -> Dict:
+        """Análisis semántico basado en patrones y estructura del texto"""
+
+        # Patrones que indican diagrama de clases / de casos de uso (_CLASS_PATTERNS, _USECASE_PATTERNS)
+        class_pattern_matches = _count_patterns(_CLASS_PATTERNS, text_lower)
+        usecase_pattern_matches = _count_patterns(_USECASE_PATTERNS, text_lower)
         
         if class_pattern_matches > usecase_pattern_matches and class_pattern_matches > 0:
             confidence = min(0.8, 0.5 + (class_pattern_matches * 0.1))
@@ -278,12 +397,23 @@ class AdvancedDiagramClassifier:
     def _combine_analyses(self, basic: Dict, contextual: Dict, industry: Dict, 
                          semantic: Dict, context: Dict, is_follow_up: bool) -> Dict:
         """Combina todos los análisis para tomar una decisión final"""
-        analyses = [basic, contextual, industry, semantic]
-        
-        # Filtrar análisis con confianza suficiente
-        valid_analyses = [a for a in analyses if a['confidence'] > 0.3]
-        
-        if not valid_analyses:
+        # Suma y número de análisis con confianza suficiente por intención (listas fijas
+        # indexadas por _INTENT_INDEX); `order` guarda el orden de aparición para los desempates
+        sums = [0.0] * len(_INTENTS)
+        counts = [0] * len(_INTENTS)
+        order = []
+        supporting_total = 0
+        for analysis in (basic, contextual, industry, semantic):
+            confidence = analysis['confidence']
+            if confidence > 0.3:
+                i = _INTENT_INDEX[analysis['intent']]
+                if not counts[i]:
+                    order.append(i)
+                sums[i] += confidence
+                counts[i] += 1
+                supporting_total += 1
+        
+        if not order:
             return {
                 'intent': 'unknown', 
                 'confidence': 0.3, 
@@ -291,111 +421,94 @@ class AdvancedDiagramClassifier:
                 'supporting_analyses': 0
             }
         
-        # Agrupar por intención
-        intent_scores = {}
-        for analysis in valid_analyses:
-            intent = analysis['intent']
-            if intent not in intent_scores:
-                intent_scores[intent] = []
-            intent_scores[intent].append(analysis['confidence'])
-        
-        # Calcular score promedio por intención
-        avg_scores = {}
-        for intent, scores in intent_scores.items():
-            avg_scores[intent] = sum(scores) / len(scores)
+        # Score promedio por intención
+        avg = [0.0] * len(_INTENTS)
+        for i in order:
+            avg[i] = sums[i] / counts[i]
         
         # Aplicar boosts estratégicos
-        if is_follow_up and context['last_intent'] in avg_scores:
+        last = _INTENT_INDEX.get(context['last_intent'])
+        if is_follow_up and last is not None and counts[last]:
             # Boost por consistencia en conversación
-            avg_scores[context['last_intent']] += 0.15
+            avg[last] += 0.15
         
         # Boost por múltiples análisis coincidentes
-        for intent, scores in intent_scores.items():
-            if len(scores) >= 2:
-                avg_scores[intent] += 0.1
-            if len(scores) >= 3:
-                avg_scores[intent] += 0.05
-        
-        # Seleccionar intención con mayor score
-        if avg_scores:
-            # Ordenar intents por score
-            sorted_intents = sorted(avg_scores.items(), key=lambda x: x[1], reverse=True)
-            best_intent, best_score = sorted_intents[0]
-            second_score = sorted_intents[1][1] if len(sorted_intents) > 1 else 0.0
-
-            # Detectar ambigüedad: si la diferencia entre top2 es pequeña o la mejor puntuación es baja
-            score_diff = best_score - second_score
-            # criterios: diferencia menor a 0.08 (8%) o mejor score < 0.55 => ambiguous
-            if score_diff < 0.08 or best_score < 0.55:
-                ambiguity_reason = []
-                if score_diff < 0.08:
-                    ambiguity_reason.append(f"small_score_diff={score_diff:.2f}")
-                if best_score < 0.55:
-                    ambiguity_reason.append(f"low_best_score={best_score:.2f}")
-
-                return {
-                    'intent': 'ambiguous',
-                    'confidence': round(best_score, 2),
-                    'method': 'ambiguous_detection',
-                    'supporting_analyses': sum(len(v) for v in intent_scores.values()),
-                    'ambiguity_reason': ",".join(ambiguity_reason) if ambiguity_reason else 'undetermined',
-                    'analysis_breakdown': {
-                        'basic': basic,
-                        'contextual': contextual,
-                        'industry': industry,
-                        'semantic': semantic,
-                        'avg_scores': avg_scores
-                    }
-                }
-
-            best_confidence = min(best_score, 0.95)  # Cap at 0.95
-            supporting_analyses = len(intent_scores[best_intent])
+        for i in order:
+            if counts[i] >= 2:
+                avg[i] += 0.1
+            if counts[i] >= 3:
+                avg[i] += 0.05
+        
+        # Mejor y segunda intención en una pasada (ante empate gana la que apareció antes)
+        best = order[0]
+        best_score, second_score = avg[best], 0.0
+        for i in order[1:]:
+            if avg[i] > best_score:
+                best, best_score, second_score = i, avg[i], best_score
+            elif avg[i] > second_score:
+                second_score = avg[i]
+        best_intent = _INTENTS[best]
 
-            # Ajuste final de confianza basado en número de análisis de apoyo
-            if supporting_analyses >= 2:
-                best_confidence = min(1.0, best_confidence + 0.05)
-            if supporting_analyses >= 3:
-                best_confidence = min(1.0, best_confidence + 0.03)
+        # Detectar ambigüedad: si la diferencia entre top2 es pequeña o la mejor puntuación es baja
+        score_diff = best_score - second_score
+        # criterios: diferencia menor a 0.08 (8%) o mejor score < 0.55 => ambiguous
+        if score_diff < 0.08 or best_score < 0.55:
+            ambiguity_reason = []
+            if score_diff < 0.08:
+                ambiguity_reason.append(f"small_score_diff={score_diff:.2f}")
+            if best_score < 0.55:
+                ambiguity_reason.append(f"low_best_score={best_score:.2f}")
 
             return {
-                'intent': best_intent,
-                'confidence': best_confidence,
-                'method': 'combined_analysis',
-                'supporting_analyses': supporting_analyses,
+                'intent': 'ambiguous',
+                'confidence': round(best_score, 2),
+                'method': 'ambiguous_detection',
+                'supporting_analyses': supporting_total,
+                'ambiguity_reason': ",".join(ambiguity_reason) if ambiguity_reason else 'undetermined',
                 'analysis_breakdown': {
                     'basic': basic,
                     'contextual': contextual,
                     'industry': industry,
-                    'semantic': semantic
+                    'semantic': semantic,
+                    'avg_scores': {_INTENTS[i]: avg[i] for i in order}
                 }
             }
-        
+
+        best_confidence = min(best_score, 0.95)  # Cap at 0.95
+        supporting_analyses = counts[best]
+
+        # Ajuste final de confianza basado en número de análisis de apoyo
+        if supporting_analyses >= 2:
+            best_confidence = min(1.0, best_confidence + 0.05)
+        if supporting_analyses >= 3:
+            best_confidence = min(1.0, best_confidence + 0.03)
+
         return {
-            'intent': 'unknown', 
-            'confidence': 0.4, 
-            'method': 'fallback',
-            'supporting_analyses': 0
+            'intent': best_intent,
+            'confidence': best_confidence,
+            'method': 'combined_analysis',
+            'supporting_analyses': supporting_analyses,
+            'analysis_breakdown': {
+                'basic': basic,
+                'contextual': contextual,
+                'industry': industry,
+                'semantic': semantic
+            }
         }
 
-    def _update_conversation_context(self, user_id: str, result: Dict, industry_analysis: Dict):
+    def _update_conversation_context(self, context: Dict, result: Dict, industry_analysis: Dict):
         """Actualiza el contexto de la conversación para futuras interacciones"""
-        context = self.conversation_context[user_id]
-        
         # Actualizar intención detectada si hay alta confianza
         if result['confidence'] > self.confidence_thresholds['with_context']:
             context['detected_domain'] = result['intent']
         
         context['last_intent'] = result['intent']
+        # deque con maxlen: sólo se conservan las últimas MAX_CONFIDENCE_HISTORY confianzas
         context['confidence_history'].append(result['confidence'])
         
-        # Mantener solo las últimas 10 confianzas en el historial
-        if len(context['confidence_history']) > 10:
-            context['confidence_history'] = context['confidence_history'][-10:]
-        
         # Actualizar pistas de industria
-        if industry_analysis['method'].startswith('industry_'):
-            industry = industry_analysis['method'].replace('industry_', '')
-            context['industry_hints'].add(industry)
+        if 'industry' in industry_analysis:
+            context['industry_hints'] |= self._industry_bits[industry_analysis['industry']]
 
     def classify_diagram_type(self, description: str, user_id: str = "default") -> Dict:
         """
@@ -414,25 +527,50 @@ class AdvancedDiagramClassifier:
         """Obtiene el contexto actual de un usuario específico"""
         return self.conversation_context.get(user_id)
     
+    def get_industry_hints(self, user_id: str) -> set:
+        """Industrias detectadas en la conversación de un usuario (decodifica la máscara de bits)"""
+        context = self.conversation_context.get(user_id)
+        mask = context['industry_hints'] if context else 0
+        return {industry for industry, bit in self._industry_bits.items() if mask & bit}
+
     def clear_user_context(self, user_id: str):
         """Limpia el contexto de un usuario específico"""
-        if user_id in self.conversation_context:
-            del self.conversation_context[user_id]
+        with self._lock:
+            context = self.conversation_context.pop(user_id, None)
+            if context is not None and context['interaction_count'] > 1:
+                self._active_count -= 1
     
     def get_classification_stats(self) -> Dict:
         """Obtiene estadísticas generales del clasificador"""
-        total_users = len(self.conversation_context)
-        active_conversations = sum(1 for ctx in self.conversation_context.values() 
-                                 if ctx['interaction_count'] > 1)
-        
         return {
-            'total_users': total_users,
-            'active_conversations': active_conversations,
+            'total_users': len(self.conversation_context),
+            'active_conversations': self._active_count,
             'conversation_context': self.conversation_context
         }
 
 
 # Funciones de utilidad para uso rápido
+_SINGLETON: Optional[AdvancedDiagramClassifier] = None
+# ids desechables: cada llamada usa un contexto propio y lo borra al terminar
+_TRANSIENT_IDS = itertools.count()
+
+def _get_classifier() -> AdvancedDiagramClassifier:
+    """Clasificador compartido; los índices y el autómata se construyen una sola vez."""
+    global _SINGLETON
+    if _SINGLETON is None:
+        _SINGLETON = AdvancedDiagramClassifier()
+    return _SINGLETON
+
+@lru_cache(maxsize=1024)
+def _classify_without_context(description: str) -> Dict:
+    """Clasificación sin contexto previo: sólo depende del texto, así que se memoiza."""
+    classifier = _get_classifier()
+    user_id = f"__transient__{next(_TRANSIENT_IDS)}"
+    try:
+        return classifier.classify_diagram_type(description, user_id=user_id)
+    finally:
+        classifier.clear_user_context(user_id)
+
 def quick_classify(description: str) -> str:
     """
     Clasificación rápida sin mantener contexto de conversación.
@@ -443,9 +581,7 @@ def quick_classify(description: str) -> str:
     Returns:
         String con el tipo de diagrama detectado
     """
-    classifier = AdvancedDiagramClassifier()
-    result = classifier.classify_diagram_type(description)
-    return result['intent']
+    return _classify_without_context(description)['intent']
 
 def classify_with_details(description: str) -> Dict:
     """
@@ -457,8 +593,8 @@ def classify_with_details(description: str) -> Dict:
     Returns:
         Dict con resultado completo y breakdown del análisis
     """
-    classifier = AdvancedDiagramClassifier()
-    return classifier.classify_diagram_type(description)
+    # copia: el resultado memoizado es compartido y el llamador puede modificarlo
+    return copy.deepcopy(_classify_without_context(description))
 
 
 # Ejemplos de uso y pruebas
@@ -6,8 +6,32 @@ import logging
 import json
 import uuid
 import re
+from collections import OrderedDict, deque
+from functools import lru_cache
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+try:
+    # autómata Aho-Corasick: cuenta las keywords de todos los patrones en una pasada
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Patrón de la forma \b(palabra|otra palabra|...)\b: alternancia de literales entre límites de palabra
+_LITERAL_ALTERNATION = re.compile(r'\\b\(([\w |]+)\)\\b')
+# Alternancia de literales con la que termina un patrón de falso positivo: "... (yoga|baile)\b"
+_TRAILING_ALTERNATION = re.compile(r'\(([\w|]+)\)\\b$')
+
+
+def _literal_alternatives(pattern: str) -> Optional[List[str]]:
+    """Literales de un patrón `\\b(a|b|...)\\b`, o None si el patrón es otra cosa"""
+    match = _LITERAL_ALTERNATION.fullmatch(pattern)
+    return match.group(1).split('|') if match else None
+
+
+def _is_word_char(ch: str) -> bool:
+    # mismo criterio que \w de `re` para str
+    return ch.isalnum() or ch == '_'
 
 # -----------------------------
 # CONFIGURACIÓN DE LOGGING
@@ -25,9 +49,15 @@ logger = logging.getLogger("diagram_classifier")
 # -----------------------------
 # CLASIFICADOR DE DIAGRAMAS
 # -----------------------------
+# Textos distintos cuya clasificación se recuerda (las conversaciones repiten frases)
+CLASSIFY_CACHE_SIZE = 2048
+# Mensajes/confianzas recordados por cliente y clientes en memoria (se descartan los menos recientes)
+MAX_CONTEXT_MESSAGES = 10
+MAX_CLIENTS = 10000
+
 class DiagramIntentClassifier:
     def __init__(self):
-        # Patrones para falsos positivos
+        # Patrones para falsos positivos (compilados una vez; ver _compile_patterns)
         self.false_positive_patterns = [
             (r'\bclase(s)? de (yoga|baile|ingles|conducción|natación)\b', 'other'),
             (r'\bsistema (solar|nervioso|operativo|digestivo|endocrino)\b', 'other'),
@@ -60,32 +90,122 @@ class DiagramIntentClassifier:
                 ]
             }
         }
+        self._compile_patterns()
+        # resultados por texto normalizado (LRU por instancia: los patrones son de cada clasificador)
+        self._classify_cached = lru_cache(maxsize=CLASSIFY_CACHE_SIZE)(self._classify_normalized)
+
+    def _compile_patterns(self):
+        """Compila los patrones una vez para no pasar por la caché de `re` en cada llamada"""
+        # cada falso positivo exige una de las palabras de su alternancia final (yoga, solar, cine...):
+        # si ninguna está en el texto, no hace falta lanzar el regex
+        compiled = []
+        for pattern, intent in self.false_positive_patterns:
+            trailing = _TRAILING_ALTERNATION.search(pattern)
+            hints = tuple(trailing.group(1).split('|')) if trailing else None
+            compiled.append((re.compile(pattern), intent, hints))
+        self.false_positive_patterns = compiled
+        # con pyahocorasick, una sola pasada dice qué falsos positivos tienen alguna palabra en el texto
+        self._fp_automaton = None
+        if ahocorasick is not None:
+            self._fp_automaton = ahocorasick.Automaton()
+            for index, (_pattern, _intent, hints) in enumerate(compiled):
+                for hint in hints or ():
+                    self._fp_automaton.add_word(hint, index)
+            self._fp_automaton.make_automaton()
+        self._automaton = self._build_automaton()
+        # sin autómata: un único regex por (intención, nivel) con todos sus patrones alternados;
+        # las palabras de un mismo nivel no se solapan, así que cuenta lo mismo que regex a regex
+        self._tier_patterns = {
+            (intent, tier): re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))
+            for intent, tiers in self.diagram_patterns.items()
+            for tier, patterns in tiers.items()
+        }
+
+    def _build_automaton(self):
+        """
+        Autómata con los literales de diagram_patterns; cada palabra guarda los (intención, nivel)
+        cuyos patrones la contienen. None si no hay pyahocorasick o algún patrón no es literal.
+        """
+        if ahocorasick is None:
+            return None
+        targets = {}
+        for intent, tiers in self.diagram_patterns.items():
+            for tier, patterns in tiers.items():
+                for pattern in patterns:
+                    words = _literal_alternatives(pattern)
+                    if words is None:
+                        return None
+                    for word in words:
+                        targets.setdefault(word, []).append((intent, tier))
+        automaton = ahocorasick.Automaton()
+        for word, word_targets in targets.items():
+            automaton.add_word(word, (len(word), tuple(word_targets)))
+        automaton.make_automaton()
+        return automaton
+
+    def _keyword_counts(self, text: str) -> Optional[Dict[Tuple[str, str], int]]:
+        """
+        Equivalente a _calculate_score para todos los niveles a la vez: coincidencias de palabra
+        completa por (intención, nivel). None si no hay autómata.
+        """
+        if self._automaton is None:
+            return None
+        counts = {}
+        last = len(text) - 1
+        for end, (length, word_targets) in self._automaton.iter(text):
+            start = end - length + 1
+            if start > 0 and _is_word_char(text[start - 1]):
+                continue
+            if end < last and _is_word_char(text[end + 1]):
+                continue
+            for key in word_targets:
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def _tier_present(self, text: str, counts: Optional[Dict], intent: str, tier: str) -> bool:
+        if counts is not None:
+            return (intent, tier) in counts
+        return self._tier_patterns[(intent, tier)].search(text) is not None
+
+    def _tier_score(self, text: str, counts: Optional[Dict], intent: str, tier: str) -> int:
+        if counts is not None:
+            return counts.get((intent, tier), 0)
+        return self._calculate_score(text, self._tier_patterns[(intent, tier)])
         
     def classify_intent(self, text: str) -> Dict:
         """Clasifica la intención del diagrama"""
         if not text or len(text.strip()) < 10:
             return {"intent": "unknown", "confidence": 0.0, "method": "text_too_short"}
         
-        text_lower = text.lower().strip()
-        
+        # copia: el llamador (p. ej. classify_text) modifica el dict y el original está en caché
+        return dict(self._classify_cached(text.lower().strip()))
+
+    def _classify_normalized(self, text_lower: str) -> Dict:
+        """Clasificación de un texto ya en minúsculas y sin espacios en los extremos"""
         # 1. Verificar falsos positivos
-        for pattern, intent in self.false_positive_patterns:
-            if re.search(pattern, text_lower):
-                return {"intent": intent, "confidence": 0.95, "method": "false_positive_filter"}
+        intent = self._false_positive_intent(text_lower)
+        if intent is not None:
+            return {"intent": intent, "confidence": 0.95, "method": "false_positive_filter"}
         
-        # 2. Scoring por términos
-        class_high_score = self._calculate_score(text_lower, self.diagram_patterns['diagrama_clases']['high_priority'])
-        usecase_high_score = self._calculate_score(text_lower, self.diagram_patterns['diagrama_casos_uso']['high_priority'])
+        # 2. Términos de alta prioridad (una pasada del autómata, o un regex por nivel si no lo hay);
+        # para la exclusividad basta saber si aparecen, sin contarlos
+        counts = self._keyword_counts(text_lower)
+        class_high = self._tier_present(text_lower, counts, 'diagrama_clases', 'high_priority')
+        usecase_high = self._tier_present(text_lower, counts, 'diagrama_casos_uso', 'high_priority')
         
         # 3. Detección por términos exclusivos
-        if class_high_score > 0 and usecase_high_score == 0:
+        if class_high and not usecase_high:
             return {"intent": "diagrama_clases", "confidence": 0.9, "method": "high_priority_terms"}
-        elif usecase_high_score > 0 and class_high_score == 0:
+        elif usecase_high and not class_high:
             return {"intent": "diagrama_casos_uso", "confidence": 0.9, "method": "high_priority_terms"}
         
+        # ambos o ninguno: hacen falta los conteos
+        class_high_score = self._tier_score(text_lower, counts, 'diagrama_clases', 'high_priority') if class_high else 0
+        usecase_high_score = self._tier_score(text_lower, counts, 'diagrama_casos_uso', 'high_priority') if usecase_high else 0
+        
         # 4. Scoring con términos de media prioridad
-        class_medium_score = self._calculate_score(text_lower, self.diagram_patterns['diagrama_clases']['medium_priority'])
-        usecase_medium_score = self._calculate_score(text_lower, self.diagram_patterns['diagrama_casos_uso']['medium_priority'])
+        class_medium_score = self._tier_score(text_lower, counts, 'diagrama_clases', 'medium_priority')
+        usecase_medium_score = self._tier_score(text_lower, counts, 'diagrama_casos_uso', 'medium_priority')
         
         # 5. Cálculo de scores totales
         class_total = (class_high_score * 2) + class_medium_score
@@ -107,17 +227,116 @@ class DiagramIntentClassifier:
         else:
             return {"intent": "unknown", "confidence": 0.5, "method": "ambiguous"}
     
-    def _calculate_score(self, text: str, patterns: List[str]) -> int:
+    def _false_positive_intent(self, text: str) -> Optional[str]:
+        """Intención del primer patrón de falso positivo que coincide, o None"""
+        if self._fp_automaton is not None:
+            candidates = {index for _end, index in self._fp_automaton.iter(text)}
+        for index, (pattern, intent, hints) in enumerate(self.false_positive_patterns):
+            if hints is not None:
+                if self._fp_automaton is not None:
+                    if index not in candidates:
+                        continue
+                elif not any(hint in text for hint in hints):
+                    continue
+            if pattern.search(text):
+                return intent
+        return None
+
+    def _calculate_score(self, text: str, pattern: re.Pattern) -> int:
         """Calcula score basado en patrones regex"""
-        score = 0
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            score += len(matches)
-        return score
+        return len(pattern.findall(text))
 
 # -----------------------------
 # SISTEMA DE PRUEBAS EN CONSOLA
 # -----------------------------
+# Casos de prueba: (entrada, intención esperada, descripción). Tupla de módulo, se construye una vez
+_TEST_CASES = (
+    # ✅ CASOS CLAROS DE DIAGRAMA DE CLASES
+    (
+        "quiero un diagrama de clases con atributos y métodos privados",
+        "diagrama_clases",
+        "Clases con atributos y métodos"
+    ),
+    (
+        "necesito mostrar herencia entre las clases Usuario y Administrador",
+        "diagrama_clases", 
+        "Herencia entre clases"
+    ),
+    (
+        "diagrama con interfaces y implementaciones de servicios",
+        "diagrama_clases",
+        "Interfaces e implementaciones"
+    ),
+    (
+        "mostrar composición y agregación entre objetos del dominio",
+        "diagrama_clases",
+        "Composición y agregación"
+    ),
+    
+    # ✅ CASOS CLAROS DE DIAGRAMA DE CASOS DE USO
+    (
+        "quiero ver los actores que interactúan con el sistema de ventas",
+        "diagrama_casos_uso",
+        "Actores del sistema"
+    ),
+    (
+        "casos de uso para el proceso de autenticación de usuarios",
+        "diagrama_casos_uso",
+        "Casos de uso de autenticación"
+    ),
+    (
+        "mostrar cómo los clientes y administradores usan la aplicación",
+        "diagrama_casos_uso",
+        "Interacción de usuarios"
+    ),
+    (
+        "funcionalidades que ofrece el sistema a los diferentes roles",
+        "diagrama_casos_uso", 
+        "Funcionalidades por rol"
+    ),
+    
+    # ⚠️ CASOS AMBIGUOS
+    (
+        "sistema con usuarios y permisos",
+        "diagrama_casos_uso",  # Podría ser ambos
+        "Caso ambiguo - usuarios y permisos"
+    ),
+    (
+        "modelo del dominio con relaciones",
+        "diagrama_clases",  # Podría ser ambos  
+        "Caso ambiguo - modelo del dominio"
+    ),
+    
+    # ❌ FALSOS POSITIVOS
+    (
+        "clase de yoga los martes y jueves",
+        "other",
+        "Falso positivo - clase de yoga"
+    ),
+    (
+        "sistema solar con planetas y lunas",
+        "other", 
+        "Falso positivo - sistema solar"
+    ),
+    (
+        "actor de cine famoso por sus películas",
+        "other",
+        "Falso positivo - actor de cine"
+    ),
+    
+    # 📝 TEXTO INSUFICIENTE
+    (
+        "diagrama de clases",
+        "unknown",
+        "Texto muy corto"
+    ),
+    (
+        "hola mundo",
+        "unknown", 
+        "Texto sin contexto"
+    )
+)
+
 class TestSuite:
     """Suite de pruebas para el clasificador"""
     
@@ -144,92 +363,7 @@ class TestSuite:
     
     def _get_test_cases(self):
         """Define los casos de prueba"""
-        return [
-            # ✅ CASOS CLAROS DE DIAGRAMA DE CLASES
-            (
-                "quiero un diagrama de clases con atributos y métodos privados",
-                "diagrama_clases",
-                "Clases con atributos y métodos"
-            ),
-            (
-                "necesito mostrar herencia entre las clases Usuario y Administrador",
-                "diagrama_clases", 
-                "Herencia entre clases"
-            ),
-            (
-                "diagrama con interfaces y implementaciones de servicios",
-                "diagrama_clases",
-                "Interfaces e implementaciones"
-            ),
-            (
-                "mostrar composición y agregación entre objetos del dominio",
-                "diagrama_clases",
-                "Composición y agregación"
-            ),
-            
-            # ✅ CASOS CLAROS DE DIAGRAMA DE CASOS DE USO
-            (
-                "quiero ver los actores que interactúan con el sistema de ventas",
-                "diagrama_casos_uso",
-                "Actores del sistema"
-            ),
-            (
-                "casos de uso para el proceso de autenticación de usuarios",
-                "diagrama_casos_uso",
-                "Casos de uso de autenticación"
-            ),
-            (
-                "mostrar cómo los clientes y administradores usan la aplicación",
-                "diagrama_casos_uso",
-                "Interacción de usuarios"
-            ),
-            (
-                "funcionalidades que ofrece el sistema a los diferentes roles",
-                "diagrama_casos_uso", 
-                "Funcionalidades por rol"
-            ),
-            
-            # ⚠️ CASOS AMBIGUOS
-            (
-                "sistema con usuarios y permisos",
-                "diagrama_casos_uso",  # Podría ser ambos
-                "Caso ambiguo - usuarios y permisos"
-            ),
-            (
-                "modelo del dominio con relaciones",
-                "diagrama_clases",  # Podría ser ambos  
-                "Caso ambiguo - modelo del dominio"
-            ),
-            
-            # ❌ FALSOS POSITIVOS
-            (
-                "clase de yoga los martes y jueves",
-                "other",
-                "Falso positivo - clase de yoga"
-            ),
-            (
-                "sistema solar con planetas y lunas",
-                "other", 
-                "Falso positivo - sistema solar"
-            ),
-            (
-                "actor de cine famoso por sus películas",
-                "other",
-                "Falso positivo - actor de cine"
-            ),
-            
-            # 📝 TEXTO INSUFICIENTE
-            (
-                "diagrama de clases",
-                "unknown",
-                "Texto muy corto"
-            ),
-            (
-                "hola mundo",
-                "unknown", 
-                "Texto sin contexto"
-            )
-        ]
+        return _TEST_CASES
     
     def _run_single_test(self, test_num: int, test_input: str, expected: str, description: str):
         """Ejecuta una prueba individual"""
@@ -355,10 +489,21 @@ class TestSuite:
 # -----------------------------
 # SERVICIO DE CLASIFICACIÓN
 # -----------------------------
+class ClientContext:
+    """Contexto de conversación de un cliente (slots: sin __dict__ ni claves de dict por acceso)"""
+    __slots__ = ("messages", "last_intent", "confidence_history")
+
+    def __init__(self):
+        self.messages = deque(maxlen=MAX_CONTEXT_MESSAGES)
+        self.last_intent: Optional[str] = None
+        self.confidence_history = deque(maxlen=MAX_CONTEXT_MESSAGES)
+
+
 class DiagramClassificationService:
     def __init__(self):
         self.diagram_classifier = DiagramIntentClassifier()
-        self.conversation_context = {}
+        # client_id -> ClientContext, en orden de uso
+        self.conversation_context = OrderedDict()
         self.performance_stats = {
             "total_requests": 0,
             "successful_classifications": 0,
@@ -372,35 +517,31 @@ class DiagramClassificationService:
         """Clasifica texto y devuelve tipo de diagrama"""
         start_time = time.time()
         
-        # Inicializar contexto si es nuevo cliente
-        if client_id not in self.conversation_context:
-            self.conversation_context[client_id] = {
-                'messages': [],
-                'last_intent': None,
-                'confidence_history': []
-            }
+        # Inicializar contexto si es nuevo cliente (una sola búsqueda en el dict)
+        context = self.conversation_context.get(client_id)
+        if context is None:
+            context = self.conversation_context[client_id] = ClientContext()
+            if len(self.conversation_context) > MAX_CLIENTS:
+                self.conversation_context.popitem(last=False)
+        else:
+            self.conversation_context.move_to_end(client_id)
         
-        context = self.conversation_context[client_id]
-        context['messages'].append(text)
+        context.messages.append(text)
         
         # Clasificación actual
         current_intent = self.diagram_classifier.classify_intent(text)
         
         # Aplicar refuerzo contextual
-        if (context['last_intent'] and 
-            current_intent['intent'] == context['last_intent'] and
+        if (context.last_intent and 
+            current_intent['intent'] == context.last_intent and
             current_intent['confidence'] > 0.6):
             current_intent['confidence'] = min(0.95, current_intent['confidence'] + 0.1)
             current_intent['method'] = f"{current_intent['method']}_with_context"
         
         # Actualizar contexto
-        context['last_intent'] = current_intent['intent']
-        context['confidence_history'].append(current_intent['confidence'])
-        
-        # Limitar historial
-        if len(context['messages']) > 10:
-            context['messages'] = context['messages'][-5:]
-            context['confidence_history'] = context['confidence_history'][-5:]
+        context.last_intent = current_intent['intent']
+        # deque con maxlen: sólo se conservan los últimos MAX_CONTEXT_MESSAGES
+        context.confidence_history.append(current_intent['confidence'])
         
         # Actualizar métricas
         processing_time = time.time() - start_time
@@ -1,15 +1,50 @@
 import json
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import uuid
 import os
+import threading
+try:
+    # orjson (dependencia del servicio) es bastante más rápido; json de la stdlib como respaldo
+    import orjson
+except ImportError:
+    orjson = None
+
+# Listas que toda clase del diagrama tiene (vacías si no se indicaron)
+_CLASS_LISTS = ("attributes", "methods", "relationships")
 
 class DiagramCRUD:
-    def __init__(self, diagram_data: Dict, storage_path: Optional[str] = None):
+    def __init__(self, diagram_data: Dict, storage_path: Optional[str] = None, autosave: bool = True):
         self.diagram = diagram_data
         self.storage_path = storage_path
+        # con autosave=False las mutaciones sólo marcan `dirty`; el dueño decide cuándo llamar save()
+        self.autosave = autosave
+        # versión en memoria (sube con cada mutación) y última versión escrita en disco
+        self._version = 0
+        self._saved_version = 0
+        # serializa escrituras concurrentes (p. ej. un flush en hilo y otro síncrono al cerrar)
+        self._write_lock = threading.Lock()
         # garantizar estructura mínima
         if "classes" not in self.diagram:
             self.diagram["classes"] = []
+        self._reindex()
+
+    def _reindex(self):
+        """Índices id -> clase y nombre en minúsculas -> clase (la primera, como el recorrido lineal)"""
+        self._by_id = {}
+        self._by_name = {}
+        for cls in self.diagram["classes"]:
+            self._index_class(cls)
+        # ids repetidos sólo llegan desde JSON externo (create_class usa uuid); delete_class los borra todos
+        self._unique_ids = len(self._by_id) == len(self.diagram["classes"])
+
+    def _index_class(self, cls: Dict):
+        # forma normalizada: las listas de la clase existen siempre y se accede a ellas sin .get()
+        for key in _CLASS_LISTS:
+            cls.setdefault(key, [])
+        self._by_id.setdefault(cls.get("id"), cls)
+        name = cls.get("name")
+        if isinstance(name, str):
+            self._by_name.setdefault(name.lower(), cls)
 
     def generate_id(self) -> str:
         return str(uuid.uuid4())
@@ -25,18 +60,15 @@ class DiagramCRUD:
             "relationships": []
         }
         self.diagram["classes"].append(new_class)
+        self._index_class(new_class)
         self._persist()
         return new_class
 
     def find_class_by_name(self, class_name: str) -> Optional[Dict]:
-        return next(
-            (cls for cls in self.diagram["classes"]
-             if cls["name"].lower() == class_name.lower()),
-            None
-        )
+        return self._by_name.get(class_name.lower())
 
     def find_class_by_id(self, class_id: str) -> Optional[Dict]:
-        return next((cls for cls in self.diagram["classes"] if cls.get("id") == class_id), None)
+        return self._by_id.get(class_id)
 
     def list_classes(self) -> List[Dict]:
         return self.diagram.get("classes", [])
@@ -46,6 +78,8 @@ class DiagramCRUD:
         if not cls:
             return None
         cls.update({k: v for k, v in new_data.items() if k in ["name", "attributes", "methods", "relationships"]})
+        if "name" in new_data:
+            self._reindex()
         self._persist()
         return cls
 
@@ -53,7 +87,17 @@ class DiagramCRUD:
         cls = self.find_class_by_id(class_id)
         if not cls:
             return False
-        self.diagram["classes"] = [c for c in self.diagram["classes"] if c.get("id") != class_id]
+        if not self._unique_ids:
+            self.diagram["classes"] = [c for c in self.diagram["classes"] if c.get("id") != class_id]
+            self._reindex()
+        else:
+            # caso normal: una sola clase con ese id; se quita en sitio, sin recorrer ni copiar la lista
+            self.diagram["classes"].remove(cls)
+            del self._by_id[class_id]
+            name = cls.get("name")
+            if isinstance(name, str) and self._by_name.get(name.lower()) is cls:
+                # puede haber otra clase con el mismo nombre que ahora pasa a ser la primera
+                self._reindex()
         self._persist()
         return True
 
@@ -62,7 +106,7 @@ class DiagramCRUD:
         cls = self.find_class_by_id(class_id)
         if not cls:
             return None
-        cls.setdefault("attributes", []).append(attribute)
+        cls["attributes"].append(attribute)
         self._persist()
         return attribute
 
@@ -70,16 +114,17 @@ class DiagramCRUD:
         cls = self.find_class_by_id(class_id)
         if not cls:
             return False
-        before = len(cls.get("attributes", []))
-        cls["attributes"] = [a for a in cls.get("attributes", []) if a.get("name") != attr_name]
+        attrs = cls["attributes"]
+        before = len(attrs)
+        attrs[:] = [a for a in attrs if a.get("name") != attr_name]
         self._persist()
-        return len(cls.get("attributes", [])) < before
+        return len(attrs) < before
 
     def add_method(self, class_id: str, method: Dict) -> Optional[Dict]:
         cls = self.find_class_by_id(class_id)
         if not cls:
             return None
-        cls.setdefault("methods", []).append(method)
+        cls["methods"].append(method)
         self._persist()
         return method
 
@@ -87,24 +132,73 @@ class DiagramCRUD:
         cls = self.find_class_by_id(class_id)
         if not cls:
             return False
-        before = len(cls.get("methods", []))
-        cls["methods"] = [m for m in cls.get("methods", []) if m.get("name") != method_name]
+        methods = cls["methods"]
+        before = len(methods)
+        methods[:] = [m for m in methods if m.get("name") != method_name]
         self._persist()
-        return len(cls.get("methods", [])) < before
+        return len(methods) < before
 
     # Persistencia simple: guardar JSON en archivo si storage_path fue dado
     def _persist(self):
+        self._version += 1
+        if not self.storage_path or not self.autosave:
+            return
+        self.save()
+
+    @property
+    def dirty(self) -> bool:
+        """Hay mutaciones que todavía no se han escrito en disco."""
+        return self._version != self._saved_version
+
+    def flush(self):
+        """Escribe los cambios pendientes (autosave=False); no hace nada si no hay ninguno."""
+        if self.dirty:
+            self.save()
+
+    def save(self):
+        """Escribe el diagrama completo en storage_path (si está definido)."""
+        if not self.storage_path:
+            return
+        self.write_snapshot(*self.snapshot())
+
+    def snapshot(self) -> Tuple[int, bytes]:
+        """
+        Versión actual y JSON del diagrama. Es la única parte de save() que lee self.diagram:
+        el dueño puede llamarla en su hilo y dejar write_snapshot (E/S) para otro.
+        """
+        if orjson is not None:
+            data = orjson.dumps(self.diagram, option=orjson.OPT_INDENT_2)
+        else:
+            data = json.dumps(self.diagram, ensure_ascii=False, indent=2).encode("utf-8")
+        return self._version, data
+
+    def write_snapshot(self, version: int, data: bytes):
+        """Escribe un snapshot; si falla, o ya hay en disco una versión igual o más nueva, no marca nada."""
         if not self.storage_path:
             return
-        try:
-            os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
-            with open(self.storage_path, "w", encoding="utf-8") as f:
-                json.dump(self.diagram, f, ensure_ascii=False, indent=2)
-        except Exception:
-            pass
+        with self._write_lock:
+            if version <= self._saved_version:
+                return
+            # escritura atómica: se escribe un temporal y se renombra, así un lector nunca ve el JSON a medias
+            tmp_path = f"{self.storage_path}.{uuid.uuid4().hex}.tmp"
+            try:
+                directory = os.path.dirname(self.storage_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self.storage_path)
+            except Exception:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+            self._saved_version = version
 
     @classmethod
-    def load_from_file(cls, path: str):
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return cls(data, storage_path=path)
\ No newline at end of file
+    def load_from_file(cls, path: str, autosave: bool = True):
+        with open(path, "rb") as f:
+            raw = f.read()
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+        return cls(data, storage_path=path, autosave=autosave)
\ No newline at end of file
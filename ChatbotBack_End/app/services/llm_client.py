@@ -1,17 +1,63 @@
 import os
+import re
 import json
 import asyncio
-import requests
+import threading
+import weakref
+import httpx
+from collections import OrderedDict
 from typing import Optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
 DEFAULT_MODEL = os.environ.get("LLM_MODEL", "gpt-4o-mini")
 
-def _sync_query_openai(prompt: str, model: str = None) -> dict:
+# Cliente HTTP con pool de conexiones keep-alive (sin handshake TCP/TLS por consulta).
+# Uno por event loop (las conexiones no sobreviven a su loop); main.py usa un loop persistente.
+_CLIENTS = weakref.WeakKeyDictionary()
+_CLIENT_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=50)
+_CLIENT_TIMEOUT = 15.0
+
+# Primer objeto JSON de la respuesta, aunque el modelo lo envuelva en ```json ... ``` o añada texto
+_JSON_BLOCK = re.compile(r"\{.*\}", re.DOTALL)
+
+# Decisiones ya obtenidas por texto exacto (temperature=0.0: la misma pregunta da la misma respuesta).
+# Se guardan serializadas, así cada acierto devuelve una copia independiente; el lock es necesario
+# porque se consulta desde el loop de uvicorn y desde el loop persistente de main.py (otro hilo)
+LLM_CACHE_SIZE = 256
+_DECISION_CACHE = OrderedDict()
+_DECISION_CACHE_LOCK = threading.Lock()
+
+def _cached_decision(text: str):
+    with _DECISION_CACHE_LOCK:
+        cached = _DECISION_CACHE.get(text)
+        if cached is None:
+            return None
+        _DECISION_CACHE.move_to_end(text)
+    return orjson.loads(cached) if orjson is not None else json.loads(cached)
+
+def _cache_decision(text: str, decision: dict) -> None:
+    data = orjson.dumps(decision) if orjson is not None else json.dumps(decision)
+    with _DECISION_CACHE_LOCK:
+        _DECISION_CACHE[text] = data
+        _DECISION_CACHE.move_to_end(text)
+        while len(_DECISION_CACHE) > LLM_CACHE_SIZE:
+            _DECISION_CACHE.popitem(last=False)
+
+def _get_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get(loop)
+    if client is None:
+        client = _CLIENTS[loop] = httpx.AsyncClient(timeout=_CLIENT_TIMEOUT, limits=_CLIENT_LIMITS)
+    return client
+
+async def _query_openai(prompt: str, model: str = None) -> dict:
     """
-    Síncrono: llama a la API de OpenAI ChatCompletion y devuelve la respuesta.
-    Ejecutar en hilo con asyncio.to_thread desde código async.
+    Llama a la API de OpenAI ChatCompletion y devuelve la respuesta.
     """
     if not OPENAI_API_KEY:
         raise RuntimeError("OPENAI_API_KEY no definido en variables de entorno")
@@ -30,16 +76,26 @@ def _sync_query_openai(prompt: str, model: str = None) -> dict:
         "temperature": 0.0,
         "max_tokens": 300
     }
-    r = requests.post(url, headers=headers, data=json.dumps(payload), timeout=15)
+    r = await _get_client().post(url, headers=headers, json=payload)
     r.raise_for_status()
     return r.json()
 
+def _parse_json_block(content: str):
+    """Parsea el primer bloque {...} de `content`; ValueError si no hay ninguno o no es JSON."""
+    m = _JSON_BLOCK.search(content)
+    if m is None:
+        raise ValueError("La respuesta no contiene un objeto JSON")
+    return orjson.loads(m.group(0)) if orjson is not None else json.loads(m.group(0))
+
 async def ask_llm_for_diagram_type(text: str) -> dict:
     """
     Pregunta al LLM si el texto corresponde a 'diagrama_clases', 'diagrama_casos_uso'
     o si se necesita una pregunta de aclaración. Devuelve dict:
       { "resolved": bool, "diagram_type": Optional[str], "question": Optional[str], "raw": {...} }
     """
+    cached = _cached_decision(text)
+    if cached is not None:
+        return cached
     prompt = (
         f"Analiza este texto y responde sólo en JSON con las claves:\n"
         f" - resolved: true|false (si puedes decidir el tipo de diagrama ahora)\n"
@@ -49,15 +105,17 @@ async def ask_llm_for_diagram_type(text: str) -> dict:
         f"Ejemplo de salida válida:\n{{\"resolved\": false, \"diagram_type\": null, \"question\": \"¿Quieres modelar entidades y relaciones (clases) o actores y funcionalidades (casos de uso)?\"}}\n"
     )
     try:
-        resp = await asyncio.to_thread(_sync_query_openai, prompt)
+        resp = await _query_openai(prompt)
         content = resp["choices"][0]["message"]["content"]
         # intentar parsear JSON de la respuesta
         try:
-            j = json.loads(content)
+            j = _parse_json_block(content)
         except Exception:
             # si no es JSON, devolver raw y fallback a pregunta genérica
             return {"resolved": False, "diagram_type": None, "question": "¿Puedes especificar si quieres un diagrama de clases o de casos de uso?", "raw": {"content": content, "api": resp}}
         # Normalizar
-        return {"resolved": bool(j.get("resolved")), "diagram_type": j.get("diagram_type"), "question": j.get("question"), "raw": j}
+        decision = {"resolved": bool(j.get("resolved")), "diagram_type": j.get("diagram_type"), "question": j.get("question"), "raw": j}
+        _cache_decision(text, decision)
+        return decision
     except Exception as e:
         return {"resolved": False, "diagram_type": None, "question": "¿Puedes especificar si quieres un diagrama de clases o de casos de uso?", "error": str(e)}
\ No newline at end of file
@@ -1,8 +1,108 @@
+import hashlib
+import io
 import json
 import os
-import subprocess
-import sys
 import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator
+try:
+    # orjson es más rápido; acepta bytes directamente
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+try:
+    # parser incremental para JSON grandes; sin él se carga el archivo completo
+    import ijson
+except ImportError:
+    ijson = None
+
+# Caché de diagramas renderizados, direccionada por SHA-256 del código PlantUML
+PUML_CACHE_DIR = ".puml_cache"
+PUML_CACHE_MAX_FILES = 512
+OUTPUT_FORMAT = "svg"
+# Forma parte de la clave del código .puml cacheado por JSON: incrementar al cambiar la salida de los decodificadores
+DECODER_VERSION = 1
+# A partir de este tamaño _get_data recorre el JSON con ijson en lugar de cargarlo entero
+STREAM_JSON_MIN_BYTES = 1 << 20
+# Código PlantUML ya generado en este proceso, por hash del JSON canónico de los datos (LRU)
+CODE_CACHE_SIZE = 256
+_CODE_CACHE = OrderedDict()
+_CODE_CACHE_LOCK = threading.Lock()
+
+
+def _plantuml_pipe():
+    """
+    Módulo plantuml_pipe, importado al renderizar y no al importar decoder: arrastra asyncio
+    y subprocess, que sobran cuando sólo se genera código PlantUML.
+    """
+    try:
+        from . import plantuml_pipe
+    except ImportError:
+        import plantuml_pipe
+    return plantuml_pipe
+
+
+def _code_cache_key(data):
+    """Hash del JSON canónico (claves ordenadas) de `data`; None si no es serializable."""
+    try:
+        if orjson is not None:
+            raw = orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+        else:
+            raw = json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    except (TypeError, ValueError):
+        return None
+    # sha256 usa las instrucciones SHA del CPU: más rápido que blake2b aquí
+    return hashlib.sha256(raw).digest()
+
+
+class _StreamedList:
+    """Lista JSON que se recorre con ijson elemento a elemento cada vez que se itera."""
+
+    def __init__(self, path: str, prefix: str):
+        self._path = path
+        self._prefix = prefix
+
+    def __iter__(self):
+        with open(self._path, "rb") as fh:
+            yield from ijson.items(fh, self._prefix, use_float=True)
+
+
+class _StreamedDiagram:
+    """
+    Vista de sólo lectura (`[]`/`get`) de un JSON de diagrama grande, para los decodificadores.
+
+    Las listas se devuelven como _StreamedList, así nunca se materializan enteras;
+    el resto de claves (diagramType) se cargan una vez y se guardan.
+    """
+
+    _STREAMED_KEYS = frozenset({
+        "declaringElements", "relationShips", "actors", "useCases", "packages", "relationships",
+    })
+    _MISSING = object()
+
+    def __init__(self, path: str):
+        self._path = path
+        self._values = {}
+
+    def __getitem__(self, key):
+        value = self.get(key, self._MISSING)
+        if value is self._MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        if key in self._STREAMED_KEYS:
+            return _StreamedList(self._path, f"{key}.item")
+        if key not in self._values:
+            self._values[key] = next(iter(_StreamedList(self._path, key)), self._MISSING)
+        value = self._values[key]
+        return default if value is self._MISSING else value
+
 
 class JsonPuml:
     """
@@ -14,13 +114,18 @@ class JsonPuml:
     Atributos:
         _plant_uml_path (str): Ruta donde se encuentra el archivo JAR de PlantUML.
         _plant_uml_version (str): Nombre del archivo JAR de PlantUML (por ejemplo, "plantuml-1.2025.2.jar").
+        _jar_path (str): Ruta completa del JAR (se calcula una vez en __init__).
         _json_path (str): Ruta del archivo JSON que contiene la configuración y datos del diagrama.
         _output_path (str): Ruta donde se generará el archivo de salida (diagrama generado).
         _diagram_name (str): Nombre del diagrama (se usa para el archivo .puml de entrada y el archivo de salida).
-        _data (dict): Datos leídos desde el archivo JSON.
+        _data (dict): Datos leídos desde el archivo JSON (None si el código salió de la caché).
         _code (str): Código PlantUML generado a partir de los datos del JSON.
     """
 
+    # Diagramas encolados con queue() a la espera de flush_batch()
+    _pending = []
+    _pending_lock = threading.Lock()
+
     def __init__(self, config: dict):
         """
         Inicializa la clase con la configuración proporcionada en el diccionario `config`.
@@ -39,20 +144,34 @@ class JsonPuml:
             # claves obligatorias
             self._plant_uml_path = config['plant_uml_path']
             self._plant_uml_version = config['plant_uml_version']
+            self._jar_path = os.path.join(self._plant_uml_path, self._plant_uml_version)
             self._json_path = config.get('json_path')
             self._output_path = config.get('output_path') or os.getcwd()
             self._diagram_name = config.get('diagram_name') or "diagram"
-
-            # Datos: preferir 'data' pasado en config, si no intentar cargar json_path si existe
+            # rutas de salida fijas: se calculan una vez; la carpeta se crea en el primer render
+            self._puml_out = os.path.join(self._output_path, self._diagram_name + ".puml")
+            self._rendered_out = os.path.join(self._output_path, f"{self._diagram_name}.{OUTPUT_FORMAT}")
+            self._output_path_ready = False
+
+            # Datos: preferir 'data' pasado en config, si no intentar cargar json_path si existe.
+            # Con json_path, si el mismo JSON ya se convirtió se reutiliza el .puml cacheado
+            # y no se cargan los datos (self._data queda en None).
+            self._code = None
+            code_cache = None
             if 'data' in config and config['data'] is not None:
                 self._data = config['data']
             elif self._json_path:
-                self._data = self._get_data()
+                code_cache = self._json_cache_entry()
+                self._code = self._load_cached_code(code_cache)
+                self._data = self._get_data() if self._code is None else None
             else:
                 self._data = None
 
             # Generar código inmediatamente si hay datos
-            self._code = self._json_to_plantuml() if self._data is not None else None
+            if self._code is None and self._data is not None:
+                self._code = self._cached_json_to_plantuml()
+                if code_cache is not None:
+                    self._store_in_cache(None, os.path.dirname(code_cache), code_cache, code=self._code)
         except KeyError as e:
             raise KeyError(f"Configuración inválida: falta la clave {e}") from e
         except Exception as e:
@@ -65,31 +184,181 @@ class JsonPuml:
         Este método:
         1. Crea la carpeta de salida si no existe.
         2. Guarda el código PlantUML en un archivo `.puml`.
-        3. Ejecuta PlantUML para generar el diagrama en el formato deseado.
+        3. Si el mismo código ya se renderizó, copia el resultado desde la caché.
+        4. Si no, ejecuta PlantUML y guarda el resultado en la caché.
+        """
+        job = self._prepare_render()
+        if job is None:
+            return
+        out, rendered, cache_dir, cached, plant_uml = job
+        java = self._check_environment(plant_uml)
+
+        # Proceso PlantUML residente (-pipe): evita arrancar una JVM por diagrama
+        plantuml_pipe = _plantuml_pipe()
+        try:
+            svg = plantuml_pipe.shared_pipe(plant_uml).render(self._code)
+        except plantuml_pipe.PlantUmlSyntaxError:
+            # diagrama inválido: ni se guarda ni se reintenta con otra JVM (fallaría igual)
+            raise
+        except (OSError, RuntimeError, UnicodeDecodeError):
+            # incluye TimeoutError: el proceso colgado ya se descartó y se usa una JVM por diagrama
+            svg = None
+        if svg:
+            with open(rendered, "w", encoding="utf-8") as output:
+                output.write(svg)
+            self._store_in_cache(rendered, cache_dir, cached)
+            return
+
+        # Fallback: una JVM por diagrama
+        self._run_plantuml(java, plant_uml, self._output_path, [out])
+        self._store_in_cache(rendered, cache_dir, cached)
+
+    def queue(self):
+        """
+        Como generate_diagram, pero deja el diagrama pendiente en lugar de ejecutar PlantUML.
+        Los pendientes se renderizan juntos con `flush_batch` (una JVM por JAR y carpeta de salida).
+        """
+        job = self._prepare_render()
+        if job is not None:
+            with JsonPuml._pending_lock:
+                JsonPuml._pending.append(job)
+
+    @classmethod
+    def flush_batch(cls):
+        """Renderiza los diagramas encolados con `queue`, agrupados por JAR y carpeta de salida."""
+        with cls._pending_lock:
+            pending, cls._pending = cls._pending, []
+        for jobs in cls._group_jobs(pending).values():
+            cls._render_jobs(jobs)
+
+    @classmethod
+    def generate_many(cls, configs, max_workers: int = None):
+        """
+        Genera los diagramas de varios `config` repartiendo los pendientes entre varias JVM
+        en paralelo (por defecto la mitad de los núcleos, para no agotar memoria con JVMs).
+        """
+        workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+        pending = [job for job in (cls(config)._prepare_render() for config in configs) if job is not None]
+        chunks = []
+        for jobs in cls._group_jobs(pending).values():
+            size = -(-len(jobs) // workers)
+            chunks.extend(jobs[i:i + size] for i in range(0, len(jobs), size))
+        from concurrent.futures import ThreadPoolExecutor
+
+        # hilos y no procesos: el trabajo lo hace la JVM; cada hilo sólo espera a su subprocess
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(cls._render_jobs, chunks):
+                pass
+
+    @staticmethod
+    def _group_jobs(pending):
+        """Agrupa los trabajos de `_prepare_render` por JAR y carpeta de salida."""
+        groups = {}
+        for job in pending:
+            out, _, _, _, plant_uml = job
+            groups.setdefault((plant_uml, os.path.dirname(out)), []).append(job)
+        return groups
+
+    @classmethod
+    def _render_jobs(cls, jobs):
+        """Renderiza en una sola JVM trabajos que comparten JAR y carpeta de salida."""
+        plant_uml = jobs[0][4]
+        java = cls._check_environment(plant_uml)
+        cls._run_plantuml(java, plant_uml, os.path.dirname(jobs[0][0]), [job[0] for job in jobs])
+        missing = [job[1] for job in jobs if not os.path.isfile(job[1])]
+        for _, rendered, cache_dir, cached, _ in jobs:
+            if rendered not in missing:
+                cls._store_in_cache(rendered, cache_dir, cached)
+        if missing:
+            raise RuntimeError(f"PlantUML no generó: {', '.join(missing)}")
+
+    @classmethod
+    def generate_batch(cls, instances):
+        """Genera los diagramas de varias instancias con una sola JVM por JAR y carpeta de salida."""
+        with cls.batched():
+            for instance in instances:
+                instance.queue()
+
+    @classmethod
+    @contextmanager
+    def batched(cls):
+        """`with JsonPuml.batched(): ...` llama a flush_batch al salir del bloque."""
+        try:
+            yield
+        finally:
+            cls.flush_batch()
+
+    def _prepare_render(self):
+        """
+        Crea la carpeta de salida y guarda el `.puml`. Si el mismo código ya se renderizó,
+        copia el resultado desde la caché y devuelve None; si no, devuelve
+        (puml, salida, carpeta de caché, entrada de caché, JAR) para renderizarlo.
         """
         # Validaciones previas
         if not self._code:
             raise RuntimeError("No hay código PlantUML para generar (self._code es None o vacío).")
 
-        os.makedirs(self._output_path, exist_ok=True)
-        out = os.path.join(self._output_path, self._diagram_name + ".puml")
-        plant_uml = os.path.join(self._plant_uml_path, self._plant_uml_version)
-
-        # Verificar entorno: java disponible y archivo jar existe
-        if shutil.which("java") is None:
+        if not self._output_path_ready:
+            os.makedirs(self._output_path, exist_ok=True)
+            self._output_path_ready = True
+        out = self._puml_out
+        rendered = self._rendered_out
+        plant_uml = self._jar_path
+
+        # Guardar .puml: se codifica una vez y se reutiliza para el hash (sin TextIOWrapper)
+        encoded = self._code.encode("utf-8")
+        self._write_if_changed(out, encoded)
+
+        # El hash se calcula aquí y no en __init__: la API reasigna self._code antes de generar
+        cache_dir = os.path.join(self._output_path, PUML_CACHE_DIR)
+        digest = hashlib.sha256(f"{OUTPUT_FORMAT}\n".encode("ascii"))
+        digest.update(encoded)
+        code_hash = digest.hexdigest()
+        cached = os.path.join(cache_dir, f"{code_hash}.{OUTPUT_FORMAT}")
+        try:
+            shutil.copyfile(cached, rendered)
+            os.utime(cached)  # el recorte descarta primero las menos usadas
+            return None
+        except OSError:
+            return out, rendered, cache_dir, cached, plant_uml
+
+    @staticmethod
+    def _write_if_changed(path: str, data: bytes):
+        """Escribe `data` en `path` salvo que el archivo ya tenga exactamente ese contenido."""
+        try:
+            if os.path.getsize(path) == len(data):
+                with open(path, "rb") as fh:
+                    if fh.read() == data:
+                        return
+        except OSError:
+            pass
+        with open(path, "wb") as output:
+            output.write(data)
+
+    @staticmethod
+    def _check_environment(plant_uml: str) -> str:
+        """Verifica que java esté disponible y que exista el JAR de PlantUML; devuelve la ruta de java."""
+        java = _plantuml_pipe().java_executable()
+        if java is None:
             raise FileNotFoundError("No se encontró 'java' en PATH. Java es requerido para ejecutar PlantUML.")
         if not os.path.isfile(plant_uml):
             raise FileNotFoundError(f"No se encontró el JAR de PlantUML en: {plant_uml}")
+        return java
 
-        # Guardar .puml
-        with open(out, "w", encoding="utf-8") as output:
-            output.write(self._code)
+    @staticmethod
+    def _run_plantuml(java: str, plant_uml: str, output_path: str, puml_paths: list):
+        """Lanza PlantUML sobre `puml_paths` en una sola JVM; captura la salida para diagnóstico."""
+        import subprocess
 
-        # Ejecutar PlantUML y capturar salida para diagnóstico
+        jvm_options = _plantuml_pipe().JVM_OPTIONS
         try:
-            proc = subprocess.run(
-                ["java", "-jar", plant_uml, "-tsvg", "-o", self._output_path, out],
-                check=True, capture_output=True, text=True
+            # Ruta absoluta de java y close_fds=False: subprocess usa posix_spawn en lugar de
+            # fork+exec (los descriptores de Python no son heredables, PEP 446).
+            # Añadir cwd, pass_fds o preexec_fn vuelve a fork+exec.
+            subprocess.run(
+                [java, *jvm_options, "-jar", plant_uml, "-nbthread", "auto",
+                 f"-t{OUTPUT_FORMAT}", "-o", output_path, *puml_paths],
+                check=True, capture_output=True, text=True, close_fds=False
             )
         except subprocess.CalledProcessError as e:
             msg = f"PlantUML falló (returncode={e.returncode}). stdout:\n{e.stdout}\nstderr:\n{e.stderr}"
@@ -97,12 +366,66 @@ class JsonPuml:
         except Exception as e:
             raise RuntimeError(f"Error inesperado al ejecutar PlantUML: {e}") from e
 
+    def _json_cache_entry(self):
+        """Ruta del .puml cacheado para el contenido actual de json_path; None si no se puede leer."""
+        digest = hashlib.sha256(f"{DECODER_VERSION}\n".encode("ascii"))
+        try:
+            with open(self._json_path, "rb") as fh:
+                for chunk in iter(lambda: fh.read(1 << 16), b""):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        return os.path.join(self._output_path, PUML_CACHE_DIR, f"{digest.hexdigest()}.puml")
+
+    @staticmethod
+    def _load_cached_code(cached):
+        if cached is None:
+            return None
+        try:
+            with open(cached, "r", encoding="utf-8") as fh:
+                code = fh.read()
+        except OSError:
+            return None
+        os.utime(cached)
+        return code
+
+    @staticmethod
+    def _store_in_cache(rendered, cache_dir: str, cached: str, code: str = None):
+        """
+        Copia a la caché el diagrama `rendered` (o escribe el texto `code`) de forma atómica y
+        descarta las entradas más antiguas si se supera PUML_CACHE_MAX_FILES.
+        Un fallo aquí no invalida el render.
+        """
+        # nombre único por escritura: varios hilos del proceso (generate_many, to_thread) pueden
+        # guardar el mismo hash a la vez
+        tmp = f"{cached}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            if code is None:
+                shutil.copyfile(rendered, tmp)
+            else:
+                with open(tmp, "w", encoding="utf-8") as fh:
+                    fh.write(code)
+            os.replace(tmp, cached)
+            entries = [e for e in os.scandir(cache_dir) if not e.name.endswith(".tmp")]
+            if len(entries) > PUML_CACHE_MAX_FILES:
+                entries.sort(key=lambda e: e.stat().st_mtime)
+                for entry in entries[:len(entries) - PUML_CACHE_MAX_FILES]:
+                    os.remove(entry.path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
     def _get_data(self) -> dict:
         """
         Carga los datos del archivo JSON.
 
         Este método abre el archivo JSON especificado en la configuración,
-        lee los datos y los devuelve como un diccionario.
+        lee los datos y los devuelve como un diccionario. Si el archivo supera
+        STREAM_JSON_MIN_BYTES y ijson está instalado, devuelve una vista que lo
+        recorre de forma incremental.
 
         Returns:
             dict: Los datos cargados del archivo JSON.
@@ -110,15 +433,39 @@ class JsonPuml:
         try:
             if not self._json_path:
                 raise ValueError("json_path no está definido en la configuración.")
-            with open(self._json_path, "r", encoding="utf-8") as fh:
-                return json.load(fh)
+            if ijson is not None and os.path.getsize(self._json_path) >= STREAM_JSON_MIN_BYTES:
+                return _StreamedDiagram(self._json_path)
+            with open(self._json_path, "rb") as fh:
+                return _json_loads(fh.read())
         except FileNotFoundError as e:
             raise FileNotFoundError(f"Archivo JSON no encontrado: {self._json_path}") from e
+        # orjson.JSONDecodeError hereda de json.JSONDecodeError
         except json.JSONDecodeError as e:
             raise ValueError(f"JSON mal formado en {self._json_path}: {e}") from e
         except Exception as e:
             raise RuntimeError(f"Error inesperado al cargar el archivo JSON: {e}") from e
 
+    def _cached_json_to_plantuml(self) -> str:
+        """
+        _json_to_plantuml con memoización por proceso (_CODE_CACHE) según el JSON canónico de
+        self._data. La usa __init__; la API llama a _json_to_plantuml directamente porque ya
+        cachea el SVG por contenido y aquí sólo pagaría el hash.
+        """
+        key = None if isinstance(self._data, _StreamedDiagram) else _code_cache_key(self._data)
+        if key is not None:
+            with _CODE_CACHE_LOCK:
+                code = _CODE_CACHE.get(key)
+                if code is not None:
+                    _CODE_CACHE.move_to_end(key)
+                    return code
+        code = self._json_to_plantuml()
+        if key is not None:
+            with _CODE_CACHE_LOCK:
+                _CODE_CACHE[key] = code
+                if len(_CODE_CACHE) > CODE_CACHE_SIZE:
+                    _CODE_CACHE.popitem(last=False)
+        return code
+
     def _json_to_plantuml(self) -> str:
         """
         Convierte los datos JSON a código PlantUML.
@@ -130,25 +477,23 @@ class JsonPuml:
             str: El código PlantUML generado a partir de los datos JSON.
         """
         try:
-        # Iniciar el código PlantUML
-            plantuml_str = "@startuml Diagram\n"
-
-        # Decodificar los datos en función del tipo de diagrama
-            if self._data["diagramType"] == "classDiagram":
-                decode_class = DecodeClass(self._data)
-                plantuml_str += decode_class.get_code()
-            elif self._data["diagramType"] == "useCaseDiagram":
-                decode_use_case = DecodeUseCase(self._data)
-                plantuml_str += decode_use_case.get_code()
+        # Iniciar el código PlantUML; los decodificadores escriben sus fragmentos en el buffer
+            buffer = io.StringIO()
+            buffer.write("@startuml Diagram\n")
+
+        # Decodificar los datos en función del tipo de diagrama (tipos sin decodificador: cuerpo vacío)
+            decoder_cls = _DECODERS.get(self._data["diagramType"])
+            if decoder_cls is not None:
+                decoder_cls(self._data).write_into(buffer)
         # Finalizar el código PlantUML
-            plantuml_str += "@enduml"
-            return plantuml_str
+            buffer.write("@enduml")
+            return buffer.getvalue()
         except KeyError as e:
-            print(f"Error, falta la clave {e} en los datos JSON")
-            sys.exit(1)
+            raise ValueError(f"Falta la clave {e} en los datos JSON") from e
+        except ValueError:
+            raise
         except Exception as e:
-            print(f"Error inesperado al convertir JSON a PlantUML: {e}")
-            sys.exit(1)
+            raise RuntimeError(f"Error inesperado al convertir JSON a PlantUML: {e}") from e
     
 
 class DecodeUseCase:
@@ -159,7 +504,8 @@ class DecodeUseCase:
 
     Atributos:
     - _data (dict): Los datos en formato JSON que describen el diagrama de casos de uso.
-    - _use_case_code (str): El código PlantUML generado para el diagrama.
+
+    El código se genera de forma perezosa con `emit()`, fragmento a fragmento.
     """
 
     def __init__(self, data: dict):
@@ -169,11 +515,7 @@ class DecodeUseCase:
         Parámetros:
         - data (dict): El diccionario que contiene los datos del diagrama en formato JSON.
         """
-        try:
-            self._data = data
-            self._use_case_code = self._generate_code()
-        except Exception as e:
-            raise RuntimeError(f"Error inesperado en DecodeUseCase: {e}") from e
+        self._data = data
 
     def get_code(self) -> str:
         """
@@ -182,189 +524,138 @@ class DecodeUseCase:
         Retorna:
         - str: El código PlantUML para el diagrama.
         """
-        return self._use_case_code
+        return "".join(self.emit())
+
+    def write_into(self, out) -> None:
+        """Escribe el código PlantUML del diagrama en `out` sin unirlo antes en un solo str."""
+        out.writelines(self.emit())
 
-    def _generate_code(self) -> str:
+    def emit(self) -> Iterator[str]:
         """
         Genera el código PlantUML para el diagrama de casos de uso a partir de los datos JSON.
 
-        Este método recorre los datos JSON y genera las representaciones correspondientes para
-        los actores, casos de uso, paquetes y relaciones.
+        Este método recorre los datos JSON y produce, fragmento a fragmento, las representaciones
+        correspondientes para los actores, casos de uso, paquetes y relaciones.
 
         Retorna:
-        - str: El código PlantUML generado para el diagrama.
+        - Iterator[str]: Los fragmentos del código PlantUML del diagrama.
         """
         try:
-            plantuml_str = ""
-
         # Actores
             for actor in self._data.get("actors", []):
-                plantuml_str = self._decodeUseCaseActor(plantuml_str, actor)
+                yield from self._decodeUseCaseActor(actor)
             
         # Casos de uso globales
             for use_case in self._data.get("useCases", []):
-                plantuml_str = self._decodeUseCase(plantuml_str, use_case)
+                yield from self._decodeUseCase(use_case)
 
         # Paquetes
-            plantuml_str = self._decodeUseCasePackage(plantuml_str, self._data)
+            yield from self._decodeUseCasePackage(self._data)
 
         # Relaciones
             for relation in self._data.get("relationships", []):
-                plantuml_str = self._decodeRelationships(plantuml_str, relation)     
-
-            return plantuml_str
-        except Exception as e: 
-            print(f"Error inesperado al generar el codigo PlantUML: {e}")
-            sys.exit(1)
+                yield from self._decodeRelationships(relation)     
+        # un único manejador para todos los _decode*: un paquete sin name/alias
+        except KeyError as e:
+            raise ValueError(f"Falta la clave {e} en un paquete del diagrama") from e
     
 
 
-    def _decodeUseCaseActor(self, current_code: str, data) -> str:
+    def _decodeUseCaseActor(self, data) -> Iterator[str]:
         """
-        Decodifica un actor y lo convierte a código PlantUML.
+        Decodifica un actor y genera su código PlantUML por fragmentos.
 
         Parámetros:
-        - current_code (str): El código PlantUML generado hasta el momento.
         - data (dict): Los datos del actor (nombre, alias, estereotipo, etc.).
-
-        Retorna:
-        - str: El código PlantUML actualizado con el actor.
-        """
-        try:     
-            plantuml_str = current_code
-
-            actor_name = data.get("name", "")
-            actor_alias = data.get("alias", "") 
-            actor_stereotype = f' <<{data["stereotype"]}>>' if "stereotype" in data else ""
-            actor_business = "/" if data.get("business", False) else ""
-
-            if actor_name:
-                plantuml_str += f"actor{actor_business} \"{actor_name}\""
-                if actor_alias:
-                    plantuml_str += f" as {actor_alias}"
-                plantuml_str += actor_stereotype + "\n"
-        
-            return plantuml_str
-        except Exception as e:
-            print(f"Error inesperado al decodificar actor: {e}")
-            sys.exit(1)
-
-    def _decodeUseCase(self, current_code: str, data) -> str:
         """
-        Decodifica un caso de uso y lo convierte a código PlantUML.
+        actor_name = data.get("name")
+        if not actor_name:
+            return
+        actor_alias = data.get("alias")
+        actor_stereotype = data.get("stereotype")
+        actor_business = "/" if data.get("business") else ""
+        alias_part = f" as {actor_alias}" if actor_alias else ""
+        stereotype_part = f" <<{actor_stereotype}>>" if actor_stereotype is not None else ""
+        yield f"actor{actor_business} \"{actor_name}\"{alias_part}{stereotype_part}\n"
+
+    def _decodeUseCase(self, data) -> Iterator[str]:
+        """
+        Decodifica un caso de uso y genera su código PlantUML por fragmentos.
 
         Parámetros:
-        - current_code (str): El código PlantUML generado hasta el momento.
         - data (dict): Los datos del caso de uso (nombre, alias, estereotipo, etc.).
-
-        Retorna:
-        - str: El código PlantUML actualizado con el caso de uso.
         """
-        try:
-            plantuml_str = current_code
-
-            usecase_name = data.get("name", "")
-            if usecase_name:
-                usecase_business = "/" if data.get("business", False) else ""
-                usecase_alias = data.get("alias", "")
-                usecase_stereotype = actor_stereotype = f' <<{data["stereotype"]}>>' if "stereotype" in data else ""
-                if usecase_alias:
-                    plantuml_str += f'usecase{usecase_business} (\"{usecase_name}\") as {usecase_alias} {usecase_stereotype}\n'
-    
-            return plantuml_str
-        except Exception as e:
-            print(f"Error inesperado al decodificar caso de uso: {e}")
-            sys.exit(1)
+        usecase_name = data.get("name")
+        usecase_alias = data.get("alias")
+        if not (usecase_name and usecase_alias):
+            return
+        usecase_business = "/" if data.get("business") else ""
+        stereotype = data.get("stereotype")
+        usecase_stereotype = f" <<{stereotype}>>" if stereotype is not None else ""
+        yield f'usecase{usecase_business} (\"{usecase_name}\") as {usecase_alias} {usecase_stereotype}\n'
 
 
-    def _decodeUseCasePackage(self, current_code: str, data) -> str:
+    def _decodeUseCasePackage(self, data) -> Iterator[str]:
         """
-        Decodifica los paquetes de casos de uso y actores, generando el código PlantUML correspondiente.
+        Decodifica los paquetes de casos de uso y actores y genera su código PlantUML por fragmentos.
 
         Parámetros:
-        - current_code (str): El código PlantUML generado hasta el momento.
         - data (dict): Los datos del paquete (que contiene casos de uso y actores).
-
-        Retorna:
-        - str: El código PlantUML actualizado con los paquetes.
         """
-        try:
-            plantuml_str = current_code
-            packages = data.get("packages", [])
-            if not packages:
-                return plantuml_str
-        
-            for package in packages:
-                plantuml_str += f'package "{package["name"]}" as {package["alias"]} {{\n'
+        # Los paquetes raíz se recorren en orden (pueden venir de un _StreamedList);
+        # los anidados, en DFS con pila explícita de (paquete, cerrar)
+        for root in data.get("packages", []):
+            stack = [(root, False)]
+            while stack:
+                package, closing = stack.pop()
+                if closing:
+                    yield "}\n"
+                    continue
+                yield f'package "{package["name"]}" as {package["alias"]} {{\n'
 
                 for use_case in package.get("useCases", []):
-                    plantuml_str = self._decodeUseCase(plantuml_str, use_case) 
+                    yield from self._decodeUseCase(use_case) 
 
                 for actor in package.get("actors", []):
-                    plantuml_str = self._decodeUseCaseActor(plantuml_str, actor)
+                    yield from self._decodeUseCaseActor(actor)
 
-                plantuml_str = self._decodeUseCasePackage(plantuml_str, package)
+                stack.append((package, True))
+                stack.extend((sub, False) for sub in reversed(package.get("packages", [])))
 
-                plantuml_str += "}\n" 
-
-            return plantuml_str
-        except Exception as e:
-            print(f"Error inesperado al decodificar paquete: {e}")
-            sys.exit(1)
-
-    def _decodeRelationships(self, current_code: str, data) -> str:
+    def _decodeRelationships(self, data) -> Iterator[str]:
         """
-        Decodifica las relaciones entre actores y casos de uso y las convierte a código PlantUML.
+        Decodifica una relación entre actores y casos de uso y genera su código PlantUML por fragmentos.
 
         Parámetros:
-        - current_code (str): El código PlantUML generado hasta el momento.
         - data (dict): Los datos de la relación (tipo, principal, secundario, dirección, etc.).
-
-        Retorna:
-        - str: El código PlantUML actualizado con la relación.
         """
-        try:
-
-            plantuml_str = current_code
-
-            relation_type = data.get("type", "")
-            relation_principal = data.get("principal", "")
-            relation_secondary = data.get("secondary", "")
-            relation_direction = data.get("direction", "")
-            relation_label = f":\"{data.get('label', '')}\"" if data.get('label') else ""
-
-            # Solo actor_actor
-            relation_extend = data.get("extend", "")
-        
-            # Solo usecase_usecase 
-            relation_stereotype = data.get("stereotype", "")
-
-            if(relation_principal and relation_secondary):
-                if relation_type == "actor_actor": 
-                    if relation_extend == ">":
-                        plantuml_str += f"{relation_secondary} <|-- {relation_principal}"
-                    elif relation_extend == "<":
-                        plantuml_str += f"{relation_principal} <|-- {relation_secondary}"
-                    else:
-                        plantuml_str += f"{relation_principal} -{relation_direction}-> {relation_secondary}"
-                    plantuml_str += relation_label + "\n"
-                    
-                elif relation_type == "actor_usecase":
-                    plantuml_str += f"{relation_principal} -{relation_direction}-> {relation_secondary}{relation_label}\n"
-
-                elif relation_type == "useCase_usecase":
-                    if relation_stereotype == "include" :
-                        plantuml_str += f"{relation_principal} .> {relation_secondary}: include\n"
-                    elif relation_stereotype == "extends":
-                        plantuml_str += f"{relation_principal} .> {relation_secondary}: extends\n"
-
-                elif relation_type == "package_package":
-                    plantuml_str += f"{relation_principal} -{relation_direction}-> {relation_secondary}{relation_label}\n"
-
-            return plantuml_str
-        except Exception as e:
-            print(f"Error inesperado al decodificar relaciones: {e}")
-            sys.exit(1)
+        relation_principal = data.get("principal")
+        relation_secondary = data.get("secondary")
+        if not (relation_principal and relation_secondary):
+            return
+        relation_type = data.get("type")
+
+        if relation_type == "useCase_usecase":
+            # Solo usecase_usecase
+            relation_stereotype = data.get("stereotype")
+            if relation_stereotype == "include" or relation_stereotype == "extends":
+                yield f"{relation_principal} .> {relation_secondary}: {relation_stereotype}\n"
+            return
+        if relation_type not in ("actor_actor", "actor_usecase", "package_package"):
+            return
+
+        relation_direction = data.get("direction", "")
+        label = data.get("label")
+        relation_label = f":\"{label}\"" if label else ""
+
+        # Solo actor_actor
+        relation_extend = data.get("extend") if relation_type == "actor_actor" else None
+        if relation_extend == ">":
+            yield f"{relation_secondary} <|-- {relation_principal}{relation_label}\n"
+        elif relation_extend == "<":
+            yield f"{relation_principal} <|-- {relation_secondary}{relation_label}\n"
+        else:
+            yield f"{relation_principal} -{relation_direction}-> {relation_secondary}{relation_label}\n"
 
 class DecodeClass:
     """
@@ -374,12 +665,12 @@ class DecodeClass:
         _data (dict): Los datos en formato JSON que describen las clases, atributos, métodos y relaciones.
         _visibilities (dict): Diccionario que mapea los niveles de visibilidad a su representación PlantUML.
         _relations_type (dict): Diccionario que mapea los tipos de relaciones a su representación PlantUML.
-        _class_code (str): El código PlantUML generado a partir de los datos JSON.
 
     Métodos:
         __init__(self, data: dict): Inicializa la clase con los datos del diagrama de clases en formato JSON.
         get_code(self) -> str: Retorna el código PlantUML generado para el diagrama de clases.
-        _generate_code(self) -> str: Genera el código PlantUML a partir de los datos del diagrama de clases.
+        write_into(self, out): Escribe el código PlantUML generado en `out`.
+        emit(self) -> Iterator[str]: Genera, fragmento a fragmento, el código PlantUML del diagrama de clases.
     """
     
     def __init__(self, data: dict):
@@ -389,33 +680,25 @@ class DecodeClass:
         Parámetros:
             data (dict): Los datos del diagrama de clases, incluyendo clases, atributos, métodos y relaciones.
         """
-        try:
-            
-            self._data = data
+        self._data = data
 
         # Mapeo de visibilidades en PlantUML
-            self._visibilities = {
-                "private": "-",
-                "protected": "#",
-                "package private": "~",
-                "public": "+"
-            }
-
-            # Mapeo de tipos de relaciones en PlantUML
-            self._relations_type = {
-                "inheritance": "<|--",
-                "composition": "*--",
-                "aggregation": "o--",
-                "association": "--",
-                "instantiation": "..|>",
-                "realization": "<|..",
-            }
-
-            # Genera el código PlantUML
-            self._class_code = self._generate_code()
-        except Exception as e:
-            print(f"Error inesperado en DecodeClass: {e}")
-            sys.exit(1)
+        self._visibilities = {
+            "private": "-",
+            "protected": "#",
+            "package private": "~",
+            "public": "+"
+        }
+
+        # Mapeo de tipos de relaciones en PlantUML
+        self._relations_type = {
+            "inheritance": "<|--",
+            "composition": "*--",
+            "aggregation": "o--",
+            "association": "--",
+            "instantiation": "..|>",
+            "realization": "<|..",
+        }
 
     def get_code(self) -> str:
         """
@@ -424,70 +707,74 @@ class DecodeClass:
         Retorna:
             str: El código PlantUML para el diagrama de clases.
         """
-        return self._class_code
+        return "".join(self.emit())
+
+    def write_into(self, out) -> None:
+        """Escribe el código PlantUML del diagrama en `out` sin unirlo antes en un solo str."""
+        out.writelines(self.emit())
 
-    def _generate_code(self) -> str:
+    def emit(self) -> Iterator[str]:
         """
         Genera el código PlantUML a partir de los datos del diagrama de clases en formato JSON.
 
-        Este método recorre los datos del diagrama y construye el código PlantUML correspondiente
-        a las clases, atributos, métodos y relaciones entre clases.
+        Este método recorre los datos del diagrama y produce, fragmento a fragmento, el código
+        PlantUML correspondiente a las clases, atributos, métodos y relaciones entre clases.
 
         Retorna:
-            str: El código PlantUML generado para el diagrama de clases.
+            Iterator[str]: Los fragmentos del código PlantUML del diagrama de clases.
         """
-        try:
-            plantuml_str = ""
-
-            # Recorre los elementos declarados (clases)
-            for element in self._data.get('declaringElements', []):
-                # Declara la clase
-                type = element.get('type', '')
-                elementName = element.get('name', '')
-                plantuml_str += f"{type} {elementName}\n"
-
-                # Añadir atributos para las clases
-                for attribute in element.get('attributes', []):
-                    attributeName = attribute.get('name', '')
-                    attributeType = attribute.get('type', '')
-                    visibility = self._visibilities.get(attribute.get('visibility', ''), '')
-                    static = "{isStatic}" if attribute.get('isStatic', False) else ''
-                    final = "{final}" if attribute.get('isFinal', False) else ''
-                    plantuml_str += f"{elementName} : {visibility} {static} {final} {attributeType} {attributeName}\n"
-
-                # Añadir métodos para las clases    
-                for method in element.get('methods', []):
-                    methodName = method.get('name', '')
-                    abstract = "{abstract}" if method.get('isAbstract', False) else ''
-                    visibility = self._visibilities.get(method.get('visibility', 'public'), '+')
-                    returnType =  method.get('returnType', 'void')
-
-                    # Añadir parámetros a los métodos
-                    params = ""
-                    for param in method.get('params', []):
-                        params += f"{param.get('type', '')} {param.get('name', '')} "
-
-                    plantuml_str += f"{elementName} : {visibility} {abstract} {returnType} {methodName}({params[:-1]})\n"  # params[:-1] elimina el último espacio
-
-                # Añadir relaciones entre clases
-                for relation in self._data.get('relationShips', []):
-                    relationType = self._relations_type.get(relation.get('type', ''), '--')
-                    source = relation.get('source', '') 
-                    target = relation.get('target', '')
-                    multiplicityEnd1 = ''
-                    multiplicityEnd2 = ''
-                    mult = relation.get('multiplicity')
-                    if isinstance(mult, (list, tuple)):
-                        if len(mult) > 0 and mult[0] is not None:
-                            multiplicityEnd1 = f'"{mult[0]}"'
-                        if len(mult) > 3 and mult[3] is not None:
-                            multiplicityEnd2 = f'"{mult[3]}"'
-
-                    plantuml_str += f"{source} {multiplicityEnd1} {relationType} {multiplicityEnd2} {target}\n"
-
-            # Al final devolver el código generado (incluso si está vacío)
-            return plantuml_str
-        except Exception as e:
-            print(f"Error inesperado al generar codigo PlantUML: {e}")
-            sys.exit(1)
+        # .get de los mapas en locales: se consultan una vez por atributo, método y relación
+        visibility_of = self._visibilities.get
+        relation_of = self._relations_type.get
+
+        # Recorre los elementos declarados (clases)
+        for element in self._data.get('declaringElements', []):
+            # Declara la clase
+            type = element.get('type', '')
+            elementName = element.get('name', '')
+            yield f"{type} {elementName}\n"
+
+            # Añadir atributos para las clases
+            for attribute in element.get('attributes', []):
+                attributeName = attribute.get('name', '')
+                attributeType = attribute.get('type', '')
+                visibility = visibility_of(attribute.get('visibility', ''), '')
+                static = "{isStatic}" if attribute.get('isStatic', False) else ''
+                final = "{final}" if attribute.get('isFinal', False) else ''
+                yield f"{elementName} : {visibility} {static} {final} {attributeType} {attributeName}\n"
+
+            # Añadir métodos para las clases    
+            for method in element.get('methods', []):
+                methodName = method.get('name', '')
+                abstract = "{abstract}" if method.get('isAbstract', False) else ''
+                visibility = visibility_of(method.get('visibility', 'public'), '+')
+                returnType =  method.get('returnType', 'void')
+
+                # Añadir parámetros a los métodos
+                params = " ".join(f"{param.get('type', '')} {param.get('name', '')}" for param in method.get('params', []))
+
+                yield f"{elementName} : {visibility} {abstract} {returnType} {methodName}({params})\n"
+
+        # Añadir relaciones entre clases (una vez, tras declarar todas las clases)
+        for relation in self._data.get('relationShips', []):
+            relationType = relation_of(relation.get('type', ''), '--')
+            source = relation.get('source', '') 
+            target = relation.get('target', '')
+            multiplicityEnd1 = ''
+            multiplicityEnd2 = ''
+            mult = relation.get('multiplicity')
+            if isinstance(mult, (list, tuple)):
+                if len(mult) > 0 and mult[0] is not None:
+                    multiplicityEnd1 = f'"{mult[0]}"'
+                if len(mult) > 3 and mult[3] is not None:
+                    multiplicityEnd2 = f'"{mult[3]}"'
+
+            yield f"{source} {multiplicityEnd1} {relationType} {multiplicityEnd2} {target}\n"
+
+
+# Decodificador por diagramType; para un tipo nuevo basta con registrar su clase aquí
+_DECODERS = {
+    "classDiagram": DecodeClass,
+    "useCaseDiagram": DecodeUseCase,
+}
 
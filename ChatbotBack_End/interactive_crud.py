@@ -1,8 +1,86 @@
 import json
+import sys
 from OperationCRUD import DiagramCRUD
 
-def prompt(prompt_text: str):
-    return input(prompt_text + " ")
+try:
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.completion import WordCompleter
+except ImportError:
+    PromptSession = None
+
+COMMANDS = ["list", "create", "find", "update", "delete", "add_attr", "add_method", "save", "exit"]
+
+# una sola sesión para todo el CLI (historial y edición de línea); sin terminal se usa input()
+_session = PromptSession() if PromptSession is not None and sys.stdin.isatty() else None
+_command_completer = WordCompleter(COMMANDS) if _session is not None else None
+
+def prompt(prompt_text: str, completer=None):
+    if _session is None:
+        return input(prompt_text + " ")
+    return _session.prompt(prompt_text + " ", completer=completer)
+
+def _do_list(crud):
+    classes = crud.list_classes()
+    if not classes:
+        print("No classes defined yet.")
+    for c in classes:
+        print(f"- id: {c.get('id')} name: {c.get('name')} attrs:{len(c.get('attributes',[]))} methods:{len(c.get('methods',[]))}")
+
+def _do_create(crud):
+    name = prompt("Class name:")
+    new = crud.create_class(name)
+    print("Created:", new)
+
+def _do_find(crud):
+    name = prompt("Class name to find:")
+    found = crud.find_class_by_name(name)
+    print(found or "Not found")
+
+def _do_update(crud):
+    cid = prompt("Class id to update:")
+    name = prompt("New name (leave empty to keep):")
+    data = {}
+    if name:
+        data['name'] = name
+    updated = crud.update_class(cid, data)
+    print(updated or "Not found or no changes")
+
+def _do_delete(crud):
+    cid = prompt("Class id to delete:")
+    ok = crud.delete_class(cid)
+    print("Deleted" if ok else "Not found")
+
+def _do_add_attr(crud):
+    cid = prompt("Class id:")
+    aname = prompt("Attribute name:")
+    attr = {"name": aname, "type": "String", "visibility": "public"}
+    res = crud.add_attribute(cid, attr)
+    print(res or "Class not found")
+
+def _do_add_method(crud):
+    cid = prompt("Class id:")
+    mname = prompt("Method name:")
+    method = {"name": mname, "returnType": "void", "visibility": "public", "params": []}
+    res = crud.add_method(cid, method)
+    print(res or "Class not found")
+
+def _do_save(crud):
+    path = prompt("File path to save JSON (e.g., ./diagram.json):")
+    crud.storage_path = path
+    crud._persist()
+    print("Saved to", path)
+
+# "exit" no tiene handler: lo resuelve el bucle de main()
+_HANDLERS = {
+    "list": _do_list,
+    "create": _do_create,
+    "find": _do_find,
+    "update": _do_update,
+    "delete": _do_delete,
+    "add_attr": _do_add_attr,
+    "add_method": _do_add_method,
+    "save": _do_save,
+}
 
 def main():
     print("Interactive CRUD for Diagram (simple CLI)")
@@ -10,56 +88,16 @@ def main():
     crud = DiagramCRUD(diagram)
 
     while True:
-        print("\nOptions: list, create, find, update, delete, add_attr, add_method, save, exit")
-        cmd = prompt("Choose an option:")
-        if cmd == "list":
-            classes = crud.list_classes()
-            if not classes:
-                print("No classes defined yet.")
-            for c in classes:
-                print(f"- id: {c.get('id')} name: {c.get('name')} attrs:{len(c.get('attributes',[]))} methods:{len(c.get('methods',[]))}")
-        elif cmd == "create":
-            name = prompt("Class name:")
-            new = crud.create_class(name)
-            print("Created:", new)
-        elif cmd == "find":
-            name = prompt("Class name to find:")
-            found = crud.find_class_by_name(name)
-            print(found or "Not found")
-        elif cmd == "update":
-            cid = prompt("Class id to update:")
-            name = prompt("New name (leave empty to keep):")
-            data = {}
-            if name:
-                data['name'] = name
-            updated = crud.update_class(cid, data)
-            print(updated or "Not found or no changes")
-        elif cmd == "delete":
-            cid = prompt("Class id to delete:")
-            ok = crud.delete_class(cid)
-            print("Deleted" if ok else "Not found")
-        elif cmd == "add_attr":
-            cid = prompt("Class id:")
-            aname = prompt("Attribute name:")
-            attr = {"name": aname, "type": "String", "visibility": "public"}
-            res = crud.add_attribute(cid, attr)
-            print(res or "Class not found")
-        elif cmd == "add_method":
-            cid = prompt("Class id:")
-            mname = prompt("Method name:")
-            method = {"name": mname, "returnType": "void", "visibility": "public", "params": []}
-            res = crud.add_method(cid, method)
-            print(res or "Class not found")
-        elif cmd == "save":
-            path = prompt("File path to save JSON (e.g., ./diagram.json):")
-            crud.storage_path = path
-            crud._persist()
-            print("Saved to", path)
-        elif cmd == "exit":
+        print("\nOptions: " + ", ".join(COMMANDS))
+        cmd = prompt("Choose an option:", completer=_command_completer)
+        if cmd == "exit":
             print("Bye")
             break
-        else:
+        handler = _HANDLERS.get(cmd)
+        if handler is None:
             print("Unknown command")
+        else:
+            handler(crud)
 
 if __name__ == '__main__':
     main()
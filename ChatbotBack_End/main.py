@@ -1,7 +1,19 @@
 import os
 import json
 import jsonschema
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Optional  
+try:
+    # validadores compilados a código Python; si no está, se usa jsonschema
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+try:
+    # orjson es más rápido; fuera del servicio puede no estar instalado
+    from orjson import dumps as _json_dumps, loads as _json_loads
+except ImportError:
+    _json_dumps, _json_loads = json.dumps, json.loads
 # imports relativos para funcionar cuando se carga como paquete
 try:
     # prefer import relativo cuando se ejecuta como paquete
@@ -23,23 +35,31 @@ except Exception:
             "Si trabajas con el paquete, añade un __init__.py en la carpeta ChatbotBack_End."
         ) from e
 
-# Intentar importar el cliente LLM; si no existe, proporcionar un fallback mínimo
+# Intentar importar el cliente LLM; si no existe, proporcionar un fallback mínimo.
+# API_SERVICE lo importa desde aquí para no duplicar la resolución.
 try:
     from app.services.llm_client import ask_llm_for_diagram_type
 except Exception:
     try:
         from .app.services.llm_client import ask_llm_for_diagram_type
     except Exception:
+        # respuesta fija de solo lectura: no se crea un dict nuevo por cada consulta
+        _LLM_FALLBACK_RESPONSE = MappingProxyType({
+            "resolved": False,
+            "question": "¿Quieres un diagrama de clases o un diagrama de casos de uso?",
+            "diagram_type": None,
+            "raw": None
+        })
+
         # Fallback asíncrono mínimo para evitar fallos en tiempo de import
         async def ask_llm_for_diagram_type(text: str):
-            return {
-                "resolved": False,
-                "question": "¿Quieres un diagrama de clases o un diagrama de casos de uso?",
-                "raw": None
-            }
+            return _LLM_FALLBACK_RESPONSE
 
 import re
 import asyncio
+import concurrent.futures
+import threading
+from contextlib import contextmanager
 
 # Instancia global del clasificador avanzado (único)
 diagram_classifier = AdvancedDiagramClassifier()
@@ -47,66 +67,190 @@ diagram_classifier = AdvancedDiagramClassifier()
 # umbral por debajo del cual consultamos al LLM para aclaración
 LLM_FALLBACK_CONFIDENCE = 0.65
 
+# Rutas de PlantUML relativas al módulo (independientes del CWD), calculadas una vez.
+# Cada llamada sólo añade diagram_name/data encima de BASE_CONFIG.
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+PLANT_UML_PATH = os.path.join(MODULE_DIR, "plant_uml_exc")
+DEFAULT_OUTPUT_PATH = os.path.join(MODULE_DIR, "output")
+BASE_CONFIG = MappingProxyType({
+    "plant_uml_path": PLANT_UML_PATH,
+    "plant_uml_version": "plantuml-1.2025.2.jar",
+    "json_path": None,
+    "output_path": DEFAULT_OUTPUT_PATH,
+})
+
+# Un lock por archivo de salida (output.svg, diagram_<id>.svg): la API renderiza desde varios
+# hilos y, entre generar el SVG y leerlo, otro render del mismo nombre podría reescribirlo.
+# Cada entrada cuenta sus usuarios y se descarta al quedar libre.
+_OUTPUT_LOCKS = {}
+_OUTPUT_LOCKS_GUARD = threading.Lock()
+
+@contextmanager
+def _output_lock(diagram_name):
+    with _OUTPUT_LOCKS_GUARD:
+        entry = _OUTPUT_LOCKS.get(diagram_name)
+        if entry is None:
+            entry = _OUTPUT_LOCKS[diagram_name] = [threading.Lock(), 0]
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _OUTPUT_LOCKS_GUARD:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _OUTPUT_LOCKS[diagram_name]
+
+def generate_svg(config, code=None):
+    """
+    Genera con JsonPuml el diagrama de `config` (o el código PlantUML `code`, si se indica)
+    y devuelve el SVG leído del archivo de salida, o None si no se produjo.
+    """
+    with _output_lock(config["diagram_name"]):
+        json_puml = JsonPuml(config=config)
+        if code is not None:
+            json_puml._code = code
+        json_puml.generate_diagram()
+        svg_path = os.path.join(config["output_path"], config["diagram_name"] + ".svg")
+        try:
+            with open(svg_path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+# Patrones de build_json_for_decoder, compilados una vez al importar el módulo
+# bloques "Clase: atributos: a, b; métodos: c()"
+_RE_CLASS_BLOCK = re.compile(r"\b([A-ZÁÉÍÓÚÑ]\w*)\s*:\s*([^\n]+)")
+_RE_BLOCK_ATTRS = re.compile(r"atribut(?:o|os)\s*[:\-]?\s*([^;]+)", re.IGNORECASE)
+_RE_BLOCK_METHODS = re.compile(r"métod(?:o|os)\s*[:\-]?\s*([^;]+)", re.IGNORECASE)
+# separador de listas: "a, b y c"
+_RE_LIST_SEP = re.compile(r',|\s+y\s+')
+# limpieza de nombres en una pasada (con match, grupo 1): símbolos iniciales (sólo atributos),
+# un prefijo "x:" y, del resto, la primera palabra. Los bloques no contienen saltos de línea.
+_RE_ATTR_NAME = re.compile(r'[^\wÀ-ÿ_]*(?:[A-Za-zÀ-ÿ0-9_]+:\s*)?([\wÀ-ÿ_]*)')
+_RE_METHOD_NAME = re.compile(r'(?:[A-Za-zÀ-ÿ0-9_]+:\s*)?([\wÀ-ÿ_]*)')
+_RE_PARENS = re.compile(r'\(.*\)')
+# diagrama de clases
+_RE_CLASS = re.compile(r'clase\s+(\w+)', re.IGNORECASE)
+_RE_CLASS_LIST = re.compile(r'clases?\s+([A-ZÁÉÍÓÚÑ][\w]*(?:\s*,\s*[A-ZÁÉÍÓÚÑ][\w]*|\s+y\s+[A-ZÁÉÍÓÚÑ][\w]*)*)')
+_RE_ANY_ATTR = re.compile(r'atributo[s]?\s+([\w]+)', re.IGNORECASE)
+_RE_ANY_METHOD = re.compile(r'método[s]?\s+([\w]+)', re.IGNORECASE)
+_RE_INHERITS = re.compile(r'(\w+)\s+hereda\s+de\s+(\w+)', re.IGNORECASE)
+# diagrama de casos de uso
+_RE_ACTOR = re.compile(r'actor\s+(\w+)', re.IGNORECASE)
+_RE_USECASE = re.compile(r'caso de uso\s+([\w\s]+)', re.IGNORECASE)
+_RE_CAN = re.compile(r'(\w+)\s+puede\s+([\w\s]+)', re.IGNORECASE)
+
+# patrones por clase ("<Clase> tiene atributos a, b"): se compilan una vez por nombre
+@lru_cache(maxsize=512)
+def _class_attrs_re(class_name):
+    return re.compile(rf'{re.escape(class_name)}[^\.\,\n]*atributo[s]?\s+([\w\s,]+)', re.IGNORECASE)
+
+@lru_cache(maxsize=512)
+def _class_methods_re(class_name):
+    return re.compile(rf'{re.escape(class_name)}[^\.\,\n]*método[s]?\s+([\w\s,()]+)', re.IGNORECASE)
+
+# Event loop persistente (hilo daemon) para consultar al LLM desde código síncrono:
+# asyncio.run crearía un loop por llamada y, con él, un cliente HTTP nuevo sin keep-alive
+_LLM_LOOP = None
+_LLM_LOOP_LOCK = threading.Lock()
+# segundos de espera por la respuesta del LLM (algo más que el timeout HTTP del cliente)
+LLM_SYNC_TIMEOUT = 20.0
+
+def _llm_loop():
+    global _LLM_LOOP
+    with _LLM_LOOP_LOCK:
+        if _LLM_LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-loop", daemon=True).start()
+            _LLM_LOOP = loop
+        return _LLM_LOOP
+
+def _ask_llm_sync(text, timeout=LLM_SYNC_TIMEOUT):
+    """
+    ask_llm_for_diagram_type desde código síncrono (cualquier hilo), sobre el loop persistente.
+    Si no hay respuesta en `timeout` segundos se cancela la consulta y se pide aclaración.
+    """
+    future = asyncio.run_coroutine_threadsafe(ask_llm_for_diagram_type(text), _llm_loop())
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        return {
+            "resolved": False,
+            "diagram_type": None,
+            "question": "¿Puedes especificar si quieres un diagrama de clases o de casos de uso?",
+            "error": f"El LLM no respondió en {timeout} s.",
+        }
+
 def build_json_for_decoder(text, diagram_type, classifier=None, user_id="default"):
     # Usa el contexto del clasificador si está disponible
     context = classifier.get_user_context(user_id) if classifier and hasattr(classifier, "get_user_context") else {}
+    messages = tuple(context.get('messages') or ()) if context else ()
+    # el resultado depende sólo de (texto, tipo, mensajes del contexto): se memoiza serializado
+    # y cada llamada recibe su propia copia
+    return _json_loads(_build_json_cached(text, diagram_type, messages))
+
+@lru_cache(maxsize=1024)
+def _build_json_cached(text, diagram_type, messages):
+    return _json_dumps(_build_json(text, diagram_type, messages))
+
+def _build_json(text, diagram_type, messages):
+    # prefiltro: un patrón con palabra clave no puede coincidir si la palabra no aparece
+    # (casefold cubre las coincidencias sin distinguir mayúsculas de re.IGNORECASE)
+    folded = text.casefold()
+    # mensajes del contexto en un solo texto: un escaneo por patrón en lugar de uno por mensaje.
+    # El separador "\x00" no es \w ni \s, así que ninguna coincidencia cruza de un mensaje a otro
+    context_text = "\x00".join(messages)
 
     if diagram_type == "diagrama_clases":
         # Primero intentar detectar bloques del tipo "Clase: atributos...; métodos..."
         pre_parsed = {}
-        for m in re.finditer(r"\b([A-ZÁÉÍÓÚÑ]\w*)\s*:\s*([^\n]+)", text):
+        for m in _RE_CLASS_BLOCK.finditer(text):
             cls = m.group(1)
             rest = m.group(2)
             attrs = []
             methods_list = []
             # Buscar secciones por palabras clave
             # ejemplo: "atributos: id, nombre; métodos: crear(), eliminar()"
-            m_attrs = re.search(r"atribut(?:o|os)\s*[:\-]?\s*([^;]+)", rest, re.IGNORECASE)
+            m_attrs = _RE_BLOCK_ATTRS.search(rest)
             if m_attrs:
-                for a in re.split(r',|\s+y\s+', m_attrs.group(1)):
-                    n = a.strip()
+                for a in _RE_LIST_SEP.split(m_attrs.group(1)):
                     # limpiar prefijos no deseados (ej. "s: id") y caracteres extra
-                    n = re.sub(r'^[^\wÀ-ÿ_]+', '', n)
-                    n = re.sub(r'^[A-Za-zÀ-ÿ0-9_]+:\s*', '', n)
-                    n = re.sub(r'[^\wÀ-ÿ_].*$', '', n)
+                    n = _RE_ATTR_NAME.match(a.strip()).group(1)
                     if n:
                         attrs.append(n)
-            m_methods = re.search(r"métod(?:o|os)\s*[:\-]?\s*([^;]+)", rest, re.IGNORECASE)
+            m_methods = _RE_BLOCK_METHODS.search(rest)
             if m_methods:
-                for mm in re.split(r',|\s+y\s+', m_methods.group(1)):
-                    name = re.sub(r'\(.*\)', '', mm).strip()
-                    # eliminar prefijos tipo "métodos:" o "s:" que puedan quedar
-                    name = re.sub(r'^[A-Za-zÀ-ÿ0-9_]+:\s*', '', name)
-                    # limpiar caracteres no alfanuméricos sobrantes
-                    name = re.sub(r'[^\wÀ-ÿ_].*$', '', name)
+                for mm in _RE_LIST_SEP.split(m_methods.group(1)):
+                    # eliminar prefijos tipo "métodos:" o "s:" que puedan quedar y
+                    # caracteres no alfanuméricos sobrantes
+                    name = _RE_METHOD_NAME.match(_RE_PARENS.sub('', mm).strip()).group(1)
                     if name:
                         methods_list.append(name)
             if attrs or methods_list:
                 pre_parsed[cls] = {'attributes': attrs, 'methods': methods_list}
 
         # Buscar nombres de clase en varias formas: "clase X", o "clases A, B y C"
-        class_names = re.findall(r'clase\s+(\w+)', text, re.IGNORECASE)
-        if not class_names:
-            m = re.search(r'clases?\s+([A-ZÁÉÍÓÚÑ][\w]*(?:\s*,\s*[A-ZÁÉÍÓÚÑ][\w]*|\s+y\s+[A-ZÁÉÍÓÚÑ][\w]*)*)', text)
+        has_class = "clase" in folded
+        class_names = _RE_CLASS.findall(text) if has_class else []
+        if not class_names and has_class:
+            m = _RE_CLASS_LIST.search(text)
             if m:
-                names = re.split(r',|\s+y\s+', m.group(1))
+                names = _RE_LIST_SEP.split(m.group(1))
                 class_names = [n.strip() for n in names if n.strip()]
 
         # Añadir clases detectadas en el contexto
-        if context and context.get('messages'):
-            for msg in context['messages']:
-                class_names += re.findall(r'clase\s+(\w+)', msg, re.IGNORECASE)
-        # Añadir también clases detectadas en pre_parsed si no hay detecciones explícitas
-        if not class_names and pre_parsed:
-            class_names = list(pre_parsed.keys())
-        else:
-            for k in pre_parsed.keys():
-                if k not in class_names:
-                    class_names.append(k)
-
-        class_names = list(dict.fromkeys(class_names))  # mantener orden, eliminar duplicados
+        class_names += _RE_CLASS.findall(context_text)
+        # Añadir también las clases detectadas en pre_parsed, detrás de las explícitas;
+        # dict ordenado: mantener orden, eliminar duplicados en una pasada
+        seen = dict.fromkeys(class_names)
+        seen.update(dict.fromkeys(pre_parsed))
+        class_names = list(seen)
 
         declaring_elements = []
+        has_attrs = "atributo" in folded
+        has_methods = "método" in folded
         # Extraer atributos y métodos asociados (intento simple: si se menciona explícitamente junto a la clase)
         for class_name in class_names:
             attributes = []
@@ -124,15 +268,17 @@ def build_json_for_decoder(text, diagram_type, classifier=None, user_id="default
                     # dejar que el bloque sobreescriba métodos detectados posteriormente
                     pass
             # buscar "<Class> tiene atributo(s) a, b y c" o "atributo x"
-            m_attr = re.search(rf'{class_name}[^\.\,\n]*atributo[s]?\s+([\w\s,]+)', text, re.IGNORECASE)
+            m_attr = _class_attrs_re(class_name).search(text) if has_attrs else None
             if m_attr:
-                attr_list = re.split(r',|\s+y\s+', m_attr.group(1))
+                attr_list = _RE_LIST_SEP.split(m_attr.group(1))
+                # evitar duplicados si ya agregado por pre_parsed (o repetido en la lista)
+                attr_names = {a['name'] for a in attributes}
                 for attr in attr_list:
                     n = attr.strip()
                     if n:
-                        # evitar duplicados si ya agregado por pre_parsed
-                        if any(a['name'] == n for a in attributes):
+                        if n in attr_names:
                             continue
+                        attr_names.add(n)
                         attributes.append({
                             "name": n,
                             "type": "String",
@@ -142,8 +288,8 @@ def build_json_for_decoder(text, diagram_type, classifier=None, user_id="default
                         })
             else:
                 # fallback global: sólo aplicarlo si hay una única clase detectada
-                if len(class_names) <= 1:
-                    for attr in re.findall(r'atributo[s]?\s+([\w]+)', text, re.IGNORECASE):
+                if len(class_names) <= 1 and has_attrs:
+                    for attr in _RE_ANY_ATTR.findall(text):
                         attributes.append({
                             "name": attr,
                             "type": "String",
@@ -163,14 +309,16 @@ def build_json_for_decoder(text, diagram_type, classifier=None, user_id="default
                         "isAbstract": False,
                         "params": []
                     })
-            m_methods = re.search(rf'{class_name}[^\.\,\n]*método[s]?\s+([\w\s,()]+)', text, re.IGNORECASE)
+            m_methods = _class_methods_re(class_name).search(text) if has_methods else None
             if m_methods:
-                method_list = re.split(r',|\s+y\s+', m_methods.group(1))
+                method_list = _RE_LIST_SEP.split(m_methods.group(1))
+                method_names = {m['name'] for m in methods}
                 for method in method_list:
-                    name = re.sub(r'\(.*\)', '', method).strip()
+                    name = _RE_PARENS.sub('', method).strip()
                     if name:
-                        if any(m['name'] == name for m in methods):
+                        if name in method_names:
                             continue
+                        method_names.add(name)
                         methods.append({
                             "name": name,
                             "returnType": "void",
@@ -180,8 +328,8 @@ def build_json_for_decoder(text, diagram_type, classifier=None, user_id="default
                         })
             else:
                 # fallback global: sólo aplicarlo si hay una única clase detectada
-                if len(class_names) <= 1:
-                    for method in re.findall(r'método[s]?\s+([\w]+)', text, re.IGNORECASE):
+                if len(class_names) <= 1 and has_methods:
+                    for method in _RE_ANY_METHOD.findall(text):
                         methods.append({
                             "name": method,
                             "returnType": "void",
@@ -197,7 +345,7 @@ def build_json_for_decoder(text, diagram_type, classifier=None, user_id="default
                 "methods": methods
             })
         relationShips = []
-        for match in re.findall(r'(\w+)\s+hereda\s+de\s+(\w+)', text, re.IGNORECASE):
+        for match in _RE_INHERITS.findall(text) if "hereda" in folded else ():
             relationShips.append({
                 "type": "inheritance",
                 "source": match[0],
@@ -216,23 +364,20 @@ def build_json_for_decoder(text, diagram_type, classifier=None, user_id="default
 
     elif diagram_type == "diagrama_casos_uso":
         actors = []
-        for actor in re.findall(r'actor\s+(\w+)', text, re.IGNORECASE):
+        for actor in _RE_ACTOR.findall(text) if "actor" in folded else ():
             actors.append({"name": actor, "alias": actor.lower(), "stereotype": "", "business": False})
-        if context and context.get('messages'):
-            for msg in context['messages']:
-                for actor in re.findall(r'actor\s+(\w+)', msg, re.IGNORECASE):
-                    actors.append({"name": actor, "alias": actor.lower(), "stereotype": "", "business": False})
-        actors = [dict(t) for t in {tuple(d.items()) for d in actors}]
+        for actor in _RE_ACTOR.findall(context_text):
+            actors.append({"name": actor, "alias": actor.lower(), "stereotype": "", "business": False})
+        # sin duplicados y en orden de aparición; el resto de campos se deriva del nombre
+        actors = list({d["name"]: d for d in actors}.values())
         useCases = []
-        for usecase in re.findall(r'caso de uso\s+([\w\s]+)', text, re.IGNORECASE):
+        for usecase in _RE_USECASE.findall(text) if "caso de uso" in folded else ():
+            useCases.append({"name": usecase.strip(), "alias": usecase.strip().replace(" ", "_").lower(), "stereotype": "", "business": False})
+        for usecase in _RE_USECASE.findall(context_text):
             useCases.append({"name": usecase.strip(), "alias": usecase.strip().replace(" ", "_").lower(), "stereotype": "", "business": False})
-        if context and context.get('messages'):
-            for msg in context['messages']:
-                for usecase in re.findall(r'caso de uso\s+([\w\s]+)', msg, re.IGNORECASE):
-                    useCases.append({"name": usecase.strip(), "alias": usecase.strip().replace(" ", "_").lower(), "stereotype": "", "business": False})
-        useCases = [dict(t) for t in {tuple(d.items()) for d in useCases}]
+        useCases = list({d["name"]: d for d in useCases}.values())
         relationships = []
-        for match in re.findall(r'(\w+)\s+puede\s+([\w\s]+)', text, re.IGNORECASE):
+        for match in _RE_CAN.findall(text) if "puede" in folded else ():
             relationships.append({
                 "type": "actor_usecase",
                 "principal": match[0],
@@ -261,7 +406,7 @@ def classify_and_generate_diagram(text, uml_schema, user_id="default"):
     # Si la intención es desconocida, ambigua o la confianza es baja, solicitar al LLM aclaración
     if diagram_type in ("unknown", "ambiguous", None) or confidence < LLM_FALLBACK_CONFIDENCE:
         # pedir al LLM que resuelva o devuelva una pregunta de aclaración
-        llm_decision = asyncio.run(ask_llm_for_diagram_type(text))
+        llm_decision = _ask_llm_sync(text)
         # si LLM resolvió el tipo, usarlo
         if llm_decision.get("resolved") and llm_decision.get("diagram_type"):
             diagram_type = llm_decision["diagram_type"]
@@ -299,28 +444,14 @@ def classify_and_generate_diagram(text, uml_schema, user_id="default"):
             "clarify": "No se detectaron actores ni casos de uso. ¿Puedes indicar los actores y/o los casos de uso que quieres modelar?"
         }
     try:
-        schema = get_schema(diagram_type)
-        jsonschema.validate(instance=data, schema=schema)
-        config = {
-            # prefer a path relative to this module so generation works regardless of CWD
-            "plant_uml_path": os.path.join(os.path.dirname(__file__), "plant_uml_exc"),
-            "plant_uml_version": "plantuml-1.2025.2.jar",
-            "json_path": None,
-            "output_path": os.path.join(os.getcwd(), "output"),
-            "diagram_name": "output",
-            "data": data,
-        }
-        json_puml = JsonPuml(config=config)
-        json_puml.generate_diagram()
-        svg_path = os.path.join(config["output_path"], config["diagram_name"] + ".svg")
-        if not os.path.exists(svg_path):
+        get_validator(diagram_type).validate(data)
+        svg_content = generate_svg({**BASE_CONFIG, "diagram_name": "output", "data": data})
+        if svg_content is None:
             return {
                 "text": text,
                 "analysis": intent_result,
                 "error": "No se pudo generar el archivo SVG."
             }
-        with open(svg_path, "r", encoding="utf-8") as f:
-            svg_content = f.read()
         return {
             "text": text,
             "analysis": intent_result,
@@ -339,7 +470,9 @@ def classify_and_generate_diagram(text, uml_schema, user_id="default"):
             "error": f"Error al generar el diagrama: {e}"
         }
 
-def get_schema(diagram_type):
+@lru_cache(maxsize=None)
+def get_schema_bytes(diagram_type) -> bytes:
+    """JSON crudo del esquema (leído una vez por proceso), para quien lo necesite sin re-serializar."""
     base_dir = os.path.dirname(os.path.abspath(__file__))
     schema_dir = os.path.join(base_dir, "Validation Schemas")
     if diagram_type == "diagrama_clases":
@@ -348,8 +481,43 @@ def get_schema(diagram_type):
         schema_path = os.path.join(schema_dir, "useCaseDiagram_schema.json")
     else:
         raise ValueError("Tipo de diagrama no soportado")
-    with open(schema_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(schema_path, "rb") as f:
+        return f.read()
+
+@lru_cache(maxsize=None)
+def get_schema(diagram_type):
+    # memoizado: el esquema se parsea una sola vez; los llamadores no deben mutarlo
+    return _json_loads(get_schema_bytes(diagram_type))
+
+@lru_cache(maxsize=None)
+def get_validator(diagram_type):
+    """
+    Validador Draft7 compilado una vez por tipo de diagrama. jsonschema.validate()
+    vuelve a comprobar el esquema y construir el validador en cada llamada.
+    """
+    schema = get_schema(diagram_type)
+    jsonschema.Draft7Validator.check_schema(schema)
+    if fastjsonschema is not None:
+        try:
+            return _FastValidator(schema)
+        except fastjsonschema.JsonSchemaDefinitionException:
+            pass
+    return jsonschema.Draft7Validator(schema)
+
+class _FastValidator:
+    """
+    Validador generado por fastjsonschema (código Python específico del esquema).
+    Expone validate() y lanza jsonschema.ValidationError, como Draft7Validator.
+    """
+
+    def __init__(self, schema):
+        self._validate = fastjsonschema.compile(schema)
+
+    def validate(self, data):
+        try:
+            self._validate(data)
+        except fastjsonschema.JsonSchemaValueException as e:
+            raise jsonschema.ValidationError(e.message) from e
 
 def regenerate_diagram_from_data(diagram_data: dict, user_id="default") -> str:
     """
@@ -399,25 +567,16 @@ def regenerate_diagram_from_data(diagram_data: dict, user_id="default") -> str:
             data["relationShips"] = data.pop("relations")
         if "relationships" in data and "relationShips" not in data:
             data["relationShips"] = data.pop("relationships")
+        data.setdefault("relationShips", [])
 
     diagram_type = "diagrama_clases" if data.get("diagramType") == "classDiagram" else "diagrama_casos_uso"
-    schema = get_schema(diagram_type)
     # Validate the normalized data
-    jsonschema.validate(instance=data, schema=schema)
-
-    config = {
-        "plant_uml_path": os.path.join(os.getcwd(), "plant_uml_exc"),
-        "plant_uml_version": "plantuml-1.2025.2.jar",
-        "json_path": None,
-        "output_path": os.path.join(os.getcwd(), "output"),
-        "diagram_name": f"diagram_{user_id}"
-    }
-    config["data"] = data
-    json_puml = JsonPuml(config=config)
-    json_puml.generate_diagram()
-    svg_path = os.path.join(config["output_path"], config["diagram_name"] + ".svg")
-    with open(svg_path, "r", encoding="utf-8") as f:
-        return f.read()
+    get_validator(diagram_type).validate(data)
+
+    svg = generate_svg({**BASE_CONFIG, "diagram_name": f"diagram_{user_id}", "data": data})
+    if svg is None:
+        raise FileNotFoundError(f"PlantUML no generó el SVG de diagram_{user_id}.")
+    return svg
 
 # uso de JsonPuml desde decoder.py no definido por el momento 
 
@@ -0,0 +1,245 @@
+import asyncio
+import atexit
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+# Marca que PlantUML escribe en stdout tras cada diagrama en modo -pipe
+PIPE_DELIMITER = "__END__"
+_DELIMITER = PIPE_DELIMITER.encode("ascii")
+# Segundos máximos de espera por un diagrama; pasado el plazo se descarta el proceso
+RENDER_TIMEOUT = 30.0
+# En modo -pipe un diagrama inválido no termina con error: PlantUML devuelve la imagen del error
+_ERROR_MARKER = "Syntax Error?"
+
+
+class PlantUmlSyntaxError(RuntimeError):
+    """PlantUML rechazó el diagrama (equivale al returncode != 0 de la ejecución por archivo)."""
+# Opciones de la JVM para PlantUML: sin AWT, GC serie (arranque más rápido en procesos cortos)
+# y class-data sharing si está disponible
+JVM_OPTIONS = ("-Djava.awt.headless=true", "-XX:+UseSerialGC", "-Xshare:auto")
+
+_JAVA_PATH = None
+
+
+def java_executable():
+    """Ruta absoluta de java en PATH (None si no está). Se busca una vez; un fallo no se memoriza."""
+    global _JAVA_PATH
+    if _JAVA_PATH is None:
+        _JAVA_PATH = shutil.which("java")
+    return _JAVA_PATH
+
+
+def _pipe_command(jar_path: str, output_format: str = "svg") -> list:
+    # ruta absoluta de java: junto con close_fds=False permite a subprocess usar posix_spawn
+    return [
+        java_executable() or "java", *JVM_OPTIONS, "-jar", jar_path,
+        "-pipe", f"-t{output_format}", "-charset", "UTF-8", "-pipedelimitor", PIPE_DELIMITER,
+    ]
+
+
+def _ends_with_delimiter(buffer: bytearray) -> bool:
+    # PlantUML 1.2025 escribe la marca pegada al SVG (`</svg>__END__\n`), no en una línea propia
+    return bytes(buffer[-(len(_DELIMITER) + 2):]).rstrip(b"\r\n").endswith(_DELIMITER)
+
+
+def _strip_delimiter(buffer: bytearray) -> str:
+    # el salto de línea tras la marca puede llegar al principio de la respuesta siguiente
+    output = bytes(buffer).rstrip(b"\r\n")[:-len(_DELIMITER)].lstrip(b"\r\n").decode("utf-8")
+    if _ERROR_MARKER in output:
+        raise PlantUmlSyntaxError("PlantUML falló: el diagrama tiene un error de sintaxis.")
+    return output
+
+
+def _pump(stream, chunks: queue.Queue):
+    """Hilo lector de PlantUmlPipe: pasa stdout del proceso a la cola por bloques; b"" marca el fin."""
+    try:
+        while True:
+            chunk = stream.read1(65536)
+            chunks.put(chunk)
+            if not chunk:
+                return
+    except (OSError, ValueError):
+        chunks.put(b"")
+
+
+class PlantUmlWorker:
+    """
+    Proceso PlantUML residente en modo `-pipe`.
+
+    En lugar de lanzar `java -jar ...` por cada diagrama (pagando el arranque de la JVM),
+    se mantiene un único proceso que recibe el código PlantUML por stdin y devuelve el SVG
+    por stdout, seguido de PIPE_DELIMITER. Un lock serializa las peticiones sobre el proceso.
+    """
+
+    def __init__(self, jar_path: str):
+        self._jar_path = jar_path
+        self._proc = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        self._proc = await asyncio.create_subprocess_exec(
+            *_pipe_command(self._jar_path),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            close_fds=False,
+        )
+
+    async def render(self, puml_code: str, timeout: float = RENDER_TIMEOUT) -> str:
+        """
+        Envía `puml_code` al proceso y devuelve el SVG generado.
+        Lanza TimeoutError si PlantUML no responde en `timeout` segundos.
+        """
+        async with self._lock:
+            if self._proc is None or self._proc.returncode is not None:
+                await self.start()
+            try:
+                self._proc.stdin.write(puml_code.encode("utf-8") + b"\n")
+                await self._proc.stdin.drain()
+                try:
+                    return await asyncio.wait_for(self._read_output(), timeout)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"PlantUML no respondió en {timeout} s.") from None
+            except PlantUmlSyntaxError:
+                # la respuesta se leyó entera: el proceso sigue sincronizado y se reutiliza
+                raise
+            except BaseException:
+                # stdout quedó a medio leer: descartar el proceso para no desincronizar la siguiente petición
+                if self._proc.returncode is None:
+                    self._proc.kill()
+                self._proc = None
+                raise
+
+    async def _read_output(self) -> str:
+        buffer = bytearray()
+        while True:
+            chunk = await self._proc.stdout.read(65536)
+            if not chunk:
+                raise RuntimeError("El proceso de PlantUML terminó inesperadamente.")
+            buffer += chunk
+            if _ends_with_delimiter(buffer):
+                return _strip_delimiter(buffer)
+
+    async def close(self):
+        if self._proc is None or self._proc.returncode is not None:
+            return
+        self._proc.stdin.close()
+        try:
+            await asyncio.wait_for(self._proc.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            self._proc.kill()
+
+
+class PlantUmlPool:
+    """Conjunto de PlantUmlWorker detrás de una cola para renderizar en paralelo."""
+
+    def __init__(self, jar_path: str, size: int = 2):
+        self._workers = [PlantUmlWorker(jar_path) for _ in range(size)]
+        self._idle = asyncio.Queue()
+
+    @staticmethod
+    def available(jar_path: str) -> bool:
+        """Indica si hay java en PATH y existe el JAR de PlantUML."""
+        return java_executable() is not None and os.path.isfile(jar_path)
+
+    async def start(self):
+        for worker in self._workers:
+            await worker.start()
+            self._idle.put_nowait(worker)
+
+    async def render(self, puml_code: str) -> str:
+        worker = await self._idle.get()
+        try:
+            return await worker.render(puml_code)
+        finally:
+            self._idle.put_nowait(worker)
+
+    async def close(self):
+        for worker in self._workers:
+            await worker.close()
+
+
+class PlantUmlPipe:
+    """
+    Versión síncrona de PlantUmlWorker para JsonPuml.generate_diagram (main.py, CLI).
+
+    El proceso se lanza al primer render y se reutiliza; un threading.Lock serializa
+    las peticiones. Usar `shared_pipe` para obtener la instancia compartida por JAR.
+    """
+
+    def __init__(self, jar_path: str):
+        self._jar_path = jar_path
+        self._proc = None
+        self._chunks = None
+        self._lock = threading.Lock()
+
+    def _spawn(self):
+        self._proc = subprocess.Popen(
+            _pipe_command(self._jar_path),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            close_fds=False,
+        )
+        # stdout se lee en un hilo aparte para poder poner plazo a la espera (readline no lo admite)
+        self._chunks = queue.Queue()
+        threading.Thread(target=_pump, args=(self._proc.stdout, self._chunks), daemon=True).start()
+
+    def render(self, puml_code: str, timeout: float = RENDER_TIMEOUT) -> str:
+        """
+        Envía `puml_code` al proceso y devuelve el SVG generado.
+        Lanza TimeoutError si PlantUML no responde en `timeout` segundos.
+        """
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                self._spawn()
+            try:
+                self._proc.stdin.write(puml_code.encode("utf-8") + b"\n")
+                self._proc.stdin.flush()
+                deadline = time.monotonic() + timeout
+                buffer = bytearray()
+                while True:
+                    try:
+                        chunk = self._chunks.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        raise TimeoutError(f"PlantUML no respondió en {timeout} s.") from None
+                    if not chunk:
+                        raise RuntimeError("El proceso de PlantUML terminó inesperadamente.")
+                    buffer += chunk
+                    if _ends_with_delimiter(buffer):
+                        return _strip_delimiter(buffer)
+            except PlantUmlSyntaxError:
+                raise
+            except BaseException:
+                # igual que PlantUmlWorker: un proceso a medio leer no se reutiliza
+                if self._proc.poll() is None:
+                    self._proc.kill()
+                self._proc = None
+                raise
+
+    def close(self):
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                return
+            self._proc.stdin.close()
+            try:
+                self._proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+            self._proc = None
+
+
+_SHARED_PIPES = {}
+_SHARED_PIPES_LOCK = threading.Lock()
+
+
+def shared_pipe(jar_path: str) -> PlantUmlPipe:
+    """Devuelve el PlantUmlPipe del proceso para `jar_path`; se cierra al salir del intérprete."""
+    with _SHARED_PIPES_LOCK:
+        pipe = _SHARED_PIPES.get(jar_path)
+        if pipe is None:
+            pipe = _SHARED_PIPES[jar_path] = PlantUmlPipe(jar_path)
+            atexit.register(pipe.close)
+        return pipe
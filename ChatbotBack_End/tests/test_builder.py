@@ -52,3 +52,89 @@ def test_jsonpuml_generates_code_for_class():
     assert jp._code is not None
     assert jp._code.startswith('@startuml')
     assert 'class Usuario' in jp._code
+
+
+def test_usecase_actors_and_cases_are_deduplicated_in_order():
+    text = "actor Zeta, actor Alfa y actor Zeta. caso de uso pagar. caso de uso comprar. caso de uso pagar"
+    data = build_json_for_decoder(text, 'diagrama_casos_uso')
+    assert [a['name'] for a in data['actors']] == ['Zeta', 'Alfa']
+    assert [u['alias'] for u in data['useCases']] == ['pagar', 'comprar']
+
+
+def test_llm_fallback_reuses_one_event_loop(monkeypatch):
+    import asyncio
+    import main
+
+    loops = []
+
+    async def fake_ask(text):
+        loops.append(asyncio.get_running_loop())
+        return {"resolved": False, "question": text}
+
+    monkeypatch.setattr(main, 'ask_llm_for_diagram_type', fake_ask)
+    assert main._ask_llm_sync('a')['question'] == 'a'
+
+    async def from_running_loop():
+        return main._ask_llm_sync('b')
+
+    assert asyncio.run(from_running_loop())['question'] == 'b'
+    assert loops[0] is loops[1]
+
+
+def test_llm_fallback_gives_up_and_cancels_after_timeout(monkeypatch):
+    import asyncio
+    import main
+
+    cancelled = []
+
+    async def stalled_ask(text):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(text)
+            raise
+
+    monkeypatch.setattr(main, 'ask_llm_for_diagram_type', stalled_ask)
+    decision = main._ask_llm_sync('x', timeout=0.2)
+    assert decision['resolved'] is False and decision['question']
+    # la cancelación se procesa en el hilo del loop persistente
+    asyncio.run_coroutine_threadsafe(asyncio.sleep(0), main._llm_loop()).result(5)
+    assert cancelled == ['x']
+
+
+def test_build_json_is_memoized_but_returns_independent_copies():
+    text = "Usuario: atributos: id, nombre; métodos: crear()"
+    first = build_json_for_decoder(text, 'diagrama_clases')
+    first['declaringElements'][0]['attributes'].clear()
+    second = build_json_for_decoder(text, 'diagrama_clases')
+    assert [a['name'] for a in second['declaringElements'][0]['attributes']] == ['id', 'nombre']
+
+
+def test_concurrent_renders_of_one_diagram_read_their_own_svg(tmp_path, monkeypatch):
+    import threading
+    import time
+    import main
+
+    def fake_generate(self):
+        # escribe el SVG y cede el hilo antes de que se lea, como un render real
+        os.makedirs(self._output_path, exist_ok=True)
+        with open(self._rendered_out, 'w', encoding='utf-8') as fh:
+            fh.write(self._code)
+        time.sleep(0.01)
+
+    monkeypatch.setattr(main.JsonPuml, 'generate_diagram', fake_generate)
+    monkeypatch.setitem(main.__dict__, 'BASE_CONFIG', {**main.BASE_CONFIG, 'output_path': str(tmp_path)})
+    results = {}
+
+    def render(name):
+        data = {'diagramType': 'classDiagram', 'declaringElements': [{'type': 'class', 'name': name}]}
+        svg = main.regenerate_diagram_from_data(data, user_id='same')
+        results[name] = name in svg
+
+    threads = [threading.Thread(target=render, args=(f'C{i}',)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == {f'C{i}': True for i in range(6)}
+    assert main._OUTPUT_LOCKS == {}
@@ -1,5 +1,5 @@
 import pytest
-from Clasificador_diagrama import AdvancedDiagramClassifier
+from Clasificador_diagrama import _CLASS_PATTERNS, AdvancedDiagramClassifier, _pattern_found
 
 
 def test_classifier_detects_class_diagram():
@@ -18,3 +18,78 @@ def test_classifier_detects_usecase_diagram():
     assert isinstance(res, dict)
     assert res.get('intent') == 'diagrama_casos_uso'
     assert res.get('confidence', 0) >= 0.6
+
+
+def test_keyword_sets_match_like_substring_search():
+    clf = AdvancedDiagramClassifier()
+    text = "las subclases heredan atributos; el caso de uso registra usuarios en la tabla"
+    expected = {t for t in clf._all_terms if t in text}
+    assert clf._matched_terms(text) == expected
+    clf._automaton = None  # búsqueda sin pyahocorasick
+    assert clf._matched_terms(text) == expected
+    assert {'clase', 'atributo', 'caso de uso', 'usuario', 'tabla'} <= expected
+
+
+def test_decisive_terms_skip_remaining_analyses_unless_context_disagrees():
+    clf = AdvancedDiagramClassifier()
+    res = clf.classify_diagram_type("La clase Pedido tiene atributos", user_id='ut_user_3')
+    assert res['method'] == 'basic_short_circuit'
+    assert res['intent'] == 'diagrama_clases'
+    # la conversación venía de casos de uso: se combinan todos los análisis
+    clf.get_user_context('ut_user_3')['last_intent'] = 'diagrama_casos_uso'
+    res = clf.classify_diagram_type("Añade el atributo fecha a la clase Pedido", user_id='ut_user_3')
+    assert res['method'] != 'basic_short_circuit'
+
+
+def test_industry_hints_are_kept_as_a_bitmask():
+    clf = AdvancedDiagramClassifier()
+    clf.classify_diagram_type("La base de datos guarda tablas de clientes", user_id='ut_user_4')
+    assert isinstance(clf.get_user_context('ut_user_4')['industry_hints'], int)
+    assert clf.get_industry_hints('ut_user_4') == {'business'}
+    assert clf.get_industry_hints('ut_desconocido') == set()
+
+
+def test_active_conversation_count_tracks_contexts():
+    clf = AdvancedDiagramClassifier()
+    for user_id in ('a', 'b', 'b', 'c', 'c', 'c'):
+        clf.classify_diagram_type("La clase Pedido tiene atributos", user_id=user_id)
+    assert clf.get_classification_stats()['active_conversations'] == 2
+    clf.clear_user_context('b')
+    clf.clear_user_context('a')
+    stats = clf.get_classification_stats()
+    assert (stats['total_users'], stats['active_conversations']) == (1, 1)
+
+
+def test_method_pattern_needs_a_closing_paren_after_the_call():
+    literals, pattern, closing = _CLASS_PATTERNS[2]
+    assert _pattern_found(literals, pattern, closing, "void guardar(int id)")
+    assert not _pattern_found(literals, pattern, closing, "nota) void guardar(int id")
+    # entrada adversaria: muchos '(' sin cerrar no deben disparar backtracking cuadrático
+    assert not _pattern_found(literals, pattern, closing, "a b (" * 20000)
+
+
+def test_concurrent_analyses_keep_context_consistent(monkeypatch):
+    import sys
+    import threading
+    import Clasificador_diagrama
+    monkeypatch.setattr(Clasificador_diagrama, 'MAX_CONVERSATIONS', 8)
+    # cambios de hilo muy frecuentes para que las carreras aparezcan sin el lock
+    switch = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    clf = AdvancedDiagramClassifier()
+
+    def worker(n):
+        for i in range(300):
+            clf.analyze_conversation(f'u{(n * 7 + i) % 20}', 'clase Usuario con atributo id')
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(switch)
+    contexts = clf.conversation_context.values()
+    assert len(contexts) <= 8
+    assert clf._active_count == sum(1 for c in contexts if c['interaction_count'] > 1)
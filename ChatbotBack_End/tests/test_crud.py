@@ -0,0 +1,70 @@
+from OperationCRUD import DiagramCRUD
+import interactive_crud
+
+
+def test_lookups_follow_creates_renames_and_deletes():
+    crud = DiagramCRUD({"classes": [{"id": "a", "name": "Pedido"}, {"id": "b", "name": "pedido"}]})
+    assert crud.find_class_by_name("PEDIDO")["id"] == "a"  # la primera, como el recorrido lineal
+    created = crud.create_class("Cliente")
+    assert crud.find_class_by_id(created["id"]) is created
+    assert crud.find_class_by_name("cliente") is created
+    crud.update_class(created["id"], {"name": "Comprador"})
+    assert crud.find_class_by_name("cliente") is None
+    assert crud.find_class_by_name("comprador") is created
+    assert crud.delete_class("a")
+    assert crud.find_class_by_id("a") is None
+    assert crud.find_class_by_name("Pedido")["id"] == "b"
+    assert not crud.delete_class("a")
+
+
+def test_deferred_mutations_are_written_once_on_flush(tmp_path):
+    path = tmp_path / "d.json"
+    crud = DiagramCRUD({"classes": []}, storage_path=str(path), autosave=False)
+    cls = crud.create_class("Pedido")
+    crud.add_attribute(cls["id"], {"name": "id"})
+    assert crud.dirty and not path.exists()
+    crud.flush()
+    assert not crud.dirty
+    assert DiagramCRUD.load_from_file(str(path)).find_class_by_name("pedido")["attributes"] == [{"name": "id"}]
+
+
+def test_delete_class_keeps_order_and_removes_duplicated_ids():
+    crud = DiagramCRUD({"classes": [{"id": "a", "name": "A"}, {"id": "b", "name": "B"}, {"id": "c", "name": "C"}]})
+    assert crud.delete_class("a")
+    assert [c["id"] for c in crud.list_classes()] == ["b", "c"]
+    crud = DiagramCRUD({"classes": [{"id": "x", "name": "A"}, {"id": "y", "name": "B"}, {"id": "x", "name": "C"}]})
+    assert crud.delete_class("x")
+    assert [c["id"] for c in crud.list_classes()] == ["y"]
+    assert crud.find_class_by_name("c") is None
+
+
+def test_loaded_classes_are_normalized_and_edited_in_place():
+    crud = DiagramCRUD({"classes": [{"id": "a", "name": "A", "attributes": [{"name": "x"}, {"name": "y"}]}]})
+    cls = crud.find_class_by_id("a")
+    assert cls["methods"] == [] and cls["relationships"] == []
+    attrs = cls["attributes"]
+    assert crud.remove_attribute("a", "x")
+    assert attrs == [{"name": "y"}] and cls["attributes"] is attrs
+    assert not crud.remove_method("a", "nada")
+
+
+def test_older_snapshot_never_overwrites_a_newer_write(tmp_path):
+    path = tmp_path / "d.json"
+    crud = DiagramCRUD({"classes": []}, storage_path=str(path), autosave=False)
+    crud.create_class("A")
+    stale = crud.snapshot()
+    crud.create_class("B")
+    crud.flush()
+    crud.write_snapshot(*stale)  # p. ej. un flush en hilo que termina tarde
+    assert not crud.dirty
+    names = [c["name"] for c in DiagramCRUD.load_from_file(str(path)).list_classes()]
+    assert names == ["A", "B"]
+
+
+def test_cli_handlers_cover_every_command(monkeypatch):
+    assert set(interactive_crud._HANDLERS) | {"exit"} == set(interactive_crud.COMMANDS)
+    answers = iter(["Pedido"])
+    monkeypatch.setattr(interactive_crud, "prompt", lambda text, completer=None: next(answers))
+    crud = DiagramCRUD({"classes": []})
+    interactive_crud._HANDLERS["create"](crud)
+    assert crud.find_class_by_name("pedido") is not None
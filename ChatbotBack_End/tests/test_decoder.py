@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+import decoder
+import plantuml_pipe
+from decoder import JsonPuml
+
+CLASS_DATA = {
+    'diagramType': 'classDiagram',
+    'declaringElements': [{'type': 'class', 'name': 'Usuario'}, {'type': 'class', 'name': 'Pedido'}],
+    'relationShips': [{'type': 'association', 'source': 'Usuario', 'target': 'Pedido'}],
+}
+
+
+def _json_puml(tmp_path, data=CLASS_DATA, name='diagram'):
+    return JsonPuml(config={
+        'plant_uml_path': str(tmp_path / 'jar'),
+        'plant_uml_version': 'plantuml.jar',
+        'output_path': str(tmp_path / 'out'),
+        'diagram_name': name,
+        'data': data,
+    })
+
+
+def test_generate_diagram_uses_cache_without_java(tmp_path, monkeypatch):
+    monkeypatch.setattr(plantuml_pipe, 'java_executable', lambda: None)
+    jp = _json_puml(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        jp.generate_diagram()
+
+    cache_dir = tmp_path / 'out' / decoder.PUML_CACHE_DIR
+    cache_dir.mkdir()
+    key = hashlib.sha256(f"{decoder.OUTPUT_FORMAT}\n{jp._code}".encode('utf-8')).hexdigest()
+    (cache_dir / f"{key}.{decoder.OUTPUT_FORMAT}").write_text('<svg/>', encoding='utf-8')
+
+    jp.generate_diagram()
+    assert (tmp_path / 'out' / 'diagram.svg').read_text(encoding='utf-8') == '<svg/>'
+    assert (tmp_path / 'out' / 'diagram.puml').read_text(encoding='utf-8') == jp._code
+
+
+def test_store_in_cache_prunes_oldest(tmp_path, monkeypatch):
+    monkeypatch.setattr(decoder, 'PUML_CACHE_MAX_FILES', 2)
+    rendered = tmp_path / 'diagram.svg'
+    rendered.write_text('<svg/>', encoding='utf-8')
+    cache_dir = tmp_path / 'cache'
+    for i, name in enumerate(('a', 'b', 'c')):
+        JsonPuml._store_in_cache(str(rendered), str(cache_dir), str(cache_dir / f"{name}.svg"))
+        os.utime(cache_dir / f"{name}.svg", (i, i))
+    JsonPuml._store_in_cache(str(rendered), str(cache_dir), str(cache_dir / 'd.svg'))
+    assert sorted(os.listdir(cache_dir)) == ['c.svg', 'd.svg']
+
+
+def test_batched_queues_misses_and_flushes_on_exit(tmp_path, monkeypatch):
+    monkeypatch.setattr(plantuml_pipe, 'java_executable', lambda: None)
+    hit = _json_puml(tmp_path, name='hit')
+    cache_dir = tmp_path / 'out' / decoder.PUML_CACHE_DIR
+    cache_dir.mkdir(parents=True)
+    key = hashlib.sha256(f"{decoder.OUTPUT_FORMAT}\n{hit._code}".encode('utf-8')).hexdigest()
+    (cache_dir / f"{key}.{decoder.OUTPUT_FORMAT}").write_text('<svg/>', encoding='utf-8')
+
+    miss_data = {**CLASS_DATA, 'declaringElements': [{'type': 'class', 'name': 'Otro'}], 'relationShips': []}
+    with pytest.raises(FileNotFoundError):
+        with JsonPuml.batched():
+            hit.queue()
+            _json_puml(tmp_path, data=miss_data, name='miss').queue()
+            assert [job[0] for job in JsonPuml._pending] == [str(tmp_path / 'out' / 'miss.puml')]
+    assert JsonPuml._pending == []
+    assert (tmp_path / 'out' / 'hit.svg').exists()
+
+
+def test_large_json_files_are_streamed_with_same_output(tmp_path, monkeypatch):
+    pytest.importorskip('ijson')
+    path = tmp_path / 'diagram.json'
+    path.write_text(json.dumps(CLASS_DATA), encoding='utf-8')
+    config = {'plant_uml_path': '.', 'plant_uml_version': 'x', 'json_path': str(path)}
+    expected = JsonPuml(config={**config, 'output_path': str(tmp_path / 'a')})._code
+    monkeypatch.setattr(decoder, 'STREAM_JSON_MIN_BYTES', 0)
+    streamed = JsonPuml(config={**config, 'output_path': str(tmp_path / 'b')})
+    assert isinstance(streamed._data, decoder._StreamedDiagram)
+    assert streamed._code == expected
+
+
+def test_class_relationships_are_emitted_once_after_all_classes(tmp_path):
+    lines = _json_puml(tmp_path)._code.splitlines()
+    relation = next(line for line in lines if '--' in line)
+    assert lines.count(relation) == 1
+    assert lines.index(relation) > lines.index('class Pedido')
+
+
+def test_json_file_conversion_is_cached_by_content(tmp_path):
+    path = tmp_path / 'diagram.json'
+    path.write_text(json.dumps(CLASS_DATA), encoding='utf-8')
+    config = {'plant_uml_path': '.', 'plant_uml_version': 'x', 'json_path': str(path), 'output_path': str(tmp_path / 'out')}
+    first = JsonPuml(config=config)
+    assert first._data == CLASS_DATA
+    second = JsonPuml(config=config)
+    assert second._data is None
+    assert second._code == first._code
+
+    path.write_text(json.dumps({**CLASS_DATA, 'relationShips': []}), encoding='utf-8')
+    third = JsonPuml(config=config)
+    assert third._data is not None
+    assert '--' not in third._code
+
+
+def test_invalid_data_raises_instead_of_exiting(tmp_path):
+    jp = _json_puml(tmp_path)
+    jp._data = {'diagramType': 'useCaseDiagram', 'packages': [{'name': 'P'}]}
+    with pytest.raises(ValueError, match='alias'):
+        jp._json_to_plantuml()
+    jp._data = {}
+    with pytest.raises(ValueError, match='diagramType'):
+        jp._json_to_plantuml()
+
+
+def test_code_is_reused_for_equal_data(tmp_path, monkeypatch):
+    first = _json_puml(tmp_path)._code
+    monkeypatch.setattr(decoder, '_DECODERS', {})
+    reordered = {key: CLASS_DATA[key] for key in reversed(list(CLASS_DATA))}
+    assert _json_puml(tmp_path, data=reordered)._code == first
+
+
+def test_unchanged_puml_is_not_rewritten(tmp_path):
+    path = tmp_path / 'diagram.puml'
+    JsonPuml._write_if_changed(str(path), b'@startuml\n@enduml')
+    os.utime(path, (0, 0))
+    JsonPuml._write_if_changed(str(path), b'@startuml\n@enduml')
+    assert os.path.getmtime(path) == 0
+    JsonPuml._write_if_changed(str(path), b'@startuml\nA\n@enduml')
+    assert path.read_bytes() == b'@startuml\nA\n@enduml'
+
+
+def test_generate_many_splits_misses_across_jvms(tmp_path, monkeypatch):
+    (tmp_path / 'jar').mkdir()
+    (tmp_path / 'jar' / 'plantuml.jar').write_bytes(b'')
+    monkeypatch.setattr(plantuml_pipe, 'java_executable', lambda: 'java')
+    calls = []
+
+    def fake_run(java, jar, output_path, puml_paths):
+        calls.append(sorted(os.path.basename(p) for p in puml_paths))
+        for path in puml_paths:
+            with open(path[:-len('.puml')] + '.svg', 'w', encoding='utf-8') as fh:
+                fh.write('<svg/>')
+
+    monkeypatch.setattr(JsonPuml, '_run_plantuml', staticmethod(fake_run))
+    configs = [{
+        'plant_uml_path': str(tmp_path / 'jar'),
+        'plant_uml_version': 'plantuml.jar',
+        'output_path': str(tmp_path / 'out'),
+        'diagram_name': f'd{i}',
+        'data': {**CLASS_DATA, 'declaringElements': [{'type': 'class', 'name': f'C{i}'}]},
+    } for i in range(4)]
+    JsonPuml.generate_many(configs, max_workers=2)
+    assert sorted(calls) == [['d0.puml', 'd1.puml'], ['d2.puml', 'd3.puml']]
+    assert all((tmp_path / 'out' / f'd{i}.svg').exists() for i in range(4))
+
+
+def test_generate_diagram_falls_back_when_pipe_times_out(tmp_path, monkeypatch):
+    (tmp_path / 'jar').mkdir()
+    (tmp_path / 'jar' / 'plantuml.jar').write_bytes(b'')
+    monkeypatch.setattr(plantuml_pipe, 'java_executable', lambda: 'java')
+
+    def hung_render(self, puml_code, timeout=None):
+        raise TimeoutError('PlantUML no respondió')
+
+    monkeypatch.setattr(plantuml_pipe.PlantUmlPipe, 'render', hung_render)
+    calls = []
+
+    def fake_run(java, jar, output_path, puml_paths):
+        calls.append(puml_paths)
+        with open(os.path.join(output_path, 'diagram.svg'), 'w', encoding='utf-8') as fh:
+            fh.write('<svg/>')
+
+    monkeypatch.setattr(JsonPuml, '_run_plantuml', staticmethod(fake_run))
+    _json_puml(tmp_path).generate_diagram()
+    assert calls == [[str(tmp_path / 'out' / 'diagram.puml')]]
+    assert (tmp_path / 'out' / 'diagram.svg').read_text(encoding='utf-8') == '<svg/>'
+
+
+def test_store_in_cache_from_concurrent_threads(tmp_path):
+    import threading
+    rendered = tmp_path / 'diagram.svg'
+    rendered.write_text('<svg>' + 'x' * 100000 + '</svg>', encoding='utf-8')
+    cache_dir = tmp_path / 'cache'
+    cached = str(cache_dir / 'same.svg')
+    threads = [threading.Thread(target=JsonPuml._store_in_cache, args=(str(rendered), str(cache_dir), cached))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert os.listdir(cache_dir) == ['same.svg']
+    assert (cache_dir / 'same.svg').read_bytes() == rendered.read_bytes()
+
+
+def test_generate_diagram_does_not_cache_plantuml_syntax_errors(tmp_path, monkeypatch):
+    (tmp_path / 'jar').mkdir()
+    (tmp_path / 'jar' / 'plantuml.jar').write_bytes(b'')
+    monkeypatch.setattr(plantuml_pipe, 'java_executable', lambda: 'java')
+
+    def error_render(self, puml_code, timeout=None):
+        raise plantuml_pipe.PlantUmlSyntaxError('PlantUML falló')
+
+    def unexpected_run(*args):
+        raise AssertionError('no debe relanzar PlantUML por archivo')
+
+    monkeypatch.setattr(plantuml_pipe.PlantUmlPipe, 'render', error_render)
+    monkeypatch.setattr(JsonPuml, '_run_plantuml', staticmethod(unexpected_run))
+    with pytest.raises(RuntimeError):
+        _json_puml(tmp_path).generate_diagram()
+    assert not (tmp_path / 'out' / 'diagram.svg').exists()
+    assert not (tmp_path / 'out' / decoder.PUML_CACHE_DIR).exists()
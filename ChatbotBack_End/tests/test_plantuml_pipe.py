@@ -0,0 +1,107 @@
+import asyncio
+import sys
+
+import pytest
+
+import plantuml_pipe
+from plantuml_pipe import PlantUmlPipe, PlantUmlSyntaxError, PlantUmlWorker
+
+# Imita `java -jar plantuml.jar -pipe`: lee hasta @enduml y responde como PlantUML 1.2025,
+# con la marca pegada al cierre del SVG.
+FAKE_PLANTUML = r'''
+import asyncio
+import sys
+lines = []
+for line in sys.stdin:
+    lines.append(line.strip())
+    if line.strip() == "@enduml":
+        body = "|".join(lines[1:-1])
+        sys.stdout.write("<svg>" + body + "</svg>__END__\n")
+        sys.stdout.flush()
+        lines = []
+'''
+
+SILENT_PLANTUML = 'import sys\nfor line in sys.stdin:\n    pass\n'
+
+
+def _fake_command(monkeypatch, script):
+    monkeypatch.setattr(plantuml_pipe, '_pipe_command', lambda jar, fmt='svg': [sys.executable, '-c', script])
+
+
+def test_pipe_detects_delimiter_glued_to_svg(monkeypatch):
+    _fake_command(monkeypatch, FAKE_PLANTUML)
+    pipe = PlantUmlPipe('plantuml.jar')
+    try:
+        assert pipe.render('@startuml\nA -> B\n@enduml', timeout=10) == '<svg>A -> B</svg>'
+        # el mismo proceso sirve la petición siguiente sin arrastrar el salto de línea anterior
+        assert pipe.render('@startuml\nclass C\n@enduml', timeout=10) == '<svg>class C</svg>'
+    finally:
+        pipe.close()
+
+
+def test_pipe_times_out_and_respawns(monkeypatch):
+    _fake_command(monkeypatch, SILENT_PLANTUML)
+    pipe = PlantUmlPipe('plantuml.jar')
+    with pytest.raises(TimeoutError):
+        pipe.render('@startuml\nA -> B\n@enduml', timeout=0.5)
+    assert pipe._proc is None
+    _fake_command(monkeypatch, FAKE_PLANTUML)
+    try:
+        assert pipe.render('@startuml\nA\n@enduml', timeout=10) == '<svg>A</svg>'
+    finally:
+        pipe.close()
+
+
+def test_worker_detects_delimiter_and_recycles_on_timeout(monkeypatch):
+    async def scenario():
+        _fake_command(monkeypatch, SILENT_PLANTUML)
+        worker = PlantUmlWorker('plantuml.jar')
+        with pytest.raises(TimeoutError):
+            await worker.render('@startuml\nA -> B\n@enduml', timeout=0.5)
+        assert worker._proc is None
+        _fake_command(monkeypatch, FAKE_PLANTUML)
+        try:
+            assert await worker.render('@startuml\nA -> B\n@enduml', timeout=10) == '<svg>A -> B</svg>'
+            assert await worker.render('@startuml\nclass C\n@enduml', timeout=10) == '<svg>class C</svg>'
+        finally:
+            await worker.close()
+
+    asyncio.run(scenario())
+
+
+# Respuesta de PlantUML en modo -pipe a un diagrama inválido: imagen de error, no un código de salida
+ERROR_PLANTUML = r'''
+import sys
+for line in sys.stdin:
+    if line.strip() == "@enduml":
+        sys.stdout.write('<svg><text>Syntax Error?</text></svg>__END__\n')
+        sys.stdout.flush()
+'''
+
+
+def test_pipe_raises_on_plantuml_error_image_and_keeps_process(monkeypatch):
+    _fake_command(monkeypatch, ERROR_PLANTUML)
+    pipe = PlantUmlPipe('plantuml.jar')
+    try:
+        with pytest.raises(PlantUmlSyntaxError):
+            pipe.render('@startuml\nclass {\n@enduml', timeout=10)
+        proc = pipe._proc
+        assert proc is not None
+        with pytest.raises(PlantUmlSyntaxError):
+            pipe.render('@startuml\nclass {\n@enduml', timeout=10)
+        assert pipe._proc is proc
+    finally:
+        pipe.close()
+
+
+def test_worker_raises_on_plantuml_error_image(monkeypatch):
+    async def scenario():
+        _fake_command(monkeypatch, ERROR_PLANTUML)
+        worker = PlantUmlWorker('plantuml.jar')
+        try:
+            with pytest.raises(PlantUmlSyntaxError):
+                await worker.render('@startuml\nclass {\n@enduml', timeout=10)
+        finally:
+            await worker.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,76 @@
+import glob
+import json
+import os
+
+import jsonschema
+import orjson
+import pytest
+from pydantic import ValidationError
+
+from main import get_schema, get_validator
+from uml_models import parse_uml_payload
+
+INPUTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'inputs')
+SCHEMA_BY_TYPE = {'classDiagram': 'diagrama_clases', 'useCaseDiagram': 'diagrama_casos_uso'}
+
+
+def _jsonschema_ok(data):
+    try:
+        jsonschema.validate(instance=data, schema=get_schema(SCHEMA_BY_TYPE[data['diagramType']]))
+        return True
+    except jsonschema.ValidationError:
+        return False
+
+
+def _compiled_ok(data):
+    try:
+        get_validator(SCHEMA_BY_TYPE[data['diagramType']]).validate(data)
+        return True
+    except jsonschema.ValidationError:
+        return False
+
+
+def _model_ok(data):
+    try:
+        parse_uml_payload(orjson.dumps(data))
+        return True
+    except ValidationError:
+        return False
+
+
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(INPUTS_DIR, '*', '*.json'))))
+def test_models_agree_with_json_schemas_on_inputs(path):
+    with open(path, encoding='utf-8') as fh:
+        data = json.load(fh)
+    assert _model_ok(data) == _jsonschema_ok(data) == _compiled_ok(data)
+
+
+def test_models_reject_what_json_schemas_reject():
+    base = {'diagramType': 'classDiagram', 'declaringElements': [{'type': 'class', 'name': 'A'}]}
+    cases = [
+        {'diagramType': 'classDiagram'},
+        {**base, 'declaringElements': [{'type': 'interface', 'name': 'A'}]},
+        {**base, 'declaringElements': [{'type': 'class', 'name': 1}]},
+        {**base, 'relationShips': [{'type': 'x', 'source': 'A'}]},
+        {'diagramType': 'useCaseDiagram', 'actors': [], 'useCases': [{'name': 'x', 'alias': 'x', 'business': 'yes'}], 'relationships': []},
+        {**base, 'declaringElements': [{'type': 'class', 'name': 'A', 'attributes': None}]},
+        {**base, 'declaringElements': [{'type': 'class', 'name': 'A', 'methods': None}]},
+        {**base, 'relationShips': None},
+        {**base, 'relationShips': [{'type': 'x', 'source': 'A', 'target': 'A', 'multiplicity': None}]},
+        {'diagramType': 'useCaseDiagram', 'actors': [{'name': 'x', 'alias': 'x', 'stereotype': None}], 'useCases': [], 'relationships': []},
+        {'diagramType': 'useCaseDiagram', 'actors': [], 'useCases': [{'name': 'x', 'alias': 'x', 'business': None}], 'relationships': []},
+        {'diagramType': 'useCaseDiagram', 'actors': [], 'useCases': [], 'relationships': [{'type': 'x', 'principal': 'a', 'secondary': 'b', 'direction': None}]},
+        {'diagramType': 'useCaseDiagram', 'actors': [], 'useCases': [], 'relationships': [{'type': 'x', 'principal': 'a', 'secondary': 'b', 'label': None}]},
+    ]
+    assert _model_ok(base) and _jsonschema_ok(base) and _compiled_ok(base)
+    for data in cases:
+        assert not _model_ok(data)
+        assert not _jsonschema_ok(data)
+        assert not _compiled_ok(data)
+
+
+def test_parse_keeps_only_given_keys_and_skips_unknown_types():
+    data = {'diagramType': 'classDiagram', 'declaringElements': [{'type': 'class', 'name': 'A', 'extra': 1}]}
+    assert parse_uml_payload(orjson.dumps(data)) == data
+    other = {'diagramType': 'sequenceDiagram', 'anything': True}
+    assert parse_uml_payload(orjson.dumps(other)) == other
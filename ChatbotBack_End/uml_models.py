@@ -0,0 +1,115 @@
+"""
+Modelos Pydantic equivalentes a los esquemas de `Validation Schemas/`.
+
+`parse_uml_payload` parsea y valida el JSON crudo en una sola pasada (pydantic-core),
+en lugar de `json.loads` + `jsonschema.validate` sobre el árbol ya construido.
+Igual que los esquemas, se permiten propiedades adicionales.
+"""
+from typing import Annotated, List, Literal, Union
+
+import orjson
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError
+
+
+class _SchemaModel(BaseModel):
+    # Los campos opcionales no admiten null (el esquema tampoco); sus valores por defecto no
+    # llegan a la salida porque parse_uml_payload sólo vuelca las claves presentes.
+    # strict: "type": "string"/"boolean" del esquema no acepta coerciones
+    model_config = ConfigDict(extra="allow", strict=True)
+
+
+# --- classDiagram_schema.json ---
+
+class Attribute(_SchemaModel):
+    name: str
+    type: str
+    visibility: str
+    isStatic: bool
+    isFinal: bool
+
+
+class Param(_SchemaModel):
+    name: str
+    type: str
+
+
+class Method(_SchemaModel):
+    name: str
+    returnType: str
+    visibility: str
+    isAbstract: bool
+    params: List[Param]
+
+
+class ClassElement(_SchemaModel):
+    type: Literal["class"]
+    name: str
+    attributes: List[Attribute] = []
+    methods: List[Method] = []
+
+
+class ClassRelationship(_SchemaModel):
+    type: str
+    source: str
+    target: str
+    multiplicity: List[str] = []
+
+
+class ClassDiagram(_SchemaModel):
+    diagramType: Literal["classDiagram"]
+    declaringElements: List[ClassElement]
+    relationShips: List[ClassRelationship] = []
+
+
+# --- useCaseDiagram_schema.json ---
+
+class UseCaseNode(_SchemaModel):
+    name: str
+    alias: str
+    stereotype: str = ""
+    business: bool = False
+
+
+class UseCaseRelationship(_SchemaModel):
+    type: str
+    principal: str
+    secondary: str
+    direction: str = ""
+    label: str = ""
+
+
+class UseCaseDiagram(_SchemaModel):
+    diagramType: Literal["useCaseDiagram"]
+    actors: List[UseCaseNode]
+    useCases: List[UseCaseNode]
+    relationships: List[UseCaseRelationship]
+
+
+UmlPayload = Annotated[Union[ClassDiagram, UseCaseDiagram], Field(discriminator="diagramType")]
+_UML_ADAPTER = TypeAdapter(UmlPayload)
+
+# errores de discriminador: diagramType ausente o sin esquema -> no se valida (como antes)
+_UNKNOWN_TYPE_ERRORS = {"union_tag_invalid", "union_tag_not_found"}
+
+
+def parse_uml_payload(raw) -> dict:
+    """
+    Parsea y valida `raw` (bytes/str JSON) contra el esquema de su diagramType.
+    Devuelve el diagrama como dict con sólo las claves presentes en la entrada.
+    Lanza pydantic.ValidationError si no cumple el esquema.
+    """
+    try:
+        model = _UML_ADAPTER.validate_json(raw)
+    except ValidationError as e:
+        errors = e.errors()
+        if errors and all(err["type"] in _UNKNOWN_TYPE_ERRORS for err in errors):
+            return orjson.loads(raw)
+        raise
+    return model.model_dump(exclude_unset=True)
+
+
+def validation_message(error: ValidationError) -> str:
+    """Mensaje corto del primer error, en el estilo de jsonschema (`ruta: mensaje`)."""
+    first = error.errors()[0]
+    loc = ".".join(str(p) for p in first["loc"])
+    return f"{loc}: {first['msg']}" if loc else first["msg"]